@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Performance analytics over the full trade history
+Loads fills from the trade journal (which carries the migrated trade_log.csv)
+or the broker's order history into columnar NumPy arrays, caches them per
+period as memory-mapped .npy files and computes equity curve, drawdown,
+Sharpe/Sortino, expectancy and per-pattern / per-session breakdowns without
+touching per-trade Python objects.
+
+Usage:
+    analytics.py [--period today|mtd|ytd|all] [--start DATE] [--end DATE]
+                 [--source journal|broker] [--refresh]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import metrics
+from config import Config
+
+TRADING_DAYS = 252
+FETCH_CHUNK = 50000
+MARKET_TZ = ZoneInfo('America/New_York')
+UNKNOWN = 'UNKNOWN'
+
+# Fixed-width columns stored as one .npy file each; categorical columns are
+# integer codes into the category lists kept in meta.json
+NUMERIC_COLUMNS = ('time', 'day', 'symbol', 'side', 'qty', 'price', 'pnl', 'pattern', 'session')
+CATEGORIES = ('symbol', 'pattern', 'session')
+
+def encode(values):
+    """Object array -> (int32 codes, category list)"""
+    values = np.asarray(values, dtype=object)
+    if not len(values):
+        return np.zeros(0, dtype=np.int32), []
+    categories, codes = np.unique(values.astype(str), return_inverse=True)
+    return codes.astype(np.int32), categories.tolist()
+
+def session_for(epoch):
+    """Session from a fill time: premarket before 9:30 ET, afterhours from 16:00 ET"""
+    local = datetime.fromtimestamp(epoch, MARKET_TZ)
+    minutes = local.hour * 60 + local.minute
+    if minutes < 570:
+        return 'premarket'
+    if minutes >= 960:
+        return 'afterhours'
+    return 'market'
+
+def attribute_entries(symbol, side, time):
+    """
+    Index of the entry BUY each row belongs to (its own index for buys,
+    -1 for sells with no earlier buy of the same symbol).
+    Sort by (symbol, time), carry the latest buy position forward, and drop
+    matches that crossed into another symbol.
+    """
+    n = len(side)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((time, symbol))
+    positions = np.arange(n)
+    last_buy = np.maximum.accumulate(np.where(side[order] > 0, positions, -1))
+    same_symbol = (last_buy >= 0) & (symbol[order][np.maximum(last_buy, 0)] == symbol[order])
+    entry = np.full(n, -1, dtype=np.int64)
+    entry[order] = np.where(same_symbol, order[np.maximum(last_buy, 0)], -1)
+    return entry
+
+def inherit(codes, categories, entry):
+    """Give each row the category of its entry BUY (UNKNOWN when there is none)"""
+    if UNKNOWN not in categories:
+        categories = categories + [UNKNOWN]
+    unknown = categories.index(UNKNOWN)
+    return np.where(entry >= 0, codes[np.maximum(entry, 0)], unknown).astype(np.int32), categories
+
+def parse_timestamps(values):
+    """ISO strings (journal/legacy CSV, any suffix) -> epoch seconds"""
+    trimmed = np.array([str(v)[:19].replace(' ', 'T') for v in values], dtype='datetime64[s]')
+    return trimmed.astype(np.int64).astype(float)
+
+class PerformanceAnalytics:
+    def __init__(self, source='journal', api=None, journal=None, cache_dir=None):
+        self.source = source
+        self.api = api
+        self.journal = journal
+        self.cache_dir = cache_dir or Config.ANALYTICS_CACHE_DIR
+
+    def get_journal(self):
+        if self.journal is None:
+            from trade_journal import TradeJournal
+            self.journal = TradeJournal()
+        return self.journal
+
+    def get_api(self):
+        if self.api is None:
+            import alpaca_trade_api as tradeapi
+            self.api = tradeapi.REST(
+                Config.ALPACA_API_KEY,
+                Config.ALPACA_SECRET_KEY,
+                Config.ALPACA_BASE_URL,
+                api_version='v2'
+            )
+        return self.api
+
+    # ---- loading ---------------------------------------------------------
+
+    def fingerprint(self, start, end):
+        """Cheap token that changes whenever the period's underlying fills do"""
+        if self.source == 'journal':
+            count, max_id = self.get_journal().conn.execute(
+                'SELECT COUNT(*), MAX(id) FROM trades WHERE date >= ? AND date <= ?', (start, end)
+            ).fetchone()
+            return f"{count}:{max_id}"
+
+        # Broker history for finished periods never changes; open periods always refetch
+        return 'final' if end < datetime.now(MARKET_TZ).date().isoformat() else None
+
+    def load_journal(self, start, end):
+        cursor = self.get_journal().conn.execute(
+            'SELECT timestamp, date, symbol, action, shares, price, pnl, reason, session '
+            'FROM trades WHERE date >= ? AND date <= ? ORDER BY timestamp, id', (start, end)
+        )
+
+        # Chunked fetch straight into column lists; no per-trade dicts
+        columns = [[] for _ in range(9)]
+        while True:
+            rows = cursor.fetchmany(FETCH_CHUNK)
+            if not rows:
+                break
+            for column, values in zip(columns, zip(*rows)):
+                column.extend(values)
+        timestamp, day, symbol, action, shares, price, pnl, reason, session = columns
+
+        side = np.array([1 if str(a).upper() == 'BUY' else -1 for a in action], dtype=np.int8)
+        time = parse_timestamps(timestamp)
+        symbol_codes, symbols = encode(symbol)
+        reason_codes, reasons = encode([r or UNKNOWN for r in reason])
+        session_codes, sessions = encode([s or UNKNOWN for s in session])
+
+        entry = attribute_entries(symbol_codes, side, time)
+        pattern_codes, patterns = inherit(reason_codes, reasons, entry)
+        session_codes, sessions = inherit(session_codes, sessions, entry)
+
+        data = {
+            'time': time,
+            'day': np.array(day, dtype='datetime64[D]').astype(np.int32),
+            'symbol': symbol_codes,
+            'side': side,
+            'qty': np.array([q or 0 for q in shares], dtype=float),
+            'price': np.array([p or 0 for p in price], dtype=float),
+            'pnl': np.array([np.nan if v is None else v for v in pnl], dtype=float),
+            'pattern': pattern_codes,
+            'session': session_codes
+        }
+        return data, {'symbol': symbols, 'pattern': patterns, 'session': sessions}
+
+    def load_broker(self, start, end):
+        from pnl_engine import PnLEngine, fetch_orders, fills_from_orders, market_day_bounds, match_fifo
+
+        api = self.get_api()
+        after, until = market_day_bounds(date.fromisoformat(start) - timedelta(days=1), date.fromisoformat(end))
+        fills = fills_from_orders(fetch_orders(api, after, until))
+
+        keep = (fills['date'] >= start) & (fills['date'] <= end)
+        fills = {k: v[keep] for k, v in fills.items()}
+        n = len(fills['qty'])
+
+        # FIFO per symbol from the lots open at the start of the period
+        opening_lots = PnLEngine(api).latest_lots_before(start)
+        realized = np.full(n, np.nan)
+        for symbol in np.unique(fills['symbol']) if n else []:
+            idx = np.flatnonzero(fills['symbol'] == symbol)
+            pnl, _, _ = match_fifo(opening_lots.get(symbol, []), fills['side'][idx], fills['qty'][idx], fills['price'][idx])
+            realized[idx] = np.where(fills['side'][idx] < 0, pnl, np.nan)
+
+        # Entry pattern comes from the journal row for the buy order, when we have one
+        journal_reasons = {}
+        if n:
+            try:
+                journal_reasons = dict(self.get_journal().conn.execute(
+                    "SELECT order_id, reason FROM trades WHERE action = 'BUY' AND order_id IS NOT NULL "
+                    "AND date >= ? AND date <= ?", (start, end)
+                ).fetchall())
+            except Exception as e:
+                print(f"Error reading entry patterns from journal: {e}", file=sys.stderr)
+
+        symbol_codes, symbols = encode(fills['symbol'])
+        reason_codes, reasons = encode([journal_reasons.get(i) or UNKNOWN for i in fills['id']])
+        session_codes, sessions = encode([session_for(t) for t in fills['time']])
+
+        entry = attribute_entries(symbol_codes, fills['side'], fills['time'])
+        pattern_codes, patterns = inherit(reason_codes, reasons, entry)
+        session_codes, sessions = inherit(session_codes, sessions, entry)
+
+        data = {
+            'time': fills['time'],
+            'day': np.array(fills['date'].tolist(), dtype='datetime64[D]').astype(np.int32),
+            'symbol': symbol_codes,
+            'side': fills['side'],
+            'qty': fills['qty'],
+            'price': fills['price'],
+            'pnl': realized,
+            'pattern': pattern_codes,
+            'session': session_codes
+        }
+        return data, {'symbol': symbols, 'pattern': patterns, 'session': sessions}
+
+    # ---- cache -----------------------------------------------------------
+
+    def period_dir(self, start, end):
+        return os.path.join(self.cache_dir, f"{self.source}_{start}_{end}")
+
+    def read_meta(self, path):
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_columns(self, path, data, categories, fingerprint):
+        """Write to a temp dir and swap in, so readers never see a half-written period"""
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in NUMERIC_COLUMNS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), data[name])
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'categories': categories, 'rows': len(data['time'])}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def load(self, start, end, refresh=False):
+        """Columns for [start, end]: memory-mapped from cache when still valid"""
+        fingerprint = self.fingerprint(start, end)
+        path = self.period_dir(start, end)
+        meta = self.read_meta(path)
+
+        hit = not refresh and fingerprint is not None and meta is not None and meta.get('fingerprint') == fingerprint
+        metrics.record_cache('analytics_columns', hit)
+        if hit:
+            data = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in NUMERIC_COLUMNS}
+            return data, meta['categories'], True
+
+        loader = self.load_journal if self.source == 'journal' else self.load_broker
+        data, categories = loader(start, end)
+
+        if fingerprint is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self.save_columns(path, data, categories, fingerprint)
+            except OSError as e:
+                print(f"Error caching analytics columns: {e}", file=sys.stderr)
+
+        return data, categories, False
+
+    # ---- metrics ---------------------------------------------------------
+
+    def report(self, start, end, refresh=False):
+        """Metrics for [start, end], cached alongside the columns they came from"""
+        fingerprint = self.fingerprint(start, end)
+        path = self.period_dir(start, end)
+        metrics_path = os.path.join(path, 'metrics.json')
+
+        if not refresh and fingerprint is not None:
+            try:
+                with open(metrics_path) as f:
+                    cached = json.load(f)
+                if cached.get('fingerprint') == fingerprint:
+                    cached['metrics']['cached'] = True
+                    return cached['metrics']
+            except (OSError, ValueError):
+                pass
+
+        data, categories, columns_cached = self.load(start, end, refresh)
+        stats = compute_metrics(data, categories)
+        stats.update({'start': start, 'end': end, 'source': self.source, 'cached': False})
+
+        if fingerprint is not None and os.path.isdir(path):
+            try:
+                with open(f"{metrics_path}.tmp", 'w') as f:
+                    json.dump({'fingerprint': fingerprint, 'metrics': stats}, f)
+                os.replace(f"{metrics_path}.tmp", metrics_path)
+            except OSError as e:
+                print(f"Error caching analytics metrics: {e}", file=sys.stderr)
+
+        return stats
+
+def summarize(pnl):
+    """Win/loss/expectancy stats for a vector of closed-trade P&L"""
+    n = len(pnl)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    gross_profit = float(wins.sum())
+    gross_loss = float(losses.sum())
+    return {
+        'trades': n,
+        'winning_trades': len(wins),
+        'losing_trades': len(losses),
+        'win_rate': len(wins) / n * 100 if n else 0,
+        'total_pnl': float(pnl.sum()),
+        'avg_win': float(wins.mean()) if len(wins) else 0,
+        'avg_loss': float(losses.mean()) if len(losses) else 0,
+        'expectancy': float(pnl.mean()) if n else 0,
+        'profit_factor': gross_profit / -gross_loss if gross_loss else None
+    }
+
+def breakdown(pnl, codes, categories):
+    """Per-category trade count, win rate, P&L and expectancy via bincount"""
+    if not len(pnl):
+        return {}
+    size = len(categories)
+    trades = np.bincount(codes, minlength=size)
+    wins = np.bincount(codes, weights=(pnl > 0), minlength=size)
+    total = np.bincount(codes, weights=pnl, minlength=size)
+    return {
+        categories[i]: {
+            'trades': int(trades[i]),
+            'win_rate': float(wins[i] / trades[i] * 100),
+            'total_pnl': float(total[i]),
+            'expectancy': float(total[i] / trades[i])
+        }
+        for i in np.flatnonzero(trades)
+    }
+
+def compute_metrics(data, categories):
+    """Equity curve, drawdown, risk-adjusted returns and breakdowns over closed trades"""
+    side = np.asarray(data['side'])
+    pnl_all = np.asarray(data['pnl'])
+    closed = (side < 0) & np.isfinite(pnl_all)
+
+    order = np.argsort(np.asarray(data['time'])[closed], kind='stable')
+    pnl = pnl_all[closed][order]
+    days = np.asarray(data['day'])[closed][order]
+
+    stats = summarize(pnl)
+    stats['fills'] = len(side)
+    stats['volume'] = float((np.asarray(data['qty']) * np.asarray(data['price'])).sum())
+
+    # Trade-by-trade equity (cumulative realized P&L) and drawdown from the running peak
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:]
+    drawdown = equity - peak
+    stats['max_drawdown'] = float(drawdown.min()) if len(drawdown) else 0
+
+    # Daily P&L drives Sharpe/Sortino; against fixed capital the ratios are scale-free
+    unique_days, day_index = np.unique(days, return_inverse=True)
+    daily_pnl = np.bincount(day_index, weights=pnl) if len(pnl) else np.zeros(0)
+    daily_equity = np.cumsum(daily_pnl)
+    daily_peak = np.maximum.accumulate(np.concatenate([[0.0], daily_equity]))[1:]
+
+    if len(daily_pnl) > 1 and daily_pnl.std(ddof=1) > 0:
+        stats['sharpe'] = float(daily_pnl.mean() / daily_pnl.std(ddof=1) * np.sqrt(TRADING_DAYS))
+    else:
+        stats['sharpe'] = None
+    downside = np.sqrt(np.mean(np.minimum(daily_pnl, 0) ** 2)) if len(daily_pnl) else 0
+    stats['sortino'] = float(daily_pnl.mean() / downside * np.sqrt(TRADING_DAYS)) if downside > 0 else None
+    stats['trading_days'] = len(unique_days)
+
+    stats['equity_curve'] = [
+        {
+            'date': str(np.datetime64(int(d), 'D')),
+            'pnl': float(p),
+            'equity': float(e),
+            'drawdown': float(e - pk)
+        }
+        for d, p, e, pk in zip(unique_days, daily_pnl, daily_equity, daily_peak)
+    ]
+
+    stats['by_pattern'] = breakdown(pnl, np.asarray(data['pattern'])[closed][order], categories['pattern'])
+    stats['by_session'] = breakdown(pnl, np.asarray(data['session'])[closed][order], categories['session'])
+    stats['by_symbol'] = breakdown(pnl, np.asarray(data['symbol'])[closed][order], categories['symbol'])
+    return stats
+
+def period_bounds(period, today=None):
+    today = today or datetime.now(MARKET_TZ).date()
+    if period == 'today':
+        start = today
+    elif period == 'mtd':
+        start = today.replace(day=1)
+    elif period == 'ytd':
+        start = today.replace(month=1, day=1)
+    else:
+        start = date(2000, 1, 1)
+    return start.isoformat(), today.isoformat()
+
+def main():
+    parser = argparse.ArgumentParser(description='Performance analytics over the trade history')
+    parser.add_argument('--period', choices=['today', 'mtd', 'ytd', 'all'], default='ytd')
+    parser.add_argument('--start', help='First date (YYYY-MM-DD), overrides --period')
+    parser.add_argument('--end', help='Last date (YYYY-MM-DD)')
+    parser.add_argument('--source', choices=['journal', 'broker'], default='journal',
+                        help='Trade journal (includes migrated trade_log.csv) or broker order history')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached columns and metrics')
+    args = parser.parse_args()
+
+    try:
+        start, end = period_bounds(args.period)
+        start = args.start or start
+        end = args.end or end
+
+        analytics = PerformanceAnalytics(source=args.source)
+        print(json.dumps(analytics.report(start, end, refresh=args.refresh), indent=2))
+
+    except Exception as e:
+        print(json.dumps({'error': True, 'message': f"Analytics failed: {str(e)}"}))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Bounded stage queues for the feed-to-analysis path
+At 9:30 the event rate jumps by orders of magnitude; an unbounded queue just
+moves the backlog into memory and every downstream latency with it. Each
+stage (feed -> ingestor, ingestor -> pattern analysis) hands work over
+through a StageQueue instead:
+
+    bounded     at most `capacity` items wait; the worst-case delay is
+                capacity x per-item cost, not "however far behind we got"
+    coalescing  (optional) a second update for a symbol that is still
+                waiting replaces the first, keeping its place in line, so a
+                symbol printing 500 times a second costs one analysis pass
+    priority    symbols are HIGH (positions, watchlist), NORMAL (last scan's
+                top movers) or LOW (the rest of the universe). HIGH is served
+                first; past the shed watermark new LOW items are refused, and
+                a full queue evicts its oldest lowest-priority item to make
+                room for a higher one
+
+Nothing blocks the producer: a websocket callback that waited on a full
+queue would stall the whole stream. Every merge and drop is counted in
+trading_backpressure_* metrics, and the time each item waited is observed
+per stage.
+"""
+
+import itertools
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import metrics
+from config import Config
+
+HIGH, NORMAL, LOW = range(3)
+PRIORITY_NAMES = ('high', 'normal', 'low')
+
+DEPTH = metrics.gauge('trading_backpressure_queue_depth', 'Items waiting in a stage queue', ('stage',))
+ENQUEUED = metrics.counter('trading_backpressure_enqueued_total', 'Items accepted by a stage queue', ('stage',))
+COALESCED = metrics.counter('trading_backpressure_coalesced_total',
+                            'Updates merged into one already waiting for the same symbol', ('stage',))
+DROPPED = metrics.counter('trading_backpressure_dropped_total', 'Items dropped by a stage queue',
+                          ('stage', 'reason', 'priority'))
+WAIT = metrics.histogram('trading_backpressure_wait_seconds', 'Time from an item queueing to a consumer taking it',
+                         ('stage',), buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+
+def symbol_list(value):
+    return [s.strip().upper() for s in value.split(',') if s.strip()] if value else []
+
+class Priorities:
+    """Symbol -> HIGH/NORMAL/LOW; symbols not listed get `default`"""
+
+    def __init__(self, high=(), normal=(), default=NORMAL):
+        self.levels = {symbol: NORMAL for symbol in normal}
+        self.levels.update((symbol, HIGH) for symbol in high)
+        self.default = default
+
+    def __call__(self, symbol):
+        return self.levels.get(symbol, self.default)
+
+    @classmethod
+    def load(cls, high=(), top=None):
+        """
+        HIGH for `high` plus BACKPRESSURE_PRIORITY_SYMBOLS, NORMAL for the top
+        movers in the screeners' last scan state, LOW for everything else
+        (or NORMAL for everything if there is no scan state yet)
+        """
+        import scan_state
+        top = Config.BACKPRESSURE_NORMAL_SYMBOLS if top is None else top
+        high = list(high) + symbol_list(Config.BACKPRESSURE_PRIORITY_SYMBOLS)
+        scores = {}
+        for screener in ('market', 'premarket'):
+            for symbol, entry in scan_state.ScanState(screener).symbols.items():
+                scores[symbol] = max(scores.get(symbol, 0.0), scan_state.momentum_score(entry))
+        normal = sorted(scores, key=scores.get, reverse=True)[:top]
+        return cls(high, normal, default=LOW if normal else NORMAL)
+
+class StageQueue:
+    """
+    Bounded, optionally coalescing, priority queue between two pipeline stages.
+    put() never blocks; get() blocks until an item is ready or the queue is
+    closed and drained.
+    """
+
+    def __init__(self, stage, capacity, coalesce=False, priorities=None, shed_at=None):
+        self.stage = stage
+        self.capacity = max(int(capacity), 1)
+        self.coalesce = coalesce
+        self.priorities = priorities or (lambda symbol: NORMAL)
+        shed_at = Config.BACKPRESSURE_SHED_AT if shed_at is None else shed_at
+        self.shed_above = max(int(self.capacity * shed_at), 1)
+        # One FIFO per priority; key -> [symbol, item, queued_at]
+        self.levels = [OrderedDict() for _ in PRIORITY_NAMES]
+        self.size = 0
+        self.closed = False
+        self.sequence = itertools.count()
+        self.ready = threading.Condition()
+        self.counts = Counter()
+        self.max_wait = 0.0
+
+        self.depth = DEPTH.labels(stage)
+        self.enqueued = ENQUEUED.labels(stage)
+        self.coalesced = COALESCED.labels(stage)
+        self.wait = WAIT.labels(stage)
+
+    def drop(self, reason, priority):
+        self.counts[f'dropped_{reason}'] += 1
+        DROPPED.labels(self.stage, reason, PRIORITY_NAMES[priority]).inc()
+
+    def put(self, symbol, item=None, priority=None, merge=None):
+        """
+        Queue an item for `symbol`; returns False if it was dropped. On a
+        coalescing queue an item already waiting for the symbol is replaced
+        (or combined with merge(old, new)) and keeps its place in line.
+        """
+        priority = self.priorities(symbol) if priority is None else priority
+        with self.ready:
+            if self.closed:
+                self.drop('closed', priority)
+                return False
+
+            if self.coalesce:
+                for level in self.levels:
+                    entry = level.get(symbol)
+                    if entry is not None:
+                        entry[1] = merge(entry[1], item) if merge else item
+                        self.counts['coalesced'] += 1
+                        self.coalesced.inc()
+                        return True
+
+            if priority == LOW and self.size >= self.shed_above:
+                self.drop('shed', priority)
+                return False
+            if self.size >= self.capacity:
+                victim = next((p for p in range(LOW, priority, -1) if self.levels[p]), None)
+                if victim is None:
+                    self.drop('full', priority)
+                    return False
+                self.levels[victim].popitem(last=False)
+                self.size -= 1
+                self.drop('evicted', victim)
+
+            key = symbol if self.coalesce else next(self.sequence)
+            self.levels[priority][key] = [symbol, item, time.monotonic()]
+            self.size += 1
+            self.counts['enqueued'] += 1
+            self.enqueued.inc()
+            self.depth.set(self.size)
+            self.ready.notify()
+            return True
+
+    def get(self, timeout=None):
+        """(symbol, item), highest priority first; None once closed and empty, or on timeout"""
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.size or self.closed, timeout) or not self.size:
+                return None
+            level = next(level for level in self.levels if level)
+            symbol, item, queued_at = level.popitem(last=False)[1]
+            self.size -= 1
+            self.depth.set(self.size)
+        waited = time.monotonic() - queued_at
+        self.wait.observe(waited)
+        self.max_wait = max(self.max_wait, waited)
+        return symbol, item
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        """Refuse new items; get() drains what's left, then returns None"""
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+
+    def stats(self):
+        return {
+            'stage': self.stage,
+            'capacity': self.capacity,
+            'depth': self.size,
+            'max_wait_seconds': round(self.max_wait, 4),
+            **dict(sorted(self.counts.items()))
+        }
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Activity-based bars from trade prints
+Momentum small caps trade in bursts, and fixed one-minute bars blur the
+breakouts the pattern detectors look for. BarBuilder turns a stream of trade
+prints into one of:
+
+    volume   a bar closes every `threshold` shares
+    dollar   ... every `threshold` dollars traded
+    tick     ... every `threshold` prints
+    range    ... once high - low reaches `threshold` dollars
+
+with per-symbol thresholds. Completed bars come out as the usual OHLCV
+DataFrame (plus Duration seconds and Ticks), so PatternAnalyzer.add_indicators
+and analyze_bars run on them unchanged.
+
+Prints are buffered and processed per symbol in batches. Volume, dollar and
+tick bars are cut with one cumulative sum per batch: the print where
+floor(cumsum / threshold) steps closes a bar, and whatever overshoots the
+threshold carries into the next one. OHLC then comes from reduceat over the
+segments, so a burst of thousands of prints at the open costs a handful of
+array operations. Range bars are path dependent and scan ahead one bar at a
+time with running max/min.
+
+With --analyze the pattern detectors run on a worker thread. Symbols with new
+bars wait on a coalescing backpressure.StageQueue, so however many bars a
+symbol completes during one analysis pass it is analyzed once, on its latest
+bars, and low-priority symbols are shed when analysis falls behind.
+
+Usage:
+    bar_builder.py --replay FILE --kind volume [--threshold N] [--symbols AAA,BBB] [--analyze]
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+import backpressure
+import event_stream
+import jsonlog
+import metrics
+import profiling
+import tracing
+from config import Config
+from market_feed import AlpacaStreamFeed, ReplayFeed
+
+logger = jsonlog.get_logger(__name__)
+
+KINDS = ('volume', 'dollar', 'tick', 'range')
+COLUMNS = ('Start', 'End', 'Open', 'High', 'Low', 'Close', 'Volume', 'Ticks')
+START, END, OPEN, HIGH, LOW, CLOSE, VOLUME, TICKS = range(len(COLUMNS))
+# Prints buffered before a batch is cut into bars
+BATCH_SIZE = 512
+# ... or seconds since the last batch, whichever comes first
+BATCH_SECONDS = 0.05
+
+PRINTS = metrics.counter('trading_bar_builder_prints_total', 'Trade prints consumed', ('kind',))
+BARS = metrics.counter('trading_bar_builder_bars_total', 'Bars completed', ('kind',))
+BATCH_DURATION = metrics.histogram('trading_bar_builder_batch_seconds', 'Time to cut one batch of prints into bars', ('kind',))
+
+def default_threshold(kind, snapshot=None, bars_per_day=None):
+    """
+    Threshold giving roughly bars_per_day bars on an average day, from the
+    overnight snapshot's average volume, prior close and ATR when available
+    """
+    bars_per_day = bars_per_day or Config.BAR_BUILDER_BARS_PER_DAY
+    if kind == 'tick':
+        return Config.BAR_BUILDER_TICKS
+    if snapshot:
+        if kind == 'volume' and snapshot.get('avg_volume'):
+            return max(snapshot['avg_volume'] / bars_per_day, 1.0)
+        if kind == 'dollar' and snapshot.get('avg_volume') and snapshot.get('prior_close'):
+            return max(snapshot['avg_volume'] * snapshot['prior_close'] / bars_per_day, 1.0)
+        if kind == 'range' and snapshot.get('atr'):
+            # A random walk covers a range in time proportional to its square
+            return max(snapshot['atr'] / math.sqrt(bars_per_day), 0.01)
+    return {'volume': Config.BAR_BUILDER_VOLUME, 'dollar': Config.BAR_BUILDER_DOLLARS,
+            'range': Config.BAR_BUILDER_RANGE}[kind]
+
+class SymbolBars:
+    """One symbol's open bar, measure carried into it, and completed bars"""
+
+    def __init__(self, threshold, capacity):
+        self.threshold = float(threshold)
+        self.capacity = capacity
+        self.open_bar = None      # np array in COLUMNS order, or None
+        self.filled = 0.0         # measure accumulated toward the open bar's threshold
+        self.chunks = []
+        self.rows = 0
+
+    def complete(self, bars):
+        if len(bars):
+            self.chunks.append(bars)
+            self.rows += len(bars)
+            if self.rows > 2 * self.capacity:
+                self.compact()
+
+    def compact(self):
+        bars = np.concatenate(self.chunks)[-self.capacity:] if self.chunks else np.empty((0, len(COLUMNS)))
+        self.chunks = [bars]
+        self.rows = len(bars)
+        return bars
+
+class BarBuilder:
+    def __init__(self, kind='volume', thresholds=None, default=None, capacity=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown bar kind {kind!r} (choose from {', '.join(KINDS)})")
+        self.kind = kind
+        self.thresholds = dict(thresholds or {})
+        self.default = default if default is not None else default_threshold(kind)
+        self.capacity = capacity or Config.BAR_BUILDER_CAPACITY
+        self.symbols = {}
+        # drain() and frame() may run on different threads
+        self.lock = threading.Lock()
+        self.pending = defaultdict(list)
+        self.buffered = 0
+        self.last_batch = time.monotonic()
+        self.prints = PRINTS.labels(kind)
+        self.bars_done = BARS.labels(kind)
+        self.batch_timer = BATCH_DURATION.labels(kind)
+
+    def state(self, symbol):
+        bars = self.symbols.get(symbol)
+        if bars is None:
+            bars = self.symbols[symbol] = SymbolBars(self.thresholds.get(symbol, self.default), self.capacity)
+        return bars
+
+    def on_event(self, event):
+        """Buffer a feed trade; returns symbols that completed bars if this triggered a batch"""
+        if event['type'] != 'trade':
+            return []
+        self.pending[event['symbol']].append((event['timestamp'], event['price'], event['size']))
+        self.buffered += 1
+        if self.buffered >= BATCH_SIZE or time.monotonic() - self.last_batch >= BATCH_SECONDS:
+            return self.drain()
+        return []
+
+    def drain(self):
+        """Cut every buffered print into bars; returns symbols with new completed bars"""
+        updated = []
+        with self.lock, self.batch_timer.time():
+            for symbol, prints in self.pending.items():
+                if prints:
+                    prints = np.asarray(prints, dtype=float)
+                    if self.add_trades(symbol, prints[:, 0], prints[:, 1], prints[:, 2]):
+                        updated.append(symbol)
+        self.pending.clear()
+        self.buffered = 0
+        self.last_batch = time.monotonic()
+        return updated
+
+    def add_trades(self, symbol, timestamps, prices, sizes):
+        """Consume one symbol's prints (time ordered); returns the number of bars completed"""
+        timestamps = np.asarray(timestamps, dtype=float)
+        prices = np.asarray(prices, dtype=float)
+        sizes = np.asarray(sizes, dtype=float)
+        if len(prices) == 0:
+            return 0
+        state = self.state(symbol)
+        if self.kind == 'range':
+            bars = self.cut_range(state, timestamps, prices, sizes)
+        else:
+            bars = self.cut_cumulative(state, timestamps, prices, sizes)
+        state.complete(bars)
+        self.prints.inc(len(prices))
+        self.bars_done.inc(len(bars))
+        return len(bars)
+
+    def cut_cumulative(self, state, timestamps, prices, sizes):
+        if self.kind == 'volume':
+            measure = sizes
+        elif self.kind == 'dollar':
+            measure = prices * sizes
+        else:
+            measure = np.ones_like(prices)
+
+        cumulative = state.filled + np.cumsum(measure)
+        steps = np.floor(cumulative / state.threshold)
+        # Print i closes a bar when the count of whole thresholds steps there
+        closes = np.flatnonzero(np.diff(steps, prepend=0.0) > 0)
+        state.filled = cumulative[-1] - steps[-1] * state.threshold
+
+        starts = np.concatenate([[0], closes[:-1] + 1]) if len(closes) else np.empty(0, dtype=np.int64)
+        bars = self.segments(state, starts, closes, timestamps, prices, sizes)
+        tail = closes[-1] + 1 if len(closes) else 0
+        self.extend_open(state, timestamps[tail:], prices[tail:], sizes[tail:])
+        return bars
+
+    def cut_range(self, state, timestamps, prices, sizes):
+        starts, closes = [], []
+        i, n = 0, len(prices)
+        high = state.open_bar[HIGH] if state.open_bar is not None else -np.inf
+        low = state.open_bar[LOW] if state.open_bar is not None else np.inf
+        # Look ahead a window at a time (growing it while no bar closes) so a
+        # long batch isn't rescanned to its end for every bar
+        look = 64
+        while i < n:
+            window = prices[i:i + look]
+            highs = np.maximum(np.maximum.accumulate(window), high)
+            lows = np.minimum(np.minimum.accumulate(window), low)
+            hit = np.flatnonzero(highs - lows >= state.threshold - 1e-12)
+            if len(hit) == 0:
+                if i + look >= n:
+                    break
+                look *= 2
+                continue
+            starts.append(i)
+            closes.append(i + hit[0])
+            i += hit[0] + 1
+            high, low = -np.inf, np.inf
+            look = max(64, 2 * int(hit[0]))
+        bars = self.segments(state, np.array(starts, dtype=np.int64), np.array(closes, dtype=np.int64),
+                             timestamps, prices, sizes)
+        self.extend_open(state, timestamps[i:], prices[i:], sizes[i:])
+        return bars
+
+    def segments(self, state, starts, closes, timestamps, prices, sizes):
+        """Bars for prints[starts[j]:closes[j] + 1], the first merged into the open bar"""
+        if len(closes) == 0:
+            return np.empty((0, len(COLUMNS)))
+        bars = np.empty((len(closes), len(COLUMNS)))
+        bars[:, START] = timestamps[starts]
+        bars[:, END] = timestamps[closes]
+        bars[:, OPEN] = prices[starts]
+        bars[:, HIGH] = np.maximum.reduceat(prices, starts)
+        bars[:, LOW] = np.minimum.reduceat(prices, starts)
+        bars[:, CLOSE] = prices[closes]
+        bars[:, VOLUME] = np.add.reduceat(sizes, starts)
+        bars[:, TICKS] = closes - starts + 1
+        # reduceat runs each segment to the next start; the last one must stop at its close
+        last = slice(starts[-1], closes[-1] + 1)
+        bars[-1, HIGH] = prices[last].max()
+        bars[-1, LOW] = prices[last].min()
+        bars[-1, VOLUME] = sizes[last].sum()
+
+        if state.open_bar is not None:
+            first = state.open_bar
+            bars[0, START] = first[START]
+            bars[0, OPEN] = first[OPEN]
+            bars[0, HIGH] = max(bars[0, HIGH], first[HIGH])
+            bars[0, LOW] = min(bars[0, LOW], first[LOW])
+            bars[0, VOLUME] += first[VOLUME]
+            bars[0, TICKS] += first[TICKS]
+            state.open_bar = None
+        return bars
+
+    def extend_open(self, state, timestamps, prices, sizes):
+        if len(prices) == 0:
+            return
+        if state.open_bar is None:
+            state.open_bar = np.array([timestamps[0], timestamps[-1], prices[0], prices.max(), prices.min(),
+                                       prices[-1], sizes.sum(), len(prices)])
+            return
+        bar = state.open_bar
+        bar[END] = timestamps[-1]
+        bar[HIGH] = max(bar[HIGH], prices.max())
+        bar[LOW] = min(bar[LOW], prices.min())
+        bar[CLOSE] = prices[-1]
+        bar[VOLUME] += sizes.sum()
+        bar[TICKS] += len(prices)
+
+    def frame(self, symbol, include_open=False):
+        """
+        Completed bars as an OHLCV DataFrame indexed by each bar's closing print
+        (ET), with Duration seconds and Ticks; the detectors' input shape
+        """
+        with self.lock:
+            state = self.symbols.get(symbol)
+            bars = state.compact() if state else np.empty((0, len(COLUMNS)))
+            if include_open and state and state.open_bar is not None:
+                bars = np.vstack([bars, state.open_bar])
+        index = pd.to_datetime(bars[:, END], unit='s', utc=True).tz_convert('America/New_York')
+        return pd.DataFrame({
+            'Open': bars[:, OPEN], 'High': bars[:, HIGH], 'Low': bars[:, LOW],
+            'Close': bars[:, CLOSE], 'Volume': bars[:, VOLUME],
+            'Duration': bars[:, END] - bars[:, START], 'Ticks': bars[:, TICKS]
+        }, index=index)
+
+class AnalysisWorker:
+    """Runs the pattern detectors on symbols with new bars, off the ingest thread"""
+
+    def __init__(self, builder, analyzer, events, priorities=None, min_bars=15):
+        self.builder = builder
+        self.analyzer = analyzer
+        self.events = events
+        self.min_bars = min_bars
+        self.queue = backpressure.StageQueue('analysis', Config.BACKPRESSURE_ANALYSIS_QUEUE,
+                                             coalesce=True, priorities=priorities)
+        self.analyzed = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, symbols):
+        for symbol in symbols:
+            self.queue.put(symbol)
+
+    def run(self):
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                return
+            symbol = entry[0]
+            try:
+                self.analyze(symbol)
+            except Exception as e:
+                logger.error("Error analyzing %s bars: %s", symbol, e, extra={'symbol': symbol})
+
+    def analyze(self, symbol):
+        data = self.builder.frame(symbol)
+        if len(data) < self.min_bars:
+            return
+        result = self.analyzer.analyze_bars(symbol, self.analyzer.add_indicators(symbol, data))
+        self.analyzed += 1
+        patterns = sorted(result['breakout_patterns'])
+        if patterns:
+            self.events.emit('patterns', symbol=symbol, bar_kind=self.builder.kind, patterns=patterns,
+                             signal=result['overall_signal'], price=float(result['current_price']))
+
+    def close(self):
+        """Finish whatever is still queued"""
+        self.queue.close()
+        self.thread.join()
+
+def load_thresholds(kind, symbols):
+    """Per-symbol thresholds sized from last night's snapshot"""
+    from overnight_snapshot import OvernightSnapshot
+    snapshot = OvernightSnapshot.load()
+    if snapshot is None:
+        return {}
+    return {symbol: default_threshold(kind, snapshot.get(symbol)) for symbol in symbols if snapshot.get(symbol)}
+
+def main():
+    events = event_stream.from_argv()
+    parser = argparse.ArgumentParser(description='Build volume/dollar/tick/range bars from trade prints')
+    parser.add_argument('--replay', help='Replay trades from a local NDJSON or CSV file')
+    parser.add_argument('--speed', type=float, default=0, help='Replay speed multiplier (0 = as fast as possible)')
+    parser.add_argument('--kind', choices=KINDS, default='volume')
+    parser.add_argument('--threshold', type=float, help='One threshold for every symbol (default: sized per symbol)')
+    parser.add_argument('--symbols', help='Comma-separated symbols (required for the live feed)')
+    parser.add_argument('--analyze', action='store_true', help='Run the pattern detectors on each new bar')
+    args = parser.parse_args()
+
+    metrics.start('bar_builder')
+    tracing.start('bar_builder')
+    jsonlog.setup('bar_builder')
+
+    symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else []
+    if not args.replay and not symbols:
+        print(json.dumps({'error': '--symbols is required for the live feed'}))
+        sys.exit(1)
+
+    thresholds = {} if args.threshold else load_thresholds(args.kind, symbols)
+    builder = BarBuilder(args.kind, thresholds, default=args.threshold)
+    priorities = backpressure.Priorities.load()
+    worker = None
+    if args.analyze:
+        from pattern_analyzer import PatternAnalyzer
+        worker = AnalysisWorker(builder, PatternAnalyzer(), events, priorities)
+
+    feed = (ReplayFeed(args.replay, speed=args.speed) if args.replay
+            else AlpacaStreamFeed(trades=True, priorities=priorities))
+    feed.subscribe(symbols)
+
+    started = time.perf_counter()
+    prints = 0
+    try:
+        for event in feed.events():
+            if event['type'] != 'trade':
+                continue
+            prints += 1
+            updated = builder.on_event(event)
+            if worker and updated:
+                worker.submit(updated)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
+    updated = builder.drain()
+    if worker:
+        worker.submit(updated)
+        worker.close()
+    elapsed = time.perf_counter() - started
+
+    logger.info("🧱 Built %s bars from %d prints in %.2fs", args.kind, prints, elapsed)
+    events.summary({
+        'kind': args.kind,
+        'prints': prints,
+        'prints_per_second': round(prints / elapsed) if elapsed > 0 else None,
+        'analyzed': worker.analyzed if worker else None,
+        'backpressure': [q.stats() for q in (getattr(feed, 'queue', None), worker and worker.queue) if q is not None],
+        'symbols': {symbol: {'threshold': state.threshold, 'bars': len(state.compact())}
+                    for symbol, state in sorted(builder.symbols.items())}
+    })
+
+if __name__ == "__main__":
+    profiling.run(main, 'bar_builder')
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Streaming one-minute bar store
+A long-running ingestor consumes trade and bar events from a market_feed
+(the Alpaca websocket, or a replay file standing in for it) and keeps the
+last BAR_STREAM_CAPACITY one-minute bars per symbol in a memory-mapped file
+(BAR_STREAM_PATH; put it on /dev/shm for a RAM-only store):
+
+    meta      version, slots, capacity, heartbeat (epoch seconds)
+    names     symbol per slot
+    counts    bars committed per slot (ring position = count % capacity)
+    partial   the in-progress bar per slot, updated on every trade
+    data      (slots, 6, 2 x capacity) timestamp/open/high/low/close/volume
+
+Each bar is written twice, at pos and pos + capacity, so the newest N bars
+are always one contiguous slice: readers in any process get zero-copy
+NumPy views with no wrap-around handling. Memory is fixed at creation.
+A view's oldest element is overwritten when that symbol's next bar lands;
+copy() anything held longer than a minute.
+
+Screeners, pattern analysis and the position monitor read it through the
+'stream' market data provider (MARKET_DATA_PROVIDER=stream), which falls
+back to BAR_STREAM_FALLBACK for symbols and periods the stream doesn't cover
+or when the ingestor's heartbeat is stale.
+
+The live feed hands events over through a bounded backpressure.StageQueue:
+if the ingestor falls behind at the open, trades for low-priority symbols
+are shed first, and the feed's minute bars (never shed) replace the bars
+those trades would have built.
+
+Usage:
+    bar_stream.py                               # ingest the live Alpaca stream
+    bar_stream.py --replay FILE [--speed 1]     # ingest a local NDJSON/CSV replay
+    bar_stream.py --symbols AAA,BBB --no-seed
+    bar_stream.py status                        # JSON: heartbeat age, bars per symbol
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import backpressure
+import jsonlog
+import metrics
+import profiling
+import tracing
+from config import Config
+from market_feed import AlpacaStreamFeed, ReplayFeed
+
+logger = jsonlog.get_logger(__name__)
+
+VERSION = 1
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(COLUMNS))
+NAME_DTYPE = 'S16'
+# Seconds past a minute's end before a trade-built bar is committed without a later trade
+FLUSH_GRACE = 2.0
+
+EVENTS = metrics.counter('trading_bar_stream_events_total', 'Feed events ingested', ('type',))
+LATE = metrics.counter('trading_bar_stream_late_total', 'Events for minutes already committed')
+LAG = metrics.gauge('trading_bar_stream_lag_seconds', 'Wall clock minus the latest event timestamp')
+
+def layout(slots, capacity):
+    """Byte offsets of each array in the file, plus the total size"""
+    offsets = {}
+    size = 0
+    for name, dtype, shape in (('meta', np.float64, (4,)),
+                               ('names', NAME_DTYPE, (slots,)),
+                               ('counts', np.int64, (slots,)),
+                               ('partial', np.float64, (slots, len(COLUMNS))),
+                               ('data', np.float64, (slots, len(COLUMNS), 2 * capacity))):
+        size = -(-size // 8) * 8  # keep every array 8-byte aligned
+        offsets[name] = (size, dtype, shape)
+        size += int(np.dtype(dtype).itemsize * np.prod(shape))
+    return offsets, size
+
+class BarStore:
+    def __init__(self, path, arrays, writable):
+        self.path = path
+        self.writable = writable
+        self.meta = arrays['meta']
+        self.names = arrays['names']
+        self.counts = arrays['counts']
+        self.partial = arrays['partial']
+        self.data = arrays['data']
+        self.capacity = int(self.meta[2])
+        self.slots = {}
+        self.refresh_slots()
+
+    @classmethod
+    def map(cls, path, mode):
+        meta = np.memmap(path, dtype=np.float64, mode='r', shape=(4,))
+        if int(meta[0]) != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} bar store")
+        offsets, _ = layout(int(meta[1]), int(meta[2]))
+        arrays = {name: np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=shape)
+                  for name, (offset, dtype, shape) in offsets.items()}
+        return cls(path, arrays, mode != 'r')
+
+    @classmethod
+    def create(cls, path=None, slots=None, capacity=None):
+        """New empty store, swapped in atomically for readers that open after this"""
+        path = path or Config.BAR_STREAM_PATH
+        slots = slots or Config.BAR_STREAM_SLOTS
+        capacity = capacity or Config.BAR_STREAM_CAPACITY
+        offsets, size = layout(slots, capacity)
+        tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.truncate(size)
+        meta = np.memmap(tmp_path, dtype=np.float64, mode='r+', shape=(4,))
+        meta[:] = (VERSION, slots, capacity, time.time())
+        partial = np.memmap(tmp_path, dtype=np.float64, mode='r+', offset=offsets['partial'][0],
+                            shape=offsets['partial'][2])
+        partial[:] = np.nan
+        meta.flush()
+        partial.flush()
+        del meta, partial
+        os.replace(tmp_path, path)
+        return cls.map(path, 'r+')
+
+    @classmethod
+    def open(cls, path=None):
+        """Read-only view of a running ingestor's store, or None if there isn't one"""
+        path = path or Config.BAR_STREAM_PATH
+        try:
+            return cls.map(path, 'r')
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error("Error opening bar store %s: %s", path, e)
+            return None
+
+    def refresh_slots(self):
+        """Pick up symbols the ingestor added since the last look"""
+        for slot in range(len(self.slots), len(self.names)):
+            name = bytes(self.names[slot]).rstrip(b'\0').decode()
+            if not name:
+                break
+            self.slots[name] = slot
+
+    def slot(self, symbol):
+        if symbol not in self.slots and not self.writable:
+            self.refresh_slots()
+        return self.slots.get(symbol)
+
+    def add(self, symbol):
+        slot = self.slots.get(symbol)
+        if slot is None:
+            if len(self.slots) >= len(self.names):
+                raise ValueError(f"Bar store is full ({len(self.names)} symbols)")
+            slot = len(self.slots)
+            self.names[slot] = symbol.encode()
+            self.slots[symbol] = slot
+        return slot
+
+    @property
+    def heartbeat(self):
+        return float(self.meta[3])
+
+    def beat(self, now=None):
+        self.meta[3] = time.time() if now is None else now
+
+    def fresh(self, max_age=None):
+        max_age = Config.BAR_STREAM_STALE_SECONDS if max_age is None else max_age
+        return time.time() - self.heartbeat <= max_age
+
+    def append(self, slot, bar):
+        """Commit a finished bar: both copies first, then publish via the count"""
+        count = int(self.counts[slot])
+        pos = count % self.capacity
+        self.data[slot, :, pos] = bar
+        self.data[slot, :, pos + self.capacity] = bar
+        self.counts[slot] = count + 1
+
+    def replace_last(self, slot, bar):
+        """Overwrite the newest committed bar in place (both copies)"""
+        pos = (int(self.counts[slot]) - 1) % self.capacity
+        self.data[slot, :, pos] = bar
+        self.data[slot, :, pos + self.capacity] = bar
+
+    def window(self, symbol, n=None):
+        """Zero-copy (6, n) view of the newest n committed bars (rows are COLUMNS), or None"""
+        slot = self.slot(symbol)
+        if slot is None:
+            return None
+        count = int(self.counts[slot])
+        size = min(count, self.capacity)
+        n = size if n is None else min(n, size)
+        end = count % self.capacity + self.capacity
+        return self.data[slot, :, end - n:end]
+
+    def latest(self, symbol):
+        """The in-progress bar as a dict, or None between trades"""
+        slot = self.slot(symbol)
+        if slot is None or math.isnan(self.partial[slot, TIMESTAMP]):
+            return None
+        return dict(zip(COLUMNS, self.partial[slot].tolist()))
+
+    def frame(self, symbol, include_partial=True):
+        """Committed bars (plus the in-progress one) as an OHLCV DataFrame on ET timestamps"""
+        window = self.window(symbol)
+        if window is None:
+            return None
+        rows = window
+        partial = self.latest(symbol) if include_partial else None
+        if partial is not None and (rows.shape[1] == 0 or partial['timestamp'] > rows[TIMESTAMP, -1]):
+            rows = np.column_stack([rows, [partial[c] for c in COLUMNS]])
+        index = pd.to_datetime(rows[TIMESTAMP], unit='s', utc=True).tz_convert('America/New_York')
+        return pd.DataFrame({'Open': rows[OPEN], 'High': rows[HIGH], 'Low': rows[LOW],
+                             'Close': rows[CLOSE], 'Volume': rows[VOLUME]}, index=index)
+
+    def status(self):
+        symbols = {}
+        for symbol, slot in sorted(self.slots.items()):
+            count = int(self.counts[slot])
+            window = self.window(symbol, 1)
+            symbols[symbol] = {
+                'bars': min(count, self.capacity),
+                'committed': count,
+                'last_bar': float(window[TIMESTAMP, 0]) if window.shape[1] else None,
+                'partial': self.latest(symbol)
+            }
+        return {
+            'path': self.path,
+            'capacity': self.capacity,
+            'slots': len(self.names),
+            'heartbeat_age_seconds': round(time.time() - self.heartbeat, 3),
+            'fresh': self.fresh(),
+            'symbols': symbols
+        }
+
+class BarAggregator:
+    """Turns feed events into committed one-minute bars in a BarStore"""
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.last = {}
+
+    def subscribe(self, symbols):
+        with self.lock:
+            for symbol in symbols:
+                slot = self.store.add(symbol)
+                window = self.store.window(symbol, 1)
+                self.last[slot] = float(window[TIMESTAMP, 0]) if window.shape[1] else -math.inf
+
+    def seed(self, symbol, frame):
+        """Fill a symbol's ring from history (e.g. today's bars before the stream started)"""
+        with self.lock:
+            slot = self.store.slots[symbol]
+            for ts, row in zip(frame.index, frame.itertuples(index=False)):
+                minute = ts.timestamp() // 60 * 60
+                if minute > self.last[slot] and not math.isnan(row.Close):
+                    self.store.append(slot, (minute, row.Open, row.High, row.Low, row.Close, row.Volume))
+                    self.last[slot] = minute
+
+    def commit_partial(self, slot):
+        partial = self.store.partial[slot]
+        if math.isnan(partial[TIMESTAMP]):
+            return
+        self.store.append(slot, partial.copy())
+        self.last[slot] = float(partial[TIMESTAMP])
+        partial[:] = np.nan
+
+    def on_event(self, event):
+        slot = self.store.slots.get(event['symbol'])
+        if slot is None:
+            return
+        EVENTS.labels(event['type']).inc()
+        minute = event['timestamp'] // 60 * 60
+
+        with self.lock:
+            if event['type'] == 'bar' and minute == self.last[slot]:
+                # The feed sends a minute's bar after the minute ends, usually after the
+                # next minute's first trade has committed the trade-built one: replace it
+                self.store.replace_last(slot, (minute, event['open'], event['high'], event['low'],
+                                               event['close'], event['volume']))
+                return
+            if minute <= self.last[slot]:
+                LATE.inc()
+                return
+            partial = self.store.partial[slot]
+            if event['type'] == 'trade' and minute < partial[TIMESTAMP]:
+                # An out-of-order print for a minute older than the one in progress
+                LATE.inc()
+                return
+            if not math.isnan(partial[TIMESTAMP]) and partial[TIMESTAMP] < minute:
+                self.commit_partial(slot)
+
+            if event['type'] == 'bar':
+                # A finished bar from the feed supersedes whatever trades built for that minute
+                if partial[TIMESTAMP] == minute:
+                    partial[:] = np.nan
+                self.store.append(slot, (minute, event['open'], event['high'], event['low'],
+                                         event['close'], event['volume']))
+                self.last[slot] = minute
+            elif math.isnan(partial[TIMESTAMP]):
+                price = event['price']
+                partial[:] = (minute, price, price, price, price, event['size'])
+            else:
+                price = event['price']
+                partial[HIGH] = max(partial[HIGH], price)
+                partial[LOW] = min(partial[LOW], price)
+                partial[CLOSE] = price
+                partial[VOLUME] += event['size']
+
+    def flush(self, now):
+        """Commit trade-built bars whose minute has ended (for symbols that went quiet)"""
+        with self.lock:
+            ended = np.flatnonzero(self.store.partial[:, TIMESTAMP] + 60 + FLUSH_GRACE <= now)
+            for slot in ended:
+                self.commit_partial(slot)
+
+class Ingestor:
+    def __init__(self, feed, store, live=True):
+        self.feed = feed
+        self.store = store
+        self.aggregator = BarAggregator(store)
+        self.live = live
+        self.stopped = threading.Event()
+
+    def track(self, symbols, seed=True):
+        self.aggregator.subscribe(symbols)
+        if seed:
+            import market_data
+            provider = market_data.get_provider(Config.BAR_STREAM_FALLBACK)
+            try:
+                for symbol in symbols:
+                    self.aggregator.seed(symbol, provider.history(symbol, period='1d', interval='1m', prepost=True))
+            except Exception as e:
+                logger.error("Error seeding bar stream: %s", e)
+        self.feed.subscribe(symbols)
+
+    def tick(self):
+        """Once a second: flush quiet minutes and prove the ingestor is alive"""
+        while not self.stopped.wait(1.0):
+            now = time.time()
+            self.aggregator.flush(now)
+            self.store.beat(now)
+
+    def run(self):
+        ticker = None
+        if self.live:
+            ticker = threading.Thread(target=self.tick, daemon=True)
+            ticker.start()
+        events = 0
+        latest = 0.0
+        try:
+            for event in self.feed.events():
+                self.aggregator.on_event(event)
+                events += 1
+                latest = max(latest, event['timestamp'])
+                if not self.live:
+                    self.store.beat()
+                elif events % 100 == 0:
+                    LAG.set(time.time() - latest)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopped.set()
+            self.feed.close()
+            # Replays end mid-minute; commit what they built
+            self.aggregator.flush(math.inf)
+            self.store.beat()
+        return {'events': events, 'latest_event': latest or None, **self.store.status()}
+
+def default_symbols():
+    from overnight_snapshot import universe
+    return universe()
+
+def main():
+    if sys.argv[1:] == ['status']:
+        store = BarStore.open()
+        if store is None:
+            print(json.dumps({'error': 'No bar stream running'}))
+            sys.exit(1)
+        print(json.dumps(store.status(), indent=2))
+        return
+
+    parser = argparse.ArgumentParser(description='Stream one-minute bars into shared ring buffers')
+    parser.add_argument('--replay', help='Replay events from a local NDJSON or CSV file')
+    parser.add_argument('--speed', type=float, default=0, help='Replay speed multiplier (0 = as fast as possible)')
+    parser.add_argument('--symbols', help='Comma-separated symbols (default: the screeners\' universe)')
+    parser.add_argument('--no-seed', action='store_true', help="Don't fill rings from today's history first")
+    args = parser.parse_args()
+
+    metrics.start('bar_stream')
+    tracing.start('bar_stream')
+    jsonlog.setup('bar_stream')
+
+    symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else default_symbols()
+    feed = (ReplayFeed(args.replay, speed=args.speed) if args.replay
+            else AlpacaStreamFeed(priorities=backpressure.Priorities.load()))
+    store = BarStore.create(slots=max(Config.BAR_STREAM_SLOTS, len(symbols)))
+    ingestor = Ingestor(feed, store, live=not args.replay)
+    ingestor.track(symbols, seed=not args.no_seed)
+
+    logger.info("📡 Streaming bars for %d symbols into %s", len(symbols), store.path)
+    result = ingestor.run()
+    result.pop('symbols', None)
+    if isinstance(feed, AlpacaStreamFeed):
+        result['backpressure'] = feed.queue.stats()
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    profiling.run(main, 'bar_stream')
@@ -2,16 +2,31 @@
 """
 SELL ALL POSITIONS
 Closes all open positions in Alpaca account
+
+Usage:
+    close_all_positions.py          # interactive, asks for confirmation
+    close_all_positions.py --json   # kill switch: no prompt, JSON summary on stdout
 """
 
+import argparse
+import contextlib
+import json
+import sys
+import time
 import alpaca_trade_api as tradeapi
 from config import API_KEY, SECRET_KEY, BASE_URL
-from datetime import datetime
+import metrics
+import scheduler
+import tracing
+from trade_journal import TradeJournal
+from risk_engine import RiskEngine
+from datetime import datetime, timezone
 
 class PositionCloser:
     def __init__(self):
         # Initialize Alpaca API
-        self.api = tradeapi.REST(API_KEY, SECRET_KEY, BASE_URL, api_version='v2')
+        self.api = metrics.instrument(tradeapi.REST(API_KEY, SECRET_KEY, BASE_URL, api_version='v2'))
+        self.journal = TradeJournal()
     
     def get_all_positions(self):
         """Get all current positions"""
@@ -108,6 +123,8 @@ class PositionCloser:
                 # Log the close
                 self.log_close(result)
         
+        self.release_exposure([pos['symbol'] for pos in closed_positions])
+        
         # Summary
         print(f"\n🏁 CLOSING SUMMARY:")
         print(f"   Positions Closed: {len(closed_positions)}/{len(positions)}")
@@ -125,23 +142,149 @@ class PositionCloser:
         
         return closed_positions
     
+    def flatten_all(self, timeout=30.0, poll_interval=0.25):
+        """
+        Emergency flatten: cancel every open order and close every position
+        through the bulk endpoint, then poll until the account is flat.
+        """
+        started = time.perf_counter()
+        started_at = datetime.now(timezone.utc)
+        
+        positions = self.get_all_positions()
+        summary = {
+            'positions_found': len(positions),
+            'positions_closed': 0,
+            'positions_remaining': 0,
+            'total_pnl': 0.0,
+            'flat': False,
+            'time_to_submit_ms': None,
+            'time_to_flat_ms': None,
+            'closed': [],
+            'errors': []
+        }
+        
+        if not positions:
+            summary['flat'] = True
+            summary['time_to_flat_ms'] = 0.0
+            return summary
+        
+        # One call cancels open orders and submits market closes for everything
+        try:
+            self.api.close_all_positions(cancel_orders=True)
+        except Exception as e:
+            # Nothing was closed: every position is still open
+            summary['errors'].append(f"Bulk close failed: {e}")
+            summary['positions_remaining'] = len(positions)
+            return summary
+        summary['time_to_submit_ms'] = (time.perf_counter() - started) * 1000
+        
+        # Confirm by polling positions until none are left
+        remaining = positions
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                remaining = self.api.list_positions()
+            except Exception as e:
+                summary['errors'].append(f"Error polling positions: {e}")
+            if not remaining:
+                summary['flat'] = True
+                summary['time_to_flat_ms'] = (time.perf_counter() - started) * 1000
+                break
+            time.sleep(poll_interval)
+        
+        # Realized P&L from the actual fills of the closing orders: volume-weighted
+        # over every fill on the closing side (a close can fill across several orders)
+        filled = {}
+        try:
+            closing_orders = self.api.list_orders(status='closed', after=started_at.isoformat(), limit=500)
+            for order in closing_orders:
+                qty = float(order.filled_qty or 0)
+                if order.filled_avg_price and qty > 0:
+                    shares, notional = filled.get((order.symbol, order.side), (0.0, 0.0))
+                    filled[(order.symbol, order.side)] = (shares + qty, notional + qty * float(order.filled_avg_price))
+        except Exception as e:
+            summary['errors'].append(f"Error fetching fills: {e}")
+        
+        remaining_symbols = {p.symbol for p in remaining}
+        for position in positions:
+            if position.symbol in remaining_symbols:
+                continue
+            
+            qty = abs(float(position.qty))
+            side = 'sell' if float(position.qty) > 0 else 'buy'
+            # Only sells close a long and only buys cover a short
+            shares, notional = filled.get((position.symbol, side), (0.0, 0.0))
+            fill_price = notional / shares if shares else None
+            if fill_price is not None:
+                direction = 1 if side == 'sell' else -1
+                pnl = (fill_price - float(position.avg_entry_price)) * qty * direction
+            else:
+                pnl = float(position.unrealized_pl)
+            
+            result = {
+                'symbol': position.symbol,
+                'qty': qty,
+                'side': side,
+                'fill_price': fill_price,
+                'market_value': float(position.market_value),
+                'pnl': pnl
+            }
+            summary['closed'].append(result)
+            summary['total_pnl'] += pnl
+            self.log_close(result)
+        
+        summary['positions_closed'] = len(summary['closed'])
+        summary['positions_remaining'] = len(remaining_symbols)
+        self.release_exposure([result['symbol'] for result in summary['closed']])
+        
+        return summary
+    
+    def release_exposure(self, symbols):
+        """Free closed positions in the shared risk state"""
+        if not symbols:
+            return
+        try:
+            RiskEngine().record_closes(symbols)
+        except Exception as e:
+            print(f"⚠️  Error updating risk state: {e}")
+    
     def log_close(self, close_result):
-        """Log the position close to CSV"""
+        """Record the position close in the trade journal"""
         try:
-            with open('trade_log.csv', 'a') as f:
-                # Write trade data
-                timestamp = datetime.now().isoformat()
-                f.write(f"{timestamp},{close_result['symbol']},SELL,"
-                       f"{close_result['qty']},MARKET,"
-                       f"{close_result['market_value']:.2f},,,"
-                       f"{close_result['pnl']:+.2f},CLOSE_POSITION\\n")
-                       
+            qty = close_result['qty']
+            # Shorts carry a negative market value
+            price = close_result.get('fill_price') or (abs(close_result['market_value']) / qty if qty else None)
+            self.journal.append({
+                'symbol': close_result['symbol'],
+                'action': 'SELL' if close_result['side'] == 'sell' else 'BUY',
+                'shares': qty,
+                'price': price,
+                'value': close_result['market_value'],
+                'pnl': close_result['pnl'],
+                'reason': 'CLOSE_POSITION'
+            })
+            
         except Exception as e:
             print(f"⚠️  Error logging close: {e}")
 
 def main():
+    metrics.start('close_all_positions')
+    tracing.start('close_all_positions')
+    parser = argparse.ArgumentParser(description='Close all open positions')
+    parser.add_argument('--json', action='store_true', help='Non-interactive flatten with a JSON summary')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for the account to go flat')
+    args = parser.parse_args()
+    
     closer = PositionCloser()
     
+    if args.json:
+        # Keep stdout clean for Node; any human-readable output goes to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = closer.flatten_all(timeout=args.timeout)
+        # Exit 0 even when not flat: Node reads `flat` and would lose the summary on a failure exit
+        print(json.dumps(summary, indent=2))
+        return
+    
     print("🚨 POSITION CLOSER")
     print("This will close ALL open positions")
     print("=" * 40)
@@ -149,4 +292,4 @@ def main():
     closer.close_all_positions()
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'close_all_positions')
@@ -15,6 +15,88 @@ class Config:
     
     # Alpha Vantage API key for news sentiment
     ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
+    
+    # Pre-trade risk limits
+    MAX_CONCURRENT_POSITIONS = int(os.getenv("MAX_CONCURRENT_POSITIONS", "10"))
+    MAX_SYMBOL_ALLOCATION_PCT = float(os.getenv("MAX_SYMBOL_ALLOCATION_PCT", "100"))
+    MAX_SYMBOL_NOTIONAL = float(os.getenv("MAX_SYMBOL_NOTIONAL", "0"))  # 0 = no cap
+    RISK_STATE_FILE = os.getenv("RISK_STATE_FILE", "risk_state.json")
+    RISK_STATE_TTL = int(os.getenv("RISK_STATE_TTL", "300"))  # seconds before resync
+    
+    # Trade journal (SQLite) and the legacy CSV it migrates from
+    TRADE_JOURNAL_DB = os.getenv("TRADE_JOURNAL_DB", "trade_journal.db")
+    TRADE_LOG_CSV = os.getenv("TRADE_LOG_CSV", "trade_log.csv")
+    DAILY_STATS_FILE = os.getenv("DAILY_STATS_FILE", "daily_stats.json")
+    
+    # Local order store kept current by incremental sync
+    ORDER_STORE_DB = os.getenv("ORDER_STORE_DB", "orders.db")
+    
+    # Memory-mapped columnar cache for performance analytics
+    ANALYTICS_CACHE_DIR = os.getenv("ANALYTICS_CACHE_DIR", "analytics_cache")
+    
+    # Telemetry: per-run Prometheus dumps, or a live endpoint when a port is set
+    METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    
+    # Opt-in profiling (PROFILE=1 or --profile); output lands in PROFILE_DIR
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_TRACE_DEPTH = int(os.getenv("PROFILE_TRACE_DEPTH", "1"))
+    
+    # Span traces (Chrome trace-event JSON), one file per process per trace
+    TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+    
+    # Structured logging: JSON lines on stderr via a buffered writer thread
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # e.g. "pattern_analyzer=DEBUG,monitor_positions=WARNING"
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "auto")  # json, text, or auto (text on a terminal)
+    LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "10000"))
+    LOG_FLUSH_MS = float(os.getenv("LOG_FLUSH_MS", "100"))
+    
+    # Job scheduler: single-flight locks, priority slots and shared results
+    SCHEDULER_DIR = os.getenv("SCHEDULER_DIR", "scheduler")
+    SCHEDULER_SLOTS = int(os.getenv("SCHEDULER_SLOTS", "2"))  # concurrent non-exit jobs
+    SCHEDULER_COALESCE_TIMEOUT = float(os.getenv("SCHEDULER_COALESCE_TIMEOUT", "300"))  # seconds to wait on a twin
+    
+    # Screener time budget and per-symbol momentum kept between scans
+    SCAN_DEADLINE_SECONDS = float(os.getenv("SCAN_DEADLINE_SECONDS", "0"))  # 0 = no limit
+    SCAN_STATE_DIR = os.getenv("SCAN_STATE_DIR", "scan_state")
+
+    # Overnight indicator snapshot for the premarket warm start
+    OVERNIGHT_SNAPSHOT = os.getenv("OVERNIGHT_SNAPSHOT", "overnight_snapshot.npz")
+    OVERNIGHT_SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("OVERNIGHT_SNAPSHOT_MAX_AGE_HOURS", "72"))  # covers weekends
+
+    # Market data provider: yfinance, alpaca, polygon, replay or stream (bar_stream.py, see BAR_STREAM_*)
+    MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+    MARKET_DATA_REPLAY = os.getenv("MARKET_DATA_REPLAY", "replay/bars.ndjson")  # replay provider's recording
+    ALPACA_DATA_FEED = os.getenv("ALPACA_DATA_FEED", "iex")  # iex (free) or sip
+    POLYGON_REQUESTS_PER_MINUTE = int(os.getenv("POLYGON_REQUESTS_PER_MINUTE", "5"))
+
+    # Streaming bar store (bar_stream.py); /dev/shm keeps it in RAM
+    BAR_STREAM_PATH = os.getenv("BAR_STREAM_PATH", "bar_stream.dat")
+    BAR_STREAM_CAPACITY = int(os.getenv("BAR_STREAM_CAPACITY", "960"))  # bars per symbol (one extended session)
+    BAR_STREAM_SLOTS = int(os.getenv("BAR_STREAM_SLOTS", "256"))  # symbols the store can hold
+    BAR_STREAM_STALE_SECONDS = float(os.getenv("BAR_STREAM_STALE_SECONDS", "10"))  # heartbeat age before falling back
+    BAR_STREAM_FALLBACK = os.getenv("BAR_STREAM_FALLBACK", "yfinance")  # provider for what the stream doesn't cover
+
+    # Activity bars (bar_builder.py); fallbacks when the overnight snapshot can't size them
+    BAR_BUILDER_BARS_PER_DAY = float(os.getenv("BAR_BUILDER_BARS_PER_DAY", "390"))  # target bars on an average day
+    BAR_BUILDER_VOLUME = float(os.getenv("BAR_BUILDER_VOLUME", "10000"))  # shares per volume bar
+    BAR_BUILDER_DOLLARS = float(os.getenv("BAR_BUILDER_DOLLARS", "50000"))  # dollars per dollar bar
+    BAR_BUILDER_RANGE = float(os.getenv("BAR_BUILDER_RANGE", "0.05"))  # high-low dollars per range bar
+    BAR_BUILDER_TICKS = int(os.getenv("BAR_BUILDER_TICKS", "100"))  # prints per tick bar
+    BAR_BUILDER_CAPACITY = int(os.getenv("BAR_BUILDER_CAPACITY", "2000"))  # completed bars kept per symbol
+
+    # Backpressure between the feed, the ingestors and pattern analysis (backpressure.py)
+    BACKPRESSURE_FEED_QUEUE = int(os.getenv("BACKPRESSURE_FEED_QUEUE", "50000"))  # feed events waiting for the ingestor
+    BACKPRESSURE_ANALYSIS_QUEUE = int(os.getenv("BACKPRESSURE_ANALYSIS_QUEUE", "256"))  # symbols waiting for analysis
+    BACKPRESSURE_SHED_AT = float(os.getenv("BACKPRESSURE_SHED_AT", "0.5"))  # fill ratio past which low-priority items are refused
+    BACKPRESSURE_PRIORITY_SYMBOLS = os.getenv("BACKPRESSURE_PRIORITY_SYMBOLS", "")  # comma-separated, never shed
+    BACKPRESSURE_NORMAL_SYMBOLS = int(os.getenv("BACKPRESSURE_NORMAL_SYMBOLS", "50"))  # last scan's top movers kept at normal priority
+
+    # Time-of-day volume baselines (relative volume)
+    VOLUME_PROFILE_DIR = os.getenv("VOLUME_PROFILE_DIR", "volume_profile")
+    VOLUME_PROFILE_SESSIONS = int(os.getenv("VOLUME_PROFILE_SESSIONS", "20"))
 
 # Legacy support - keep these for backward compatibility
 API_KEY = Config.ALPACA_API_KEY
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Running daily trading statistics
+Counters, sums and min/max are updated as each fill arrives and checkpointed
+to disk, so reading today's stats is O(1) at any moment. Days are Eastern
+market days, the same buckets the P&L engine and order sync use.
+
+Fills come from order sync (order_sync.py): entries, profit targets, stops
+and closes all count once the broker has filled them, at their fill price.
+Each order is counted once however many syncs see it.
+
+Usage:
+    daily_stats.py              # sync orders, then print today's stats as JSON
+    daily_stats.py --no-sync    # print the checkpoint as it is
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import Config
+from pnl_engine import MARKET_TZ, market_today
+
+class RunningDailyStats:
+    def __init__(self, checkpoint_file=None):
+        self.checkpoint_file = checkpoint_file or Config.DAILY_STATS_FILE
+        self.reset(market_today().isoformat())
+        self.load()
+
+    def reset(self, day):
+        self.date = day
+        self.fills = 0
+        self.buys = 0
+        self.sells = 0
+        self.wins = 0
+        self.losses = 0
+        self.volume = 0.0
+        self.total_pnl = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.max_win = None
+        self.max_loss = None
+        self.pnl_by_symbol = {}
+        self.order_ids = []
+        self.updated_at = None
+
+    @contextmanager
+    def locked(self):
+        """Serialize read-modify-write across the processes that record fills"""
+        with open(f"{self.checkpoint_file}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self):
+        try:
+            with open(self.checkpoint_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        # Yesterday's checkpoint is stale; start today from zero
+        if state.get('date') != self.date:
+            return
+
+        for key, value in state.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+    def checkpoint(self):
+        state = {
+            'date': self.date,
+            'fills': self.fills,
+            'buys': self.buys,
+            'sells': self.sells,
+            'wins': self.wins,
+            'losses': self.losses,
+            'volume': self.volume,
+            'total_pnl': self.total_pnl,
+            'gross_profit': self.gross_profit,
+            'gross_loss': self.gross_loss,
+            'max_win': self.max_win,
+            'max_loss': self.max_loss,
+            'pnl_by_symbol': self.pnl_by_symbol,
+            'order_ids': self.order_ids,
+            'updated_at': self.updated_at
+        }
+        tmp_path = f"{self.checkpoint_file}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.checkpoint_file)
+        except OSError as e:
+            print(f"Error saving daily stats checkpoint: {e}", file=sys.stderr)
+
+    def record(self, fills):
+        """Apply fills on top of the latest checkpoint and persist"""
+        with self.locked():
+            self.reset(market_today().isoformat())
+            self.load()
+            applied = sum(1 for fill in fills if self.apply(fill))
+            if applied:
+                self.checkpoint()
+        return applied
+
+    def on_fill(self, fill):
+        return self.record([fill]) > 0
+
+    def apply(self, fill):
+        """
+        Fold one fill into today's aggregates in memory.
+        fill: dict with action/side, shares/qty, price, optional value, pnl,
+        order_id and the Eastern market date (or an ET timestamp)
+        """
+        day = str(fill.get('date') or fill.get('timestamp') or market_today().isoformat())[:10]
+        if day < self.date:
+            return False
+        if day > self.date:
+            self.reset(day)
+
+        order_id = fill.get('order_id')
+        if order_id:
+            if order_id in self.order_ids:
+                return False
+            self.order_ids.append(order_id)
+
+        side = str(fill.get('action') or fill.get('side') or '').upper()
+        qty = float(fill.get('shares') or fill.get('qty') or 0)
+        price = float(fill.get('price') or 0)
+        value = fill.get('value')
+        value = float(value) if value is not None else qty * price
+
+        self.fills += 1
+        self.volume += value
+
+        if side == 'BUY':
+            self.buys += 1
+        elif side == 'SELL':
+            self.sells += 1
+            pnl = fill.get('pnl')
+            if pnl is not None:
+                pnl = float(pnl)
+                self.total_pnl += pnl
+                symbol = fill.get('symbol')
+                if symbol:
+                    self.pnl_by_symbol[symbol] = self.pnl_by_symbol.get(symbol, 0.0) + pnl
+                if pnl > 0:
+                    self.wins += 1
+                    self.gross_profit += pnl
+                    self.max_win = pnl if self.max_win is None else max(self.max_win, pnl)
+                elif pnl < 0:
+                    self.losses += 1
+                    self.gross_loss += pnl
+                    self.max_loss = pnl if self.max_loss is None else min(self.max_loss, pnl)
+
+        self.updated_at = datetime.now(MARKET_TZ).isoformat()
+        return True
+
+    def snapshot(self):
+        """Current stats in the shape the dashboard and SMS summary use"""
+        return {
+            'date': self.date,
+            'totalTrades': self.sells,
+            'winningTrades': self.wins,
+            'losingTrades': self.losses,
+            'winRate': self.wins / self.sells * 100 if self.sells else 0,
+            'totalPnL': self.total_pnl,
+            'avgWin': self.gross_profit / self.wins if self.wins else 0,
+            'avgLoss': self.gross_loss / self.losses if self.losses else 0,
+            'maxWin': self.max_win,
+            'maxLoss': self.max_loss,
+            'volume': self.volume,
+            'fills': self.fills,
+            'buys': self.buys,
+            'sells': self.sells,
+            'pnlBySymbol': self.pnl_by_symbol,
+            'updatedAt': self.updated_at
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Today's running trading stats")
+    parser.add_argument('--no-sync', action='store_true', help='Skip the order sync and print the checkpoint')
+    args = parser.parse_args()
+
+    stats = RunningDailyStats()
+    if not args.no_sync:
+        # Exits fill at the broker; pick up any filled since the last sync before reporting
+        try:
+            import alpaca_trade_api as tradeapi
+            import metrics
+            from order_sync import OrderSync
+            from risk_engine import RiskEngine
+            api = metrics.instrument(tradeapi.REST(Config.ALPACA_API_KEY, Config.ALPACA_SECRET_KEY,
+                                                   Config.ALPACA_BASE_URL, api_version='v2'))
+            OrderSync(api, stats=stats, risk=RiskEngine()).sync()
+        except Exception as e:
+            print(f"Error syncing orders before reading daily stats: {e}", file=sys.stderr)
+    print(json.dumps(stats.snapshot(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Newline-delimited JSON result streaming for Node.js integration
+By default an entry script prints its whole result once at exit. Run with
+--stream and it instead writes one JSON event per line on stdout as work
+completes, so tradingBot.js can act on the first candidate while the scan
+is still running:
+
+    {"event": "candidate", "ts": ..., "data": {...}}
+    {"event": "progress", "ts": ..., "done": 20, "total": 48}
+    {"event": "summary", "ts": ..., "data": <the usual result>}
+
+summary is always the last line and carries exactly what the non-streaming
+run would have printed. --compact drops whitespace and sends lists of
+same-keyed objects column-wise ({"_columns": [...], "_rows": [[...]]}),
+which executePythonScriptStream expands back.
+"""
+
+import json
+import sys
+import threading
+import time
+
+# Minimum seconds between progress events (the final one always goes out)
+PROGRESS_INTERVAL = 0.5
+# Lists shorter than this aren't worth a column header
+COLUMNAR_MIN_ROWS = 4
+
+def columnar(value):
+    """Recursively rewrite lists of same-keyed dicts as {_columns, _rows}"""
+    if isinstance(value, dict):
+        return {k: columnar(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if (len(value) >= COLUMNAR_MIN_ROWS and all(isinstance(v, dict) for v in value)
+                and all(v.keys() == value[0].keys() for v in value)):
+            columns = list(value[0])
+            return {'_columns': columns, '_rows': [[columnar(v[c]) for c in columns] for v in value]}
+        return [columnar(v) for v in value]
+    return value
+
+class EventWriter:
+    """Writes result events to stdout; a disabled writer only prints the final result"""
+
+    def __init__(self, enabled=False, compact=False, stream=None):
+        self.enabled = enabled
+        self.compact = compact
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+        self.last_progress = 0.0
+
+    def encode(self, payload):
+        if self.compact:
+            return json.dumps(columnar(payload), separators=(',', ':'), default=str)
+        return json.dumps(payload, default=str)
+
+    def emit(self, event, **fields):
+        if not self.enabled:
+            return
+        line = self.encode({'event': event, 'ts': time.time(), **fields})
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def candidate(self, data):
+        self.emit('candidate', data=data)
+
+    def progress(self, done, total, **fields):
+        now = time.monotonic()
+        if done < total and now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+        self.emit('progress', done=done, total=total, **fields)
+
+    def summary(self, data):
+        """The script's final result: an event when streaming, the usual blob otherwise"""
+        if self.enabled:
+            self.emit('summary', data=data)
+        else:
+            print(json.dumps(data, indent=2, default=str))
+
+def from_argv():
+    """EventWriter configured by --stream / --compact, removed from sys.argv"""
+    enabled = '--stream' in sys.argv
+    compact = '--compact' in sys.argv
+    sys.argv[:] = [arg for arg in sys.argv if arg not in ('--stream', '--compact')]
+    return EventWriter(enabled=enabled, compact=compact)
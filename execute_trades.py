@@ -9,42 +9,38 @@ import json
 import alpaca_trade_api as tradeapi
 import os
 from dotenv import load_dotenv
+from risk_engine import RiskEngine
+from trade_journal import TradeJournal
+import event_stream
+import jsonlog
+import latency
+import metrics
+import scheduler
+import tracing
 
 # Load environment variables
 load_dotenv()
 
+logger = jsonlog.get_logger(__name__)
+
 class TradeExecutor:
     def __init__(self):
-        self.api = tradeapi.REST(
+        self.api = metrics.instrument(tradeapi.REST(
             os.getenv('ALPACA_API_KEY'),
             os.getenv('ALPACA_SECRET_KEY'),
             base_url=os.getenv('ALPACA_BASE_URL', 'https://paper-api.alpaca.markets')
-        )
+        ))
+        self.risk = RiskEngine()
+        self.latency_log = latency.LatencyLog()
+        # Trades are journaled on submission; order_sync adds them to the daily stats once filled
+        self.journal = TradeJournal()
     
     def get_account_info(self):
         return self.api.get_account()
     
-    def calculate_position_sizes(self, stocks, account_value):
-        if not stocks:
-            return {}
-        
-        # Split account evenly among all qualifying stocks (100% allocation)
-        allocation_per_stock = account_value / len(stocks)
-        
-        position_sizes = {}
-        for stock in stocks:
-            shares = int(allocation_per_stock / stock['price'])
-            
-            position_sizes[stock['symbol']] = {
-                'shares': shares,
-                'allocation': allocation_per_stock,
-                'price': stock['price'],
-                'total_value': shares * stock['price']
-            }
-        
-        return position_sizes
-    
+    @tracing.traced('execute.buy_order')
     def place_buy_order(self, symbol, shares, price, session):
+        tracing.current().set(symbol=symbol, shares=shares, session=session)
         try:
             if session == 'premarket':
                 # Use limit order for pre-market
@@ -70,10 +66,12 @@ class TradeExecutor:
             return order
             
         except Exception as e:
-            print(f"Error placing buy order for {symbol}: {e}", file=sys.stderr)
+            logger.error("Error placing buy order for %s: %s", symbol, e, extra={'symbol': symbol})
             return None
     
+    @tracing.traced('execute.profit_targets')
     def place_profit_targets(self, symbol, shares, entry_price, session):
+        tracing.current().set(symbol=symbol)
         profit_tiers = [
             {'level': 10, 'sell_pct': 25},  # 25% at +10%
             {'level': 20, 'sell_pct': 25},  # 25% at +20%
@@ -101,11 +99,13 @@ class TradeExecutor:
                 orders.append(order)
                 
             except Exception as e:
-                print(f"Error placing profit target for {symbol}: {e}", file=sys.stderr)
+                logger.error("Error placing profit target for %s: %s", symbol, e, extra={'symbol': symbol})
         
         return orders
     
+    @tracing.traced('execute.stop_loss')
     def place_stop_loss(self, symbol, shares, entry_price):
+        tracing.current().set(symbol=symbol)
         try:
             stop_price = round(entry_price * 0.95, 2)  # 5% stop loss
             
@@ -121,23 +121,26 @@ class TradeExecutor:
             return order
             
         except Exception as e:
-            print(f"Error placing stop loss for {symbol}: {e}", file=sys.stderr)
+            logger.error("Error placing stop loss for %s: %s", symbol, e, extra={'symbol': symbol})
             return None
     
-    def execute_trades(self, trade_params):
+    @tracing.traced('execute_trades')
+    def execute_trades(self, trade_params, events=None):
+        events = events or event_stream.EventWriter()
         stocks = trade_params['stocks']
         session = trade_params['session']
         
-        print(f"🚀 Executing trades for {len(stocks)} stocks in {session} session", file=sys.stderr)
+        logger.info("🚀 Executing trades for %d stocks in %s session", len(stocks), session)
         
-        # Get account info
-        account = self.get_account_info()
-        account_value = float(account.buying_power)
+        # Risk state is cached between runs; only resync from the broker when stale
+        if self.risk.ensure_fresh(self.api):
+            logger.info("🔄 Risk state synced from broker")
         
-        print(f"💰 Available buying power: ${account_value:,.2f}", file=sys.stderr)
+        logger.info("💰 Available buying power: $%.2f", self.risk.buying_power)
         
-        # Calculate position sizes (100% allocation)
-        position_sizes = self.calculate_position_sizes(stocks, account_value)
+        # Size and validate the whole batch against exposure and limits
+        with tracing.span('risk.size_batch', stocks=len(stocks)):
+            position_sizes = self.risk.size_batch(stocks)
         
         results = {
             'successful_trades': 0,
@@ -157,15 +160,29 @@ class TradeExecutor:
             price = position['price']
             
             if shares <= 0:
-                print(f"⚠️ Skipping {symbol}: calculated 0 shares", file=sys.stderr)
+                logger.warning("⚠️ Skipping %s: %s", symbol, position['risk_reason'] or 'calculated 0 shares',
+                               extra={'symbol': symbol})
                 continue
             
-            print(f"📈 Trading {symbol}: {shares} shares at ${price:.2f} (${position['total_value']:.2f})", file=sys.stderr)
+            logger.info("📈 Trading %s: %d shares at $%.2f ($%.2f)", symbol, shares, price, position['total_value'],
+                        extra={'symbol': symbol, 'shares': shares, 'price': price})
+            
+            # Screeners hand us their latency record; the decision to trade is the signal
+            record = stock.get('latency') or latency.new_record(symbol, source='executor')
+            if 'signal' not in record:
+                latency.mark(record, 'signal')
             
             # Place buy order
+            latency.mark(record, 'order_submit')
             buy_order = self.place_buy_order(symbol, shares, price, session)
             
             if buy_order:
+                latency.mark(record, 'broker_ack')
+                record['order_id'] = buy_order.id
+                self.latency_log.append(record)
+
+                self.risk.record_order(symbol, shares, price)
+                
                 # Place profit targets
                 profit_orders = self.place_profit_targets(symbol, shares, price, session)
                 
@@ -181,39 +198,61 @@ class TradeExecutor:
                     'profit_order_ids': [order.id for order in profit_orders],
                     'stop_order_id': stop_order.id if stop_order else None,
                     'session': session,
-                    'timestamp': buy_order.submitted_at
+                    'timestamp': buy_order.submitted_at,
+                    'latency_id': record['id']
                 }
                 
                 results['trades'].append(trade_result)
+                events.emit('trade', data=trade_result)
+                self.journal.append({
+                    'symbol': symbol,
+                    'action': 'BUY',
+                    'shares': shares,
+                    'price': price,
+                    'value': position['total_value'],
+                    'stop_loss': round(price * 0.95, 2),
+                    'take_profit': round(price * 1.10, 2),
+                    'change_pct': stock.get('change_percent'),
+                    'volume': stock.get('volume'),
+                    'reason': stock.get('pattern_signal') or 'ENTRY',
+                    'session': session,
+                    'order_id': buy_order.id
+                })
                 results['successful_trades'] += 1
                 results['total_allocated'] += position['total_value']
                 
-                print(f"✅ {symbol} trade executed successfully", file=sys.stderr)
+                logger.info("✅ %s trade executed successfully", symbol, extra={'symbol': symbol, 'order_id': buy_order.id})
                 
             else:
                 results['failed_trades'] += 1
-                print(f"❌ Failed to execute trade for {symbol}", file=sys.stderr)
+                events.emit('trade_failed', symbol=symbol)
+                logger.error("❌ Failed to execute trade for %s", symbol, extra={'symbol': symbol})
         
-        print(f"📊 Trade execution complete: {results['successful_trades']} successful, {results['failed_trades']} failed", file=sys.stderr)
-        print(f"💵 Total allocated: ${results['total_allocated']:,.2f}", file=sys.stderr)
+        logger.info("📊 Trade execution complete: %d successful, %d failed",
+                    results['successful_trades'], results['failed_trades'])
+        logger.info("💵 Total allocated: $%.2f", results['total_allocated'])
         
         return results
 
 def main():
+    events = event_stream.from_argv()
+    metrics.start('execute_trades')
+    tracing.start('execute_trades')
+    jsonlog.setup('execute_trades')
     # Read input from stdin
     input_data = sys.stdin.read()
     
     try:
         trade_params = json.loads(input_data)
     except json.JSONDecodeError:
-        print("Error: Invalid JSON input", file=sys.stderr)
+        logger.error("Error: Invalid JSON input")
         sys.exit(1)
     
     executor = TradeExecutor()
-    results = executor.execute_trades(trade_params)
+    results = executor.execute_trades(trade_params, events)
     
     # Output JSON to stdout for Node.js consumption
-    print(json.dumps(results, indent=2, default=str))
+    events.summary(results)
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'execute_trades', reads_stdin=True)
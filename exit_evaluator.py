@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Event-driven exit evaluator for open positions
+Recomputes MACD/VWAP exit conditions on every incoming bar or trade for held
+symbols and fires close orders as soon as MACD rolls over, instead of waiting
+for the next monitor_positions.py run.
+
+Usage:
+    exit_evaluator.py                     # live Alpaca stream
+    exit_evaluator.py --replay FILE       # local NDJSON/CSV replay
+    exit_evaluator.py --replay FILE --dry-run --symbols AAA,BBB
+"""
+
+import argparse
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import indicators
+import jsonlog
+import metrics
+import profiling
+import tracing
+from market_feed import AlpacaStreamFeed, ReplayFeed
+from monitor_positions import PositionMonitor, MAX_WORKERS
+
+logger = jsonlog.get_logger(__name__)
+
+# MACD(12, 26, 9) needs slow + signal bars before the signal line means anything
+WARMUP_BARS = 35
+
+class SymbolState:
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.macd = indicators.MACDState()
+        self.vwap = indicators.VWAPState()
+        # Start of the newest minute bar folded in, seeded or live
+        self.last_bar = -math.inf
+        self.exiting = False
+
+class ExitEvaluator:
+    def __init__(self, feed, monitor=None, dry_run=False, latency_file='exit_latency.log'):
+        self.feed = feed
+        self.monitor = monitor or PositionMonitor()
+        self.dry_run = dry_run
+        self.latency_file = latency_file
+        self.states = {}
+        self.pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        self.exits = []
+        self.quantities = {}
+
+    def load_positions(self):
+        """Held symbols from the broker"""
+        positions = [p for p in self.monitor.get_open_positions() if float(p.qty) != 0]
+        self.quantities = {p.symbol: abs(float(p.qty)) for p in positions}
+        return list(self.quantities)
+
+    def track(self, symbols, seed=True):
+        """Start evaluating symbols, warming state from today's bars"""
+        for symbol in symbols:
+            self.states.setdefault(symbol, SymbolState(symbol))
+
+        if seed:
+            self.seed(symbols)
+
+        self.feed.subscribe(symbols)
+
+    def seed(self, symbols):
+        try:
+            bars, index = self.monitor.fetch_bars(list(symbols))
+        except Exception as e:
+            logger.error("Error seeding exit state: %s", e)
+            return
+
+        if bars is None:
+            return
+
+        # The current minute is still printing; the feed delivers its finished bar
+        timestamps = index.to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+        finished = timestamps < time.time() // 60 * 60
+        for i, symbol in enumerate(symbols):
+            state = self.states[symbol]
+            rows = ~np.isnan(bars['Close'][:, i]) & finished
+            for ts, high, low, close, volume in zip(timestamps[rows], bars['High'][rows, i], bars['Low'][rows, i],
+                                                    bars['Close'][rows, i], np.nan_to_num(bars['Volume'][rows, i])):
+                state.macd.update(close)
+                state.vwap.update(high, low, close, volume)
+                state.last_bar = ts
+
+    def on_event(self, event):
+        state = self.states.get(event['symbol'])
+        if state is None or state.exiting:
+            return
+
+        minute = event['timestamp'] // 60 * 60
+        if event['type'] == 'bar':
+            if minute <= state.last_bar:
+                # Already folded in from the seed history
+                return
+            state.last_bar = minute
+            price = event['close']
+            macd_line, signal_line, histogram = state.macd.update(price)
+            state.vwap.update(event['high'], event['low'], price, event['volume'], minute)
+        else:
+            # Intrabar: evaluate as if the bar closed at this trade
+            price = event['price']
+            macd_line, signal_line, histogram = state.macd.peek(price)
+            # VWAP comes from bars; trades only fill in until their minute's bar lands
+            if minute > state.last_bar:
+                state.vwap.update_trade(price, event['size'], minute)
+
+        if state.macd.bars < WARMUP_BARS:
+            return
+
+        macd_bullish = macd_line > signal_line and histogram > 0
+        if not macd_bullish:
+            self.fire_exit(state, 'MACD_BEARISH', event, price, macd_line, signal_line)
+
+    def fire_exit(self, state, reason, event, price, macd_line, signal_line):
+        state.exiting = True
+        signal_time = time.time()
+        logger.warning("⚠️ MACD turned bearish for %s at $%.2f - CLOSING POSITION", state.symbol, price,
+                       extra={'symbol': state.symbol})
+
+        record = {
+            'symbol': state.symbol,
+            'reason': reason,
+            'price': price,
+            'macd': macd_line,
+            'macd_signal': signal_line,
+            'vwap': state.vwap.value,
+            'event_type': event['type'],
+            'event_time': event['timestamp'],
+            'signal_time': signal_time
+        }
+
+        # Submit off the event loop so the next event isn't held up
+        future = self.pool.submit(tracing.wrap(self.submit_close), state.symbol, reason)
+        future.add_done_callback(lambda f: self.record_exit(record, f))
+
+    @tracing.traced('exit.submit_close')
+    def submit_close(self, symbol, reason):
+        tracing.current().set(symbol=symbol, reason=reason)
+        if self.dry_run:
+            return True
+        return self.monitor.close_positions([symbol], reason)[symbol]
+
+    def record_exit(self, record, future):
+        record['order_time'] = time.time()
+        record['signal_to_order_ms'] = (record['order_time'] - record['signal_time']) * 1000
+        try:
+            record['closed'] = bool(future.result())
+        except Exception as e:
+            record['closed'] = False
+            record['error'] = str(e)
+
+        self.exits.append(record)
+
+        if record['closed'] and not self.dry_run:
+            try:
+                self.monitor.journal.append({
+                    'symbol': record['symbol'],
+                    'action': 'SELL',
+                    'shares': self.quantities.get(record['symbol']),
+                    'price': record['price'],
+                    'reason': record['reason']
+                })
+            except Exception as e:
+                logger.error("Error journaling close for %s: %s", record['symbol'], e, extra={'symbol': record['symbol']})
+
+        try:
+            with open(self.latency_file, 'a') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        except OSError as e:
+            logger.error("Error writing exit latency: %s", e)
+
+    def run(self):
+        try:
+            for event in self.feed.events():
+                self.on_event(event)
+                if self.states and all(s.exiting for s in self.states.values()):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.feed.close()
+            self.pool.shutdown(wait=True)
+
+        latencies = [e['signal_to_order_ms'] for e in self.exits]
+        return {
+            'symbols_tracked': len(self.states),
+            'positions_closed': sum(1 for e in self.exits if e['closed']),
+            'exits': self.exits,
+            'signal_to_order_ms': {
+                'p50': float(np.percentile(latencies, 50)) if latencies else None,
+                'max': max(latencies) if latencies else None
+            }
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Continuous exit evaluation for open positions')
+    parser.add_argument('--replay', help='Replay events from a local NDJSON or CSV file')
+    parser.add_argument('--speed', type=float, default=0, help='Replay speed multiplier (0 = as fast as possible)')
+    parser.add_argument('--symbols', help='Comma-separated symbols (default: open positions)')
+    parser.add_argument('--dry-run', action='store_true', help='Evaluate exits without sending orders')
+    parser.add_argument('--no-seed', action='store_true', help="Don't warm up from today's bars")
+    args = parser.parse_args()
+
+    metrics.start('exit_evaluator')
+
+    tracing.start('exit_evaluator')
+    jsonlog.setup('exit_evaluator')
+    feed = ReplayFeed(args.replay, speed=args.speed) if args.replay else AlpacaStreamFeed()
+    evaluator = ExitEvaluator(feed, dry_run=args.dry_run)
+
+    symbols = args.symbols.split(',') if args.symbols else evaluator.load_positions()
+    if not symbols:
+        print(json.dumps({'symbols_tracked': 0, 'positions_closed': 0, 'exits': []}, indent=2))
+        return
+
+    logger.info("📊 Evaluating exits for %d positions", len(symbols))
+    evaluator.track(symbols, seed=not args.no_seed)
+
+    results = evaluator.run()
+
+    # Output JSON to stdout for Node.js consumption
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    profiling.run(main, 'exit_evaluator')
@@ -16,54 +16,58 @@ sys.path.append(str(parent_dir))
 
 import alpaca_trade_api as tradeapi
 from config import Config
+from pnl_engine import PnLEngine, market_today
+from analytics import PerformanceAnalytics, period_bounds
+import metrics
+import scheduler
+import tracing
 
 def generate_daily_report():
     """Generate daily trading performance report"""
     try:
         # Initialize Alpaca API
-        api = tradeapi.REST(
+        api = metrics.instrument(tradeapi.REST(
             Config.ALPACA_API_KEY,
             Config.ALPACA_SECRET_KEY,
             Config.ALPACA_BASE_URL,
             api_version='v2'
-        )
+        ))
         
-        # Get today's date range
-        today = datetime.now().date()
-        start_time = datetime.combine(today, datetime.min.time())
-        end_time = datetime.combine(today, datetime.max.time())
+        # Eastern trading day, matching how the P&L engine buckets fills
+        today = market_today()
         
         # Get account info
         account = api.get_account()
         
-        # Get today's orders
-        orders = api.list_orders(
-            status='all',
-            after=start_time.isoformat(),
-            until=end_time.isoformat()
-        )
+        # Realized P&L for every day this year; past days come from snapshots,
+        # so only today's fills are fetched (all pages, not just the first 50)
+        engine = PnLEngine(api)
+        year_days = engine.report_range(today.replace(month=1, day=1), today)
+        today_stats = year_days[-1]
+        month_days = [d for d in year_days if d['date'] >= today.replace(day=1).isoformat()]
+        orders = engine.orders
         
         # Get positions
         positions = api.list_positions()
         
         # Calculate daily statistics
-        total_trades = len([o for o in orders if o.filled_qty and float(o.filled_qty) > 0])
-        buy_orders = len([o for o in orders if o.side == 'buy' and o.filled_qty and float(o.filled_qty) > 0])
-        sell_orders = len([o for o in orders if o.side == 'sell' and o.filled_qty and float(o.filled_qty) > 0])
-        
-        # Calculate P&L from filled orders
-        daily_pnl = 0
-        trade_volume = 0
-        
-        for order in orders:
-            if order.filled_qty and float(order.filled_qty) > 0:
-                if order.filled_avg_price:
-                    trade_value = float(order.filled_qty) * float(order.filled_avg_price)
-                    trade_volume += trade_value
+        total_trades = today_stats['fills']
+        buy_orders = today_stats['buy_fills']
+        sell_orders = today_stats['sell_fills']
+        daily_pnl = today_stats['realized_pnl']
+        trade_volume = today_stats['volume']
         
         # Get unrealized P&L from current positions
         unrealized_pnl = sum(float(pos.unrealized_pl or 0) for pos in positions)
         
+        # Year-to-date risk-adjusted performance from the journal (cached per period)
+        try:
+            performance = PerformanceAnalytics().report(*period_bounds('ytd', today))
+            performance.pop('equity_curve', None)
+        except Exception as e:
+            print(f"Error computing performance analytics: {e}", file=sys.stderr)
+            performance = None
+        
         # Prepare report
         report = {
             'date': today.isoformat(),
@@ -80,9 +84,22 @@ def generate_daily_report():
                 'buy_orders': buy_orders,
                 'sell_orders': sell_orders,
                 'trade_volume': trade_volume,
+                'realized_pnl': daily_pnl,
+                'winning_trades': today_stats['winning_sells'],
+                'losing_trades': today_stats['losing_sells'],
+                'realized_by_symbol': today_stats['by_symbol'],
                 'unrealized_pnl': unrealized_pnl
             },
             
+            'period_stats': {
+                'month_to_date_pnl': sum(d['realized_pnl'] for d in month_days),
+                'year_to_date_pnl': sum(d['realized_pnl'] for d in year_days),
+                'month_to_date_volume': sum(d['volume'] for d in month_days),
+                'year_to_date_volume': sum(d['volume'] for d in year_days)
+            },
+            
+            'performance': performance,
+            
             'positions': [{
                 'symbol': pos.symbol,
                 'qty': float(pos.qty),
@@ -117,7 +134,7 @@ def generate_daily_report():
             'error': True,
             'message': str(e),
             'type': type(e).__name__,
-            'date': datetime.now().date().isoformat(),
+            'date': market_today().isoformat(),
             'account_value': 0,
             'daily_stats': {
                 'total_trades': 0,
@@ -129,6 +146,8 @@ def generate_daily_report():
 
 def main():
     """Main function to generate daily report and return as JSON"""
+    metrics.start('daily_report')
+    tracing.start('daily_report')
     try:
         report = generate_daily_report()
         print(json.dumps(report, indent=2))
@@ -142,4 +161,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'daily_report')
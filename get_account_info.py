@@ -15,17 +15,20 @@ sys.path.append(str(parent_dir))
 
 import alpaca_trade_api as tradeapi
 from config import Config
+import metrics
+import scheduler
+import tracing
 
 def get_account_info():
     """Get account information from Alpaca"""
     try:
         # Initialize Alpaca API
-        api = tradeapi.REST(
+        api = metrics.instrument(tradeapi.REST(
             Config.ALPACA_API_KEY,
             Config.ALPACA_SECRET_KEY,
             Config.ALPACA_BASE_URL,
             api_version='v2'
-        )
+        ))
         
         # Get account information
         account = api.get_account()
@@ -69,6 +72,8 @@ def get_account_info():
 
 def main():
     """Main function to get account info and return as JSON"""
+    metrics.start('get_account_info')
+    tracing.start('get_account_info')
     try:
         account_info = get_account_info()
         print(json.dumps(account_info, indent=2))
@@ -82,4 +87,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'get_account_info')
@@ -8,7 +8,7 @@ import json
 import sys
 import os
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 # Add parent directory to path for imports
 parent_dir = Path(__file__).parent.parent
@@ -16,67 +16,39 @@ sys.path.append(str(parent_dir))
 
 import alpaca_trade_api as tradeapi
 from config import Config
+from daily_stats import RunningDailyStats
+from order_sync import OrderSync
+from risk_engine import RiskEngine
+import metrics
+import scheduler
+import tracing
 
 def get_orders():
     """Get recent orders from Alpaca"""
     try:
         # Initialize Alpaca API
-        api = tradeapi.REST(
+        api = metrics.instrument(tradeapi.REST(
             Config.ALPACA_API_KEY,
             Config.ALPACA_SECRET_KEY,
             Config.ALPACA_BASE_URL,
             api_version='v2'
-        )
+        ))
         
-        # Get orders from the last 7 days
-        until = datetime.now()
-        after = until - timedelta(days=7)
+        # Bring the local store up to date, then serve the last 7 days from it
+        # Fills the sync detects go to today's stats and the shared risk state
+        order_sync = OrderSync(api, stats=RunningDailyStats(), risk=RiskEngine())
+        sync_stats = order_sync.sync()
         
-        orders = api.list_orders(
-            status='all',
-            limit=100,
-            after=after.isoformat(),
-            until=until.isoformat(),
-            direction='desc'
-        )
+        # Stored submitted_at values are UTC ISO strings, so compare against an aware UTC cutoff
+        until = datetime.now(timezone.utc)
+        after = until - timedelta(days=7)
         
-        # Convert orders to dict format
-        orders_data = []
-        for order in orders:
-            order_info = {
-                'id': order.id,
-                'client_order_id': order.client_order_id,
-                'symbol': order.symbol,
-                'asset_id': order.asset_id,
-                'asset_class': order.asset_class,
-                'qty': float(order.qty or 0),
-                'filled_qty': float(order.filled_qty or 0),
-                'side': order.side,
-                'order_type': order.order_type,
-                'time_in_force': order.time_in_force,
-                'limit_price': float(order.limit_price) if order.limit_price else None,
-                'stop_price': float(order.stop_price) if order.stop_price else None,
-                'status': order.status,
-                'extended_hours': order.extended_hours,
-                'legs': order.legs,
-                'trail_percent': float(order.trail_percent) if order.trail_percent else None,
-                'trail_price': float(order.trail_price) if order.trail_price else None,
-                'hwm': float(order.hwm) if order.hwm else None,
-                'submitted_at': order.submitted_at.isoformat() if order.submitted_at else None,
-                'filled_at': order.filled_at.isoformat() if order.filled_at else None,
-                'expired_at': order.expired_at.isoformat() if order.expired_at else None,
-                'canceled_at': order.canceled_at.isoformat() if order.canceled_at else None,
-                'failed_at': order.failed_at.isoformat() if order.failed_at else None,
-                'replaced_at': order.replaced_at.isoformat() if order.replaced_at else None,
-                'replaced_by': order.replaced_by,
-                'replaces': order.replaces,
-                'filled_avg_price': float(order.filled_avg_price) if order.filled_avg_price else None
-            }
-            orders_data.append(order_info)
+        orders_data = order_sync.store.query(after=after)
         
         return {
             'orders': orders_data,
-            'total_orders': len(orders_data)
+            'total_orders': len(orders_data),
+            'sync': sync_stats
         }
         
     except Exception as e:
@@ -91,6 +63,8 @@ def get_orders():
 
 def main():
     """Main function to get orders and return as JSON"""
+    metrics.start('get_orders')
+    tracing.start('get_orders')
     try:
         orders_info = get_orders()
         print(json.dumps(orders_info, indent=2))
@@ -105,4 +79,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'get_orders')
@@ -15,17 +15,20 @@ sys.path.append(str(parent_dir))
 
 import alpaca_trade_api as tradeapi
 from config import Config
+import metrics
+import scheduler
+import tracing
 
 def get_positions():
     """Get current positions from Alpaca"""
     try:
         # Initialize Alpaca API
-        api = tradeapi.REST(
+        api = metrics.instrument(tradeapi.REST(
             Config.ALPACA_API_KEY,
             Config.ALPACA_SECRET_KEY,
             Config.ALPACA_BASE_URL,
             api_version='v2'
-        )
+        ))
         
         # Get all positions
         positions = api.list_positions()
@@ -72,6 +75,8 @@ def get_positions():
 
 def main():
     """Main function to get positions and return as JSON"""
+    metrics.start('get_positions')
+    tracing.start('get_positions')
     try:
         positions_info = get_positions()
         print(json.dumps(positions_info, indent=2))
@@ -86,4 +91,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'get_positions')
@@ -52,7 +52,8 @@ let botStatus = {
     premarket: null,
     market: null,
     cleanup: null,
-    minuteScanner: null
+    minuteScanner: null,
+    overnightSnapshot: null
   }
 };
 
@@ -122,6 +123,24 @@ function broadcastStatus() {
   io.emit('botStatus', cleanStatus);
 }
 
+// Real-time scans must finish inside their minute; the rest carries to the next tick
+const MINUTE_SCAN_DEADLINE_SECONDS = Number(process.env.MINUTE_SCAN_DEADLINE_SECONDS || 50);
+
+// Push streamed screener events to clients while the scan is still running
+function scanEventHandler(session) {
+  return (event) => {
+    if (event.event === 'candidate') {
+      logger.info(`🎯 ${session} candidate: ${event.data.symbol}`);
+      io.emit('scanCandidate', { session, stock: event.data });
+    } else if (event.event === 'progress') {
+      io.emit('scanProgress', { session, done: event.done, total: event.total, found: event.found });
+    } else if (event.event === 'coverage' && event.data.deadline_hit) {
+      logger.warn(`⏱️ ${session} scan hit its deadline: ${event.data.scanned}/${event.data.total} symbols, ${event.data.carried_over.length} carried over`);
+      io.emit('scanCoverage', { session, ...event.data });
+    }
+  };
+}
+
 // Update bot status
 async function updateBotStatus() {
   try {
@@ -155,7 +174,7 @@ async function runPreMarketScreener() {
     await smsService.notifyBotStarted('premarket');
     
     // Run pre-market screening and trading
-    const qualifyingStocks = await tradingBot.runPreMarketScreener();
+    const qualifyingStocks = await tradingBot.runPreMarketScreener(scanEventHandler('premarket'));
     botStatus.qualifyingStocks = qualifyingStocks;
     
     if (qualifyingStocks.length > 0) {
@@ -184,7 +203,7 @@ async function runMarketHoursScreener() {
     await smsService.notifyBotStarted('market');
     
     // Run market hours screening and trading
-    const qualifyingStocks = await tradingBot.runMarketHoursScreener();
+    const qualifyingStocks = await tradingBot.runMarketHoursScreener(scanEventHandler('market'));
     botStatus.qualifyingStocks = [...botStatus.qualifyingStocks, ...qualifyingStocks];
     
     if (qualifyingStocks.length > 0) {
@@ -238,50 +257,44 @@ async function runMarketCloseCleanup() {
 // Helper function to get daily trading statistics
 async function getDailyTradingStats() {
   try {
-    const today = new Date().toISOString().split('T')[0];
-    const trades = await getTradesFromCSV();
-    
-    const todayTrades = trades.filter(trade => 
-      trade.timestamp.startsWith(today)
-    );
-    
-    const stats = {
-      totalTrades: todayTrades.length,
-      winningTrades: 0,
-      losingTrades: 0,
-      totalPnL: 0,
-      volume: 0,
-      winRate: 0
+    // daily_stats.py syncs orders first, so exits filled since the last sync are counted
+    const dayStats = await tradingBot.getDailyStats();
+    
+    return {
+      totalTrades: dayStats.totalTrades,
+      winningTrades: dayStats.winningTrades,
+      losingTrades: dayStats.losingTrades,
+      totalPnL: dayStats.totalPnL,
+      volume: dayStats.volume,
+      winRate: dayStats.winRate
     };
-    
-    todayTrades.forEach(trade => {
-      if (trade.pnl > 0) stats.winningTrades++;
-      else if (trade.pnl < 0) stats.losingTrades++;
-      
-      stats.totalPnL += trade.pnl || 0;
-      stats.volume += trade.value || 0;
-    });
-    
-    stats.winRate = stats.totalTrades > 0 ? 
-      (stats.winningTrades / stats.totalTrades) * 100 : 0;
-    
-    return stats;
   } catch (error) {
     console.error('Error getting daily trading stats:', error);
     return null;
   }
 }
 
+// Nightly indicator seeds so the 4:00 AM scan doesn't wait for 200 bars
+async function runOvernightSnapshot() {
+  try {
+    logger.info('🌙 Building overnight indicator snapshot');
+    const result = await tradingBot.buildOvernightSnapshot();
+    logger.info(`🌙 Overnight snapshot ready: ${result.seeded}/${result.symbols} symbols seeded in ${result.seconds}s`);
+  } catch (error) {
+    logger.error('Overnight snapshot error:', error);
+  }
+}
+
 // Schedule trading sessions
 function setupScheduledJobs() {
   // Pre-market screener - 4:00 AM ET Monday-Friday
-  botStatus.scheduledJobs.premarket = cron.schedule('0 4 * * 1-5', runPreMarketScreener, {
+  botStatus.scheduledJobs.premarket = cron.schedule('0 4 * * 1-5', () => tradingBot.withTrace('premarket_screener', runPreMarketScreener), {
     scheduled: true,
     timezone: "America/New_York"
   });
   
   // Market hours screener - 9:30 AM ET Monday-Friday
-  botStatus.scheduledJobs.market = cron.schedule('30 9 * * 1-5', runMarketHoursScreener, {
+  botStatus.scheduledJobs.market = cron.schedule('30 9 * * 1-5', () => tradingBot.withTrace('market_hours_screener', runMarketHoursScreener), {
     scheduled: true,
     timezone: "America/New_York"
   });
@@ -293,7 +306,13 @@ function setupScheduledJobs() {
   });
   
   // Real-time minute scanner - Every minute during trading hours
-  botStatus.scheduledJobs.minuteScanner = cron.schedule('* * * * 1-5', runMinuteScanner, {
+  botStatus.scheduledJobs.minuteScanner = cron.schedule('* * * * 1-5', () => tradingBot.withTrace('minute_tick', runMinuteScanner), {
+    scheduled: true,
+    timezone: "America/New_York"
+  });
+  
+  // Overnight snapshot - 8:30 PM ET Monday-Friday, after extended hours close
+  botStatus.scheduledJobs.overnightSnapshot = cron.schedule('30 20 * * 1-5', () => tradingBot.withTrace('overnight_snapshot', runOvernightSnapshot), {
     scheduled: true,
     timezone: "America/New_York"
   });
@@ -302,6 +321,7 @@ function setupScheduledJobs() {
   logger.info('📅 Pre-market: 4:00 AM ET (Mon-Fri)');
   logger.info('📅 Market hours: 9:30 AM ET (Mon-Fri)');
   logger.info('📅 Market close: 4:00 PM ET (Mon-Fri)');
+  logger.info('📅 Overnight snapshot: 8:30 PM ET (Mon-Fri)');
 }
 
 // Manual bot control
@@ -457,6 +477,10 @@ app.post('/api/toggle-auto-mode', (req, res) => {
       botStatus.scheduledJobs.cleanup.stop();
       botStatus.scheduledJobs.cleanup = null;
     }
+    if (botStatus.scheduledJobs.overnightSnapshot) {
+      botStatus.scheduledJobs.overnightSnapshot.stop();
+      botStatus.scheduledJobs.overnightSnapshot = null;
+    }
     
     logger.info('🛑 Automatic scheduling disabled');
     io.emit('message', { 
@@ -638,7 +662,7 @@ async function runRealTimePreMarketScan() {
     logger.info('🔍 Running real-time pre-market scan...');
     
     // Run screening
-    const newQualifyingStocks = await tradingBot.runPreMarketScreener();
+    const newQualifyingStocks = await tradingBot.runPreMarketScreener(scanEventHandler('premarket'), MINUTE_SCAN_DEADLINE_SECONDS);
     
     // Check for new opportunities not already in current positions
     const currentSymbols = botStatus.positions.map(p => p.symbol);
@@ -697,7 +721,7 @@ async function runRealTimeMarketScan() {
     logger.info('🔍 Running real-time market hours scan...');
     
     // Run screening
-    const newQualifyingStocks = await tradingBot.runMarketHoursScreener();
+    const newQualifyingStocks = await tradingBot.runMarketHoursScreener(scanEventHandler('market'), MINUTE_SCAN_DEADLINE_SECONDS);
     
     // Check for new opportunities
     const currentSymbols = botStatus.positions.map(p => p.symbol);
@@ -825,72 +849,20 @@ server.listen(PORT, () => {
   initialize();
 });
 
-// Trade log API endpoints
+// Trade log API endpoints (served from the SQLite trade journal)
 app.get('/api/trades', async (req, res) => {
   try {
-    const fs = require('fs');
-    const path = require('path');
-    const csvPath = path.join(__dirname, '..', 'trade_log.csv');
+    const { date, start, end, symbol } = req.query;
+    const result = await tradingBot.getTrades({ date, start, end, symbol });
     
-    if (!fs.existsSync(csvPath)) {
-      return res.json({ trades: [], message: 'No trade log found' });
-    }
-
-    const csvData = fs.readFileSync(csvPath, 'utf-8');
-    const lines = csvData.trim().split('\n');
-    
-    if (lines.length <= 1) {
+    if (result.totalTrades === 0) {
       return res.json({ trades: [], message: 'No trades found' });
     }
-
-    const headers = lines[0].split(',');
-    const trades = [];
-
-    for (let i = 1; i < lines.length; i++) {
-      const values = lines[i].split(',');
-      if (values.length >= headers.length) {
-        const trade = {
-          id: `trade_${i}`,
-          timestamp: values[0],
-          symbol: values[1],
-          action: values[2],
-          shares: parseFloat(values[3]) || 0,
-          price: parseFloat(values[4]) || 0,
-          value: parseFloat(values[5]) || 0,
-          stopLoss: parseFloat(values[6]) || null,
-          takeProfit: parseFloat(values[7]) || null,
-          changePct: parseFloat(values[8]) || 0,
-          volume: parseFloat(values[9]) || 0,
-          session: values[2] === 'BUY' ? 'premarket' : 'market', // Determine session
-          strategy: 'Ross Cameron Pattern'
-        };
-
-        // Calculate P&L for SELL orders
-        if (trade.action === 'SELL' && i > 1) {
-          // Find corresponding BUY order
-          const buyTrade = trades.find(t => 
-            t.symbol === trade.symbol && 
-            t.action === 'BUY' && 
-            new Date(t.timestamp) < new Date(trade.timestamp)
-          );
-          
-          if (buyTrade) {
-            trade.pnl = (trade.price - buyTrade.price) * trade.shares;
-          }
-        }
-
-        trades.push(trade);
-      }
-    }
-
-    res.json({ 
-      trades, 
-      totalTrades: trades.length,
-      lastUpdate: new Date().toISOString()
-    });
+    
+    res.json(result);
     
   } catch (error) {
-    console.error('Error reading trade log:', error);
+    console.error('Error reading trade journal:', error);
     res.status(500).json({ error: 'Failed to read trade log' });
   }
 });
@@ -899,70 +871,19 @@ app.get('/api/trades/daily-stats', async (req, res) => {
   try {
     const { date } = req.query;
     
-    // Get trades for specific date or all trades
-    const tradesResponse = await fetch('http://localhost:3001/api/trades');
-    const { trades } = await tradesResponse.json();
-    
-    if (date) {
-      const dayTrades = trades.filter(trade => 
-        trade.timestamp.startsWith(date)
-      );
-      
-      const stats = calculateDayStats(dayTrades);
-      res.json(stats);
-    } else {
-      // Return stats for last 30 days
-      const last30Days = {};
-      trades.forEach(trade => {
-        const day = trade.timestamp.split('T')[0];
-        if (!last30Days[day]) {
-          last30Days[day] = [];
-        }
-        last30Days[day].push(trade);
-      });
-      
-      const dailyStats = Object.entries(last30Days).map(([date, dayTrades]) => ({
-        date,
-        ...calculateDayStats(dayTrades)
-      }));
-      
-      res.json(dailyStats);
-    }
+    // Stats for a specific date, or per-day stats for the last 30 days
+    const stats = await tradingBot.getTradeStats(date || null);
+    res.json(stats);
     
   } catch (error) {
     res.status(500).json({ error: 'Failed to calculate daily stats' });
   }
 });
 
-function calculateDayStats(trades) {
-  const sells = trades.filter(t => t.action === 'SELL');
-  const wins = sells.filter(t => (t.pnl || 0) > 0);
-  const losses = sells.filter(t => (t.pnl || 0) < 0);
-  
-  return {
-    totalTrades: sells.length,
-    winningTrades: wins.length,
-    losingTrades: losses.length,
-    winRate: sells.length > 0 ? (wins.length / sells.length) * 100 : 0,
-    totalPnL: sells.reduce((sum, t) => sum + (t.pnl || 0), 0),
-    avgWin: wins.length > 0 ? wins.reduce((sum, t) => sum + (t.pnl || 0), 0) / wins.length : 0,
-    avgLoss: losses.length > 0 ? losses.reduce((sum, t) => sum + (t.pnl || 0), 0) / losses.length : 0,
-    volume: trades.reduce((sum, t) => sum + (t.value || 0), 0)
-  };
-}
-
 // Export trade data to Excel
 app.get('/api/trades/export', async (req, res) => {
   try {
-    const fs = require('fs');
-    const path = require('path');
-    const csvPath = path.join(__dirname, '..', 'trade_log.csv');
-    
-    if (!fs.existsSync(csvPath)) {
-      return res.status(404).json({ error: 'No trade log found' });
-    }
-
-    const csvData = fs.readFileSync(csvPath, 'utf-8');
+    const csvData = await tradingBot.exportTrades();
     
     res.setHeader('Content-Type', 'text/csv');
     res.setHeader('Content-Disposition', `attachment; filename="trade_log_${new Date().toISOString().split('T')[0]}.csv"`);
@@ -973,6 +894,29 @@ app.get('/api/trades/export', async (req, res) => {
   }
 });
 
+// Prometheus scrape target: latest metrics dumped by each Python script
+app.get('/metrics', async (req, res) => {
+  try {
+    const metricsText = await tradingBot.getMetrics();
+    
+    res.setHeader('Content-Type', 'text/plain; version=0.0.4');
+    res.send(`${metricsText}\n`);
+    
+  } catch (error) {
+    res.status(500).send('# Failed to read metrics\n');
+  }
+});
+
+app.get('/api/scheduler', async (req, res) => {
+  try {
+    const status = await tradingBot.getSchedulerStatus();
+    res.json(status);
+    
+  } catch (error) {
+    res.status(500).json({ error: error.message });
+  }
+});
+
 // SMS Configuration API
 app.get('/api/sms/status', (req, res) => {
   res.json({
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Vectorized technical indicators
+NumPy versions of the pandas_ta indicators used by the bot. Every function
+accepts a 1-D array (one symbol) or a 2-D (bars x symbols) array, so a whole
+watchlist can be evaluated in one pass.
+"""
+
+import numpy as np
+
+def ffill(values):
+    """Forward-fill NaNs along the bar axis; leading NaNs take the first valid value"""
+    values = np.array(values, dtype=float)
+    if values.size == 0:
+        return values
+
+    flat = values.ndim == 1
+    if flat:
+        values = values[:, None]
+
+    mask = np.isnan(values)
+    idx = np.where(~mask, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = values[idx, np.arange(values.shape[1])]
+
+    # Back-fill the leading gap so the recursive indicators have a seed
+    first_valid = np.argmax(~mask, axis=0)
+    seed = filled[first_valid, np.arange(values.shape[1])]
+    leading = np.arange(values.shape[0])[:, None] < first_valid
+    filled = np.where(leading, seed, filled)
+
+    return filled[:, 0] if flat else filled
+
+def valid_counts(values):
+    """Number of non-NaN bars per symbol"""
+    return np.sum(~np.isnan(np.asarray(values, dtype=float)), axis=0)
+
+def ema(values, length, seed=None):
+    """
+    Exponential moving average (adjust=False), seeded with the first bar, or
+    continued from seed (the EMA value as of the bar before values[0]).
+    pandas_ta instead seeds with the SMA of the first `length` bars and leaves
+    the bars before it NaN, so the two agree only once the seed has decayed,
+    a few multiples of `length` in.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.empty_like(values)
+    if values.shape[0] == 0:
+        return out
+
+    alpha = 2.0 / (length + 1)
+    if seed is None:
+        out[0] = values[0]
+    else:
+        seed = np.asarray(seed, dtype=float)
+        out[0] = np.where(np.isnan(seed), values[0], alpha * values[0] + (1 - alpha) * seed)
+    for i in range(1, values.shape[0]):
+        out[i] = alpha * values[i] + (1 - alpha) * out[i - 1]
+    return out
+
+def macd(close, fast=12, slow=26, signal=9, seeds=None):
+    """
+    Returns (macd, signal, histogram), the MACD_12_26_9 columns of ta.macd
+    once past the warm-up where ema() and pandas_ta seed differently;
+    seeds=(fast_ema, slow_ema, signal_ema) continues from a saved state
+    """
+    fast_seed, slow_seed, signal_seed = seeds if seeds is not None else (None, None, None)
+    macd_line = ema(close, fast, fast_seed) - ema(close, slow, slow_seed)
+    signal_line = ema(macd_line, signal, signal_seed)
+    return macd_line, signal_line, macd_line - signal_line
+
+def atr(high, low, close, length=14):
+    """Average true range with Wilder smoothing (ta.atr's default RMA)"""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    prev_close = np.concatenate([close[:1], close[:-1]], axis=0)
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+    out = np.empty_like(true_range)
+    if true_range.shape[0] == 0:
+        return out
+    alpha = 1.0 / length
+    out[0] = true_range[0]
+    for i in range(1, true_range.shape[0]):
+        out[i] = alpha * true_range[i] + (1 - alpha) * out[i - 1]
+    return out
+
+def vwap(high, low, close, volume):
+    """Cumulative volume-weighted average price over the supplied session"""
+    typical = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + np.asarray(close, dtype=float)) / 3
+    volume = np.asarray(volume, dtype=float)
+    cum_volume = np.cumsum(volume, axis=0)
+    cum_pv = np.cumsum(typical * volume, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(cum_volume > 0, cum_pv / cum_volume, typical)
+
+class EMAState:
+    """Incremental EMA matching ema() one bar at a time"""
+    def __init__(self, length, value=None):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.value = value
+
+    def peek(self, x):
+        """EMA if the current bar closed at x, without committing it"""
+        if self.value is None:
+            return x
+        return self.alpha * x + (1 - self.alpha) * self.value
+
+    def update(self, x):
+        self.value = self.peek(x)
+        return self.value
+
+class MACDState:
+    """Incremental MACD(12, 26, 9)"""
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+        self.bars = 0
+
+    def peek(self, close):
+        macd_line = self.fast.peek(close) - self.slow.peek(close)
+        signal_line = self.signal.peek(macd_line)
+        return macd_line, signal_line, macd_line - signal_line
+
+    def update(self, close):
+        macd_line = self.fast.update(close) - self.slow.update(close)
+        signal_line = self.signal.update(macd_line)
+        self.bars += 1
+        return macd_line, signal_line, macd_line - signal_line
+
+class VWAPState:
+    """
+    Incremental session VWAP fed by bars, or by individual trades. Trades given
+    a minute only stand in until that minute's bar arrives, which replaces them,
+    so a symbol streaming both never counts the same volume twice.
+    """
+    def __init__(self):
+        self.cum_pv = 0.0
+        self.cum_volume = 0.0
+        self.last_price = None
+        # minute -> [price x size, size] of trades not yet covered by a bar
+        self.pending = {}
+        self.pending_pv = 0.0
+        self.pending_volume = 0.0
+
+    @property
+    def value(self):
+        volume = self.cum_volume + self.pending_volume
+        if volume > 0:
+            return (self.cum_pv + self.pending_pv) / volume
+        return self.last_price
+
+    def update(self, high, low, close, volume, minute=None):
+        if minute is not None and self.pending:
+            for covered in [m for m in self.pending if m <= minute]:
+                del self.pending[covered]
+            self.pending_pv = sum(pv for pv, _ in self.pending.values())
+            self.pending_volume = sum(size for _, size in self.pending.values())
+        typical = (high + low + close) / 3
+        self.cum_pv += typical * volume
+        self.cum_volume += volume
+        self.last_price = close
+        return self.value
+
+    def update_trade(self, price, size, minute=None):
+        if minute is None:
+            self.cum_pv += price * size
+            self.cum_volume += size
+        else:
+            entry = self.pending.setdefault(minute, [0.0, 0.0])
+            entry[0] += price * size
+            entry[1] += size
+            self.pending_pv += price * size
+            self.pending_volume += size
+        self.last_price = price
+        return self.value
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Structured logging that stays off the hot path
+Modules log through ordinary stdlib loggers with lazy arguments
+(logger.info("Trading %s: %d shares", symbol, shares)), so a disabled level
+costs one comparison and an enabled one costs a deque append: the record is
+parked in an in-memory ring buffer and a background writer thread does the
+message formatting and the write. When the buffer is full the oldest records
+are dropped and counted rather than stalling the caller.
+
+Output is one JSON object per line on stderr (ts, level, logger, msg, job,
+trace_id and any extra= fields), which the Node worker parses and forwards to
+its own logger. LOG_FORMAT=text gives plain lines; the default, auto, uses
+text on a terminal and JSON otherwise.
+
+Levels: LOG_LEVEL (default INFO) for everything, overridden per module by
+LOG_LEVELS="pattern_analyzer=DEBUG,monitor_positions=WARNING".
+"""
+
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import metrics
+import tracing
+from config import Config
+
+DROPPED = metrics.counter('trading_log_records_dropped_total', 'Log records dropped because the ring buffer was full')
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'span_id'}
+
+def parse_level(name, default=None):
+    level = logging.getLevelName(str(name).strip().upper())
+    return level if isinstance(level, int) else default
+
+def parse_levels(spec):
+    """'mod=LEVEL,other=LEVEL' -> {'mod': 10, ...}, skipping malformed entries"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        level = parse_level(level)
+        if name.strip() and level is not None:
+            levels[name.strip()] = level
+    return levels
+
+def get_logger(name):
+    """Logger for a module; entry scripts run as __main__ get their file name"""
+    if name == '__main__':
+        name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or name
+    return logging.getLogger(name)
+
+def record_message(record):
+    try:
+        return record.getMessage()
+    except Exception:
+        return f"{record.msg} {record.args!r}"
+
+class RingBufferHandler(logging.Handler):
+    """Hands records to a writer thread through a bounded deque"""
+
+    def __init__(self, capacity, interval, stream=None, fmt='json', job=None):
+        super().__init__()
+        self.buffer = deque(maxlen=capacity)
+        self.capacity = capacity
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.format_record = self.to_text if fmt == 'text' else self.to_json
+        self.job = job
+        self.dropped = 0
+        self.reported = 0
+        self.closed = False
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='log-writer', daemon=True)
+        self.thread.start()
+
+    def handle(self, record):
+        # Nothing is formatted here, so Handler's lock only covers the full check and the append
+        if self.filters and not self.filter(record):
+            return False
+        if tracing.TRACER.enabled:
+            span = tracing.current_span.get()
+            record.span_id = span.span_id if span else None
+        self.acquire()
+        try:
+            if len(self.buffer) == self.capacity:
+                self.dropped += 1
+            self.buffer.append(record)
+        finally:
+            self.release()
+        if record.levelno >= logging.ERROR:
+            self.wakeup.set()
+        return True
+
+    def emit(self, record):
+        self.handle(record)
+
+    def to_json(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record_message(record)
+        }
+        if self.job:
+            entry['job'] = self.job
+        trace_id = tracing.trace_id()
+        if trace_id:
+            entry['trace_id'] = trace_id
+            entry['span_id'] = getattr(record, 'span_id', None)
+        for key, value in record.__dict__.items():
+            if key not in RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = logging.Formatter().formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+    def to_text(self, record):
+        line = record_message(record)
+        if record.levelno >= logging.WARNING and not line.startswith(('⚠', '❌', 'Error')):
+            line = f"{record.levelname}: {line}"
+        if record.exc_info:
+            line = f"{line}\n{logging.Formatter().formatException(record.exc_info)}"
+        return line
+
+    def drain(self):
+        lines = []
+        while True:
+            try:
+                record = self.buffer.popleft()
+            except IndexError:
+                break
+            try:
+                lines.append(self.format_record(record))
+            except Exception as e:
+                lines.append(json.dumps({'level': 'error', 'logger': 'jsonlog', 'msg': f"Unformattable record: {e}"}))
+
+        self.acquire()
+        try:
+            dropped = self.dropped
+        finally:
+            self.release()
+        if dropped > self.reported:
+            DROPPED.inc(dropped - self.reported)
+            self.reported = dropped
+            notice = logging.LogRecord('jsonlog', logging.WARNING, __file__, 0,
+                                       "⚠️ Log buffer full, %d records dropped so far", (dropped,), None)
+            lines.append(self.format_record(notice))
+
+        if lines:
+            try:
+                self.stream.write('\n'.join(lines) + '\n')
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+
+    def run(self):
+        while not self.closed:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.drain()
+
+    def flush(self):
+        self.drain()
+
+    def close(self):
+        """Stop the writer and write whatever is still buffered"""
+        if not self.closed:
+            self.closed = True
+            self.wakeup.set()
+            self.thread.join(timeout=2)
+            self.drain()
+        super().close()
+
+HANDLER = None
+
+def setup(job=None):
+    """Route every logger through the ring buffer; call once from an entry script's main"""
+    global HANDLER
+    if HANDLER is not None:
+        return HANDLER
+
+    fmt = Config.LOG_FORMAT.lower()
+    if fmt == 'auto':
+        fmt = 'text' if sys.stderr.isatty() else 'json'
+
+    # Skip the per-record caller lookup (file/line/function aren't emitted)
+    logging._srcfile = None
+    logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    root.setLevel(parse_level(Config.LOG_LEVEL, logging.INFO))
+    overrides = parse_levels(Config.LOG_LEVELS)
+    for name, level in overrides.items():
+        logging.getLogger(name).setLevel(level)
+
+    HANDLER = RingBufferHandler(Config.LOG_BUFFER_SIZE, Config.LOG_FLUSH_MS / 1000, fmt=fmt, job=job)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(HANDLER)
+    # Third-party chatter (urllib3 retries, yfinance) stays at WARNING unless asked for
+    for name in ('urllib3', 'yfinance', 'peewee', 'websockets', 'asyncio'):
+        if name not in overrides:
+            logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    atexit.register(HANDLER.close)
+    return HANDLER
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tick-to-trade latency records
+A record travels with a candidate from the screener through signal, order
+submission and fill. Each stage is an epoch timestamp; records are appended
+as compact JSON lines and later updates (e.g. the fill) are appended as
+partial records with the same id.
+
+Usage:
+    latency.py summary [--session YYYY-MM-DD]
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+import tracing
+
+LATENCY_LOG = 'latency.log'
+
+STAGES = ('bar_ts', 'data_arrival', 'screen_complete', 'signal', 'order_submit', 'broker_ack', 'fill')
+
+# (name, from stage, to stage) spans reported in summaries
+SPANS = (
+    ('bar_to_arrival', 'bar_ts', 'data_arrival'),
+    ('arrival_to_screen', 'data_arrival', 'screen_complete'),
+    ('screen_to_signal', 'screen_complete', 'signal'),
+    ('signal_to_submit', 'signal', 'order_submit'),
+    ('submit_to_ack', 'order_submit', 'broker_ack'),
+    ('ack_to_fill', 'broker_ack', 'fill'),
+    ('tick_to_trade', 'bar_ts', 'order_submit'),
+    ('submit_to_fill', 'order_submit', 'fill')
+)
+
+def new_record(symbol, bar_ts=None, source=None):
+    """Start a record for a symbol; bar_ts may be a datetime/Timestamp or epoch seconds"""
+    record = {
+        'id': uuid.uuid4().hex[:16],
+        'symbol': symbol,
+        'session': datetime.now().date().isoformat()
+    }
+    if source:
+        record['source'] = source
+    if tracing.trace_id():
+        record['trace_id'] = tracing.trace_id()
+    if bar_ts is not None:
+        record['bar_ts'] = to_epoch(bar_ts)
+    return record
+
+def mark(record, stage, ts=None):
+    """Stamp a stage on a record (no-op when record is None)"""
+    if record is not None:
+        record[stage] = to_epoch(ts) if ts is not None else time.time()
+    return record
+
+def to_epoch(ts):
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if hasattr(ts, 'timestamp'):
+        return ts.timestamp()
+    return datetime.fromisoformat(str(ts)).timestamp()
+
+class LatencyLog:
+    def __init__(self, path=LATENCY_LOG):
+        self.path = path
+
+    def append(self, record):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, separators=(',', ':'), default=str) + '\n')
+        except OSError as e:
+            print(f"Error writing latency record: {e}", file=sys.stderr)
+
+    def load(self, session=None):
+        """Merge partial records by id"""
+        records = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    records.setdefault(entry['id'], {}).update(entry)
+        except OSError:
+            return []
+
+        merged = list(records.values())
+        if session:
+            merged = [r for r in merged if r.get('session') == session]
+        return merged
+
+    def resolve_fills(self, api, session=None):
+        """Append fill times for today's acknowledged orders that have since filled"""
+        resolved = 0
+        for record in self.load(session or datetime.now().date().isoformat()):
+            if 'fill' in record or 'broker_ack' not in record or not record.get('order_id'):
+                continue
+            try:
+                order = api.get_order(record['order_id'])
+            except Exception as e:
+                print(f"Error resolving fill for {record['symbol']}: {e}", file=sys.stderr)
+                continue
+            if order.filled_at:
+                self.append({'id': record['id'], 'fill': to_epoch(order.filled_at)})
+                resolved += 1
+        return resolved
+
+    def summary(self, session=None):
+        """Percentiles (ms) for every span across the session's records"""
+        records = self.load(session)
+        stage_times = {
+            stage: np.array([r.get(stage, np.nan) for r in records], dtype=float)
+            for stage in STAGES
+        }
+
+        spans = {}
+        for name, start, end in SPANS:
+            values = (stage_times[end] - stage_times[start]) * 1000
+            values = values[~np.isnan(values)]
+            if values.size == 0:
+                continue
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            spans[name] = {
+                'count': int(values.size),
+                'p50_ms': float(p50),
+                'p90_ms': float(p90),
+                'p99_ms': float(p99),
+                'max_ms': float(values.max())
+            }
+
+        return {
+            'session': session,
+            'records': len(records),
+            'spans': spans
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Tick-to-trade latency summaries')
+    parser.add_argument('command', choices=['summary'])
+    parser.add_argument('--session', default=datetime.now().date().isoformat(), help='Session date (YYYY-MM-DD)')
+    parser.add_argument('--log', default=LATENCY_LOG)
+    args = parser.parse_args()
+
+    print(json.dumps(LatencyLog(args.log).summary(args.session), indent=2))
+
+if __name__ == "__main__":
+    main()
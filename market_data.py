@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Pluggable market data providers
+Every provider answers the same calls with the same shapes, so the screeners,
+pattern analysis and position monitor don't care where data comes from:
+
+    history(symbol, period, interval, prepost)   DataFrame of Open/High/Low/
+                                                 Close/Volume, ET timestamps
+    bars(symbols, period, interval, prepost)     ({field: (bars x symbols)
+                                                 array}, index) or (None, None)
+    snapshots(symbols)                           {symbol: {'price',
+                                                 'prev_close', 'volume',
+                                                 'timestamp'}}; timestamp is
+                                                 the last print's epoch seconds,
+                                                 None when only a daily bar
+                                                 is known
+    fundamentals(symbol)                         {'market_cap',
+                                                 'average_volume',
+                                                 'shares_outstanding',
+                                                 'float_shares'}
+
+period/interval use yfinance's spelling ('1d', '5d', '3mo'; '1m', '5m', '1d').
+Capability flags (max_batch, max_snapshot_batch, requests_per_minute,
+fundamentals_supported) drive batching and client-side throttling, so
+callers pass whole symbol lists and each backend is split optimally.
+MARKET_DATA_PROVIDER picks the backend (yfinance, alpaca, polygon, replay,
+or stream, which reads today's bars from a running bar_stream.py ingestor).
+
+Usage:
+    market_data.py capabilities                 # JSON flags for every provider
+    market_data.py record OUT SYMBOL [SYMBOL...] [--period 5d] [--interval 1m]
+                                                # capture bars for the replay provider
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+import market_feed
+import metrics
+import tracing
+from config import Config
+
+TIMEZONE = 'America/New_York'
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+INTERVALS = {
+    '1m': (1, 'minute'), '2m': (2, 'minute'), '5m': (5, 'minute'), '15m': (15, 'minute'),
+    '30m': (30, 'minute'), '60m': (1, 'hour'), '1h': (1, 'hour'), '1d': (1, 'day')
+}
+PERIOD_UNITS = {'d': 1, 'wk': 7, 'mo': 30, 'y': 365}
+# Regular session in ET minutes of day, for prepost=False
+REGULAR_OPEN, REGULAR_CLOSE = 9 * 60 + 30, 16 * 60
+
+def parse_interval(interval):
+    try:
+        return INTERVALS[interval]
+    except KeyError:
+        raise ValueError(f"Unsupported interval {interval!r}") from None
+
+def period_days(period):
+    for unit in sorted(PERIOD_UNITS, key=len, reverse=True):
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return int(period[:-len(unit)]) * PERIOD_UNITS[unit]
+    raise ValueError(f"Unsupported period {period!r}")
+
+def window(period):
+    """UTC (start, end) wide enough to hold period's sessions across weekends and holidays"""
+    end = datetime.now(timezone.utc)
+    return end - timedelta(days=period_days(period) * 7 // 5 + 4), end
+
+def empty_frame():
+    return pd.DataFrame(columns=list(FIELDS), index=pd.DatetimeIndex([], tz=TIMEZONE), dtype=float)
+
+def standard_frame(frame):
+    """Open/High/Low/Close/Volume floats on a sorted ET index"""
+    if frame is None or frame.empty:
+        return empty_frame()
+    frame = frame[list(FIELDS)].astype(float)
+    index = pd.DatetimeIndex(frame.index)
+    frame.index = index.tz_convert(TIMEZONE) if index.tz is not None else index.tz_localize(TIMEZONE)
+    return frame.sort_index()
+
+def trim(frame, period, interval, prepost):
+    """Keep the sessions yfinance would return for period (the last N trading days for 'Nd')"""
+    if frame.empty:
+        return frame
+    if not prepost and parse_interval(interval)[1] != 'day':
+        minutes = frame.index.hour * 60 + frame.index.minute
+        frame = frame[(minutes >= REGULAR_OPEN) & (minutes < REGULAR_CLOSE)]
+        if frame.empty:
+            return frame
+    if period.endswith('d'):
+        days = frame.index.normalize()
+        return frame[days.isin(days.unique()[-period_days(period):])]
+    return frame[frame.index >= frame.index[-1] - pd.Timedelta(days=period_days(period))]
+
+def resample(frame, interval):
+    """Aggregate finer bars up to interval (ET-day bins for '1d')"""
+    amount, unit = parse_interval(interval)
+    rule = {'minute': f"{amount}min", 'hour': f"{amount}h", 'day': f"{amount}D"}[unit]
+    bars = frame.resample(rule).agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    return bars.dropna(subset=['Close'])
+
+def align(frames, symbols):
+    """Per-symbol frames as (bars x symbols) arrays on their union index, NaN where missing"""
+    present = [frame.index for frame in frames.values() if not frame.empty]
+    if not present:
+        return None, None
+    index = present[0].append(present[1:]).unique().sort_values() if len(present) > 1 else present[0]
+    fields = {}
+    for field in FIELDS:
+        columns = [frames[s][field].reindex(index).to_numpy(dtype=float) if s in frames else np.full(len(index), np.nan)
+                   for s in symbols]
+        fields[field] = np.column_stack(columns)
+    return fields, index
+
+def snapshot_from_daily(symbol, frame):
+    if frame.empty:
+        return None
+    return {
+        'symbol': symbol,
+        'price': float(frame['Close'].iloc[-1]),
+        'prev_close': float(frame['Close'].iloc[-2]) if len(frame) > 1 else None,
+        'volume': float(frame['Volume'].iloc[-1]),
+        # A daily bar is stamped at midnight; it says nothing about the last print
+        'timestamp': None
+    }
+
+class MarketDataProvider:
+    """Base provider: subclasses implement fetch_history (and optionally the others)"""
+    name = 'base'
+    max_batch = 1                # symbols per history request
+    max_snapshot_batch = 1       # symbols per snapshot request
+    requests_per_minute = None   # client-side limit; None = don't throttle
+    fundamentals_supported = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_request = 0.0
+
+    def capabilities(self):
+        return {
+            'max_batch': self.max_batch,
+            'max_snapshot_batch': self.max_snapshot_batch,
+            'requests_per_minute': self.requests_per_minute,
+            'fundamentals': self.fundamentals_supported
+        }
+
+    def batches(self, symbols, size):
+        symbols = list(dict.fromkeys(symbols))
+        for i in range(0, len(symbols), max(1, size)):
+            yield symbols[i:i + size]
+
+    def throttle(self):
+        """Space requests evenly under requests_per_minute"""
+        if not self.requests_per_minute:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_request - now
+            self.next_request = max(now, self.next_request) + 60.0 / self.requests_per_minute
+        if wait > 0:
+            time.sleep(wait)
+
+    def call(self, call, fn, *args, symbol=None):
+        self.throttle()
+        with tracing.span(f"{self.name}.{call}", symbol=symbol), metrics.FETCH_SECONDS.labels(self.name, call).time():
+            try:
+                return fn(*args)
+            except Exception as e:
+                metrics.record_fetch_error(self.name, e)
+                raise
+
+    def history(self, symbol, period='1d', interval='1m', prepost=True):
+        frames = self.call('history', self.fetch_history, [symbol], period, interval, prepost, symbol=symbol)
+        return frames.get(symbol, empty_frame())
+
+    def bars(self, symbols, period='1d', interval='1m', prepost=True):
+        symbols = list(symbols)
+        frames = {}
+        for chunk in self.batches(symbols, self.max_batch):
+            frames.update(self.call('bars', self.fetch_history, chunk, period, interval, prepost))
+        return align(frames, symbols)
+
+    def snapshots(self, symbols):
+        out = {}
+        for chunk in self.batches(symbols, self.max_snapshot_batch):
+            out.update(self.call('snapshots', self.fetch_snapshots, chunk))
+        return out
+
+    def fundamentals(self, symbol):
+        if not self.fundamentals_supported:
+            return {}
+        return self.call('fundamentals', self.fetch_fundamentals, symbol, symbol=symbol)
+
+    def fetch_history(self, symbols, period, interval, prepost):
+        """{symbol: standard_frame} for one batch"""
+        raise NotImplementedError
+
+    def fetch_snapshots(self, symbols):
+        # Daily bars carry everything a snapshot needs
+        frames = self.fetch_history(symbols, '5d', '1d', True)
+        snapshots = {symbol: snapshot_from_daily(symbol, frame) for symbol, frame in frames.items()}
+        return {symbol: snap for symbol, snap in snapshots.items() if snap}
+
+    def fetch_fundamentals(self, symbol):
+        return {}
+
+class YFinanceProvider(MarketDataProvider):
+    name = 'yfinance'
+    # yf.download fans a batch out over its own threads; Yahoo doesn't publish a limit
+    max_batch = 100
+    max_snapshot_batch = 100
+
+    def fetch_history(self, symbols, period, interval, prepost):
+        import yfinance as yf
+
+        if len(symbols) == 1:
+            data = yf.Ticker(symbols[0]).history(period=period, interval=interval, prepost=prepost)
+            return {symbols[0]: standard_frame(data)}
+
+        data = yf.download(symbols, period=period, interval=interval, prepost=prepost,
+                           progress=False, group_by='ticker', threads=True)
+        if data.empty:
+            return {}
+        present = set(data.columns.get_level_values(0))
+        return {symbol: standard_frame(data[symbol].dropna(how='all')) for symbol in symbols if symbol in present}
+
+    def fetch_fundamentals(self, symbol):
+        import yfinance as yf
+
+        info = yf.Ticker(symbol).info
+        return {
+            'market_cap': info.get('marketCap'),
+            'average_volume': info.get('averageVolume'),
+            'shares_outstanding': info.get('sharesOutstanding'),
+            'float_shares': info.get('floatShares')
+        }
+
+class AlpacaDataProvider(MarketDataProvider):
+    """Alpaca market data v2 (multi-symbol bars and snapshots; no fundamentals)"""
+    name = 'alpaca'
+    max_batch = 200
+    max_snapshot_batch = 200
+    requests_per_minute = 200  # free plan
+    fundamentals_supported = False
+
+    def __init__(self, api=None, feed=None):
+        super().__init__()
+        if api is None:
+            import alpaca_trade_api as tradeapi
+            api = tradeapi.REST(
+                os.getenv('ALPACA_API_KEY'),
+                os.getenv('ALPACA_SECRET_KEY'),
+                base_url=os.getenv('ALPACA_BASE_URL', 'https://paper-api.alpaca.markets')
+            )
+        self.api = api
+        self.feed = feed or Config.ALPACA_DATA_FEED
+
+    def fetch_history(self, symbols, period, interval, prepost):
+        from alpaca_trade_api.rest import TimeFrame, TimeFrameUnit
+
+        amount, unit = parse_interval(interval)
+        units = {'minute': TimeFrameUnit.Minute, 'hour': TimeFrameUnit.Hour, 'day': TimeFrameUnit.Day}
+        start, end = window(period)
+        data = self.api.get_bars(symbols, TimeFrame(amount, units[unit]), start.isoformat(), end.isoformat(),
+                                 adjustment='raw', feed=self.feed).df
+        if data.empty:
+            return {}
+        data = data.rename(columns=str.title)
+        groups = data.groupby('Symbol') if 'Symbol' in data.columns else [(symbols[0], data)]
+        return {symbol: trim(standard_frame(frame), period, interval, prepost) for symbol, frame in groups}
+
+    def fetch_snapshots(self, symbols):
+        out = {}
+        for symbol, snap in self.api.get_snapshots(symbols, feed=self.feed).items():
+            if snap is None or snap.daily_bar is None:
+                continue
+            trade = snap.latest_trade
+            out[symbol] = {
+                'symbol': symbol,
+                'price': float(trade.price if trade else snap.daily_bar.close),
+                'prev_close': float(snap.prev_daily_bar.close) if snap.prev_daily_bar else None,
+                'volume': float(snap.daily_bar.volume),
+                'timestamp': pd.Timestamp(trade.timestamp).timestamp() if trade else None
+            }
+        return out
+
+class PolygonProvider(MarketDataProvider):
+    """Polygon.io REST (aggregates are per ticker; snapshots batch)"""
+    name = 'polygon'
+    base_url = 'https://api.polygon.io'
+    max_batch = 1
+    max_snapshot_batch = 250
+    requests_per_minute = 5  # free plan; POLYGON_REQUESTS_PER_MINUTE for paid ones
+
+    def __init__(self, api_key=None, requests_per_minute=None):
+        super().__init__()
+        import requests
+
+        self.api_key = api_key or Config.POLYGON_API_KEY
+        self.requests_per_minute = requests_per_minute or Config.POLYGON_REQUESTS_PER_MINUTE or None
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {self.api_key}"
+
+    def get(self, path, **params):
+        response = self.session.get(f"{self.base_url}{path}", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_history(self, symbols, period, interval, prepost):
+        amount, unit = parse_interval(interval)
+        start, end = window(period)
+        frames = {}
+        for symbol in symbols:
+            data = self.get(f"/v2/aggs/ticker/{symbol}/range/{amount}/{unit}/"
+                            f"{int(start.timestamp() * 1000)}/{int(end.timestamp() * 1000)}",
+                            adjusted='true', sort='asc', limit=50000)
+            results = data.get('results') or []
+            if not results:
+                continue
+            frame = pd.DataFrame(results).rename(columns={'o': 'Open', 'h': 'High', 'l': 'Low', 'c': 'Close', 'v': 'Volume'})
+            frame.index = pd.to_datetime(frame['t'], unit='ms', utc=True)
+            frames[symbol] = trim(standard_frame(frame), period, interval, prepost)
+        return frames
+
+    def fetch_snapshots(self, symbols):
+        data = self.get('/v2/snapshot/locale/us/markets/stocks/tickers', tickers=','.join(symbols))
+        out = {}
+        for item in data.get('tickers') or []:
+            day, prev, trade = item.get('day') or {}, item.get('prevDay') or {}, item.get('lastTrade') or {}
+            price = trade.get('p') or day.get('c')
+            if not price:
+                continue
+            out[item['ticker']] = {
+                'symbol': item['ticker'],
+                'price': float(price),
+                'prev_close': float(prev['c']) if prev.get('c') else None,
+                'volume': float(day.get('v') or 0),
+                'timestamp': trade['t'] / 1e9 if trade.get('t') else None
+            }
+        return out
+
+    def fetch_fundamentals(self, symbol):
+        results = self.get(f"/v3/reference/tickers/{symbol}").get('results') or {}
+        return {
+            'market_cap': results.get('market_cap'),
+            'average_volume': None,
+            'shares_outstanding': results.get('share_class_shares_outstanding'),
+            # Ticker details carry no float; weighted shares outstanding isn't one
+            'float_shares': None
+        }
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves bars recorded in the market_feed replay format (NDJSON or CSV bar
+    events) for offline tests and benchmarks. Periods count back from the last
+    recorded bar rather than now; coarser intervals are resampled from the
+    recorded bars. Fundamentals come from <path>.fundamentals.json if present.
+    """
+    name = 'replay'
+    max_batch = 10000
+    max_snapshot_batch = 10000
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or Config.MARKET_DATA_REPLAY
+        self.frames = None
+
+    def load(self):
+        if self.frames is None:
+            rows = {}
+            for event in market_feed.ReplayFeed(self.path).read_events():
+                if event['type'] == 'bar':
+                    rows.setdefault(event['symbol'], []).append(event)
+            self.frames = {}
+            for symbol, events in rows.items():
+                frame = pd.DataFrame(events).rename(columns=str.title)
+                frame.index = pd.to_datetime(frame['Timestamp'], unit='s', utc=True)
+                self.frames[symbol] = standard_frame(frame)
+        return self.frames
+
+    def fetch_history(self, symbols, period, interval, prepost):
+        frames = self.load()
+        out = {}
+        for symbol in symbols:
+            frame = frames.get(symbol)
+            if frame is None or frame.empty:
+                continue
+            frame = trim(frame, period, '1m', prepost)
+            out[symbol] = resample(frame, interval) if interval != '1m' else frame
+        return out
+
+    def fetch_fundamentals(self, symbol):
+        try:
+            with open(f"{self.path}.fundamentals.json") as f:
+                return json.load(f).get(symbol, {})
+        except FileNotFoundError:
+            return {}
+
+class StreamProvider(MarketDataProvider):
+    """
+    Today's minute bars (including the in-progress one) from the shared ring
+    buffers a bar_stream.py ingestor maintains. Earlier days of a multi-day
+    period come from the BAR_STREAM_FALLBACK provider, as does everything for
+    daily bars, any symbol it isn't streaming, or any time its heartbeat is stale.
+    """
+    name = 'stream'
+    max_batch = 10000
+    max_snapshot_batch = 10000
+
+    def __init__(self, fallback=None):
+        super().__init__()
+        if fallback is None and Config.BAR_STREAM_FALLBACK.lower() == self.name:
+            raise ValueError("BAR_STREAM_FALLBACK can't be the stream provider itself")
+        self.fallback = fallback or get_provider(Config.BAR_STREAM_FALLBACK)
+        self.fundamentals_supported = self.fallback.fundamentals_supported
+        self.store = None
+
+    def open_store(self):
+        import bar_stream
+
+        if self.store is None:
+            self.store = bar_stream.BarStore.open()
+        elif not self.store.fresh():
+            # The ingestor may have restarted with a new file
+            self.store = bar_stream.BarStore.open()
+        return self.store if self.store is not None and self.store.fresh() else None
+
+    def fetch_history(self, symbols, period, interval, prepost):
+        store = self.open_store()
+        if store is None or parse_interval(interval)[1] == 'day':
+            return self.fallback.call('history', self.fallback.fetch_history, symbols, period, interval, prepost)
+
+        # Today's session comes from the store; a longer period fills the earlier days from the fallback
+        today, missing = {}, []
+        for symbol in symbols:
+            frame = store.frame(symbol)
+            if frame is None or frame.empty:
+                missing.append(symbol)
+                continue
+            session = frame.index[-1].normalize()
+            frame = trim(frame[frame.index >= session], '1d', '1m', prepost)
+            if interval != '1m' and not frame.empty:
+                frame = resample(frame, interval)
+            today[symbol] = session, frame
+
+        earlier = list(today) if period != '1d' else []
+        frames = {}
+        if missing or earlier:
+            frames = self.fallback.call('history', self.fallback.fetch_history, missing + earlier, period, interval, prepost)
+        for symbol, (session, frame) in today.items():
+            older = frames.get(symbol)
+            if older is not None and not older.empty:
+                # The fallback may or may not have today yet; keep the stream's bars for it
+                frame = trim(pd.concat([older[older.index < session], frame]), period, interval, prepost)
+            frames[symbol] = frame
+        return frames
+
+    def fetch_snapshots(self, symbols):
+        return self.fallback.call('snapshots', self.fallback.fetch_snapshots, symbols)
+
+    def fetch_fundamentals(self, symbol):
+        return self.fallback.call('fundamentals', self.fallback.fetch_fundamentals, symbol, symbol=symbol)
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'alpaca': AlpacaDataProvider,
+    'polygon': PolygonProvider,
+    'replay': ReplayProvider,
+    'stream': StreamProvider
+}
+_instances = {}
+
+def get_provider(name=None):
+    """Shared provider instance for MARKET_DATA_PROVIDER (or name)"""
+    name = (name or Config.MARKET_DATA_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown market data provider {name!r} (choose from {', '.join(PROVIDERS)})")
+    if name not in _instances:
+        _instances[name] = PROVIDERS[name]()
+    return _instances[name]
+
+def record(provider, symbols, path, period='5d', interval='1m'):
+    """Write bars from a live provider as replay events; returns the number written"""
+    written = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        for chunk in provider.batches(symbols, provider.max_batch):
+            frames = provider.call('bars', provider.fetch_history, chunk, period, interval, True)
+            for symbol, frame in frames.items():
+                for ts, row in zip(frame.index, frame.itertuples(index=False)):
+                    f.write(json.dumps({'type': 'bar', 'symbol': symbol, 'timestamp': ts.timestamp(),
+                                        'open': row.Open, 'high': row.High, 'low': row.Low,
+                                        'close': row.Close, 'volume': row.Volume}) + '\n')
+                    written += 1
+    os.replace(tmp_path, path)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Market data providers')
+    parser.add_argument('--provider', default=None, help='Provider to use (default MARKET_DATA_PROVIDER)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('capabilities', help='Print capability flags for every provider')
+    recorder = commands.add_parser('record', help='Capture bars to a replay file')
+    recorder.add_argument('out')
+    recorder.add_argument('symbols', nargs='+')
+    recorder.add_argument('--period', default='5d')
+    recorder.add_argument('--interval', default='1m')
+    args = parser.parse_args()
+
+    if args.command == 'capabilities':
+        print(json.dumps({name: {k: getattr(cls, k) for k in ('max_batch', 'max_snapshot_batch',
+                                                              'requests_per_minute', 'fundamentals_supported')}
+                          for name, cls in PROVIDERS.items()}, indent=2))
+        return
+
+    try:
+        written = record(get_provider(args.provider), [s.upper() for s in args.symbols],
+                         args.out, args.period, args.interval)
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+    print(json.dumps({'success': True, 'path': args.out, 'bars': written}))
+
+if __name__ == "__main__":
+    main()
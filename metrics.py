@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Metrics registry (counters, gauges, histograms) in Prometheus text format
+Each entry script calls metrics.start(job) once; at exit the registry is
+written to METRICS_DIR/<job>.prom (node_exporter textfile layout, also served
+by the Node worker at /metrics). Long-running scripts can set METRICS_PORT to
+expose the registry over HTTP instead.
+
+Recording is a dict lookup plus a locked add, so it is safe to call inside
+per-symbol loops and worker threads.
+
+Usage:
+    metrics.py            # print every dumped .prom file, merged
+"""
+
+import atexit
+import bisect
+import glob
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+from config import Config
+
+# Seconds; covers sub-millisecond indicator math up to multi-second scans
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Timer:
+    """Context manager that observes elapsed seconds into a histogram child"""
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+class CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+class GaugeChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+class HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return Timer(self)
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.default = self.labels()
+
+    def new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child series for these label values (positional, in labelnames order)"""
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.new_child())
+        return child
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self, extra=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra_label, value in self.samples():
+            labels = format_labels(self.labelnames, values, ','.join(l for l in (extra_label, extra) if l))
+            lines.append(f"{self.name}{suffix}{labels} {format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.default.inc(amount)
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            yield '', values, None, child.value
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def new_child(self):
+        return GaugeChild()
+
+    def set(self, value):
+        self.default.set(value)
+
+    def inc(self, amount=1):
+        self.default.inc(amount)
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            yield '', values, None, child.value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.default.observe(value)
+
+    def time(self):
+        return self.default.time()
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                cumulative += count
+                yield '_bucket', values, f'le="{format_value(float(bound))}"', cumulative
+            yield '_sum', values, None, child.sum
+            yield '_count', values, None, child.count
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.job = None
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        extra = f'job="{escape(self.job)}"' if self.job else None
+        lines = []
+        for metric in list(self.metrics.values()):
+            if metric.children:
+                lines.extend(metric.render(extra))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path=None):
+        """Atomically write the registry for this run"""
+        path = path or os.path.join(Config.METRICS_DIR, f"{self.job or 'python'}.prom")
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing metrics to {path}: {e}", file=sys.stderr)
+
+REGISTRY = Registry()
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+# Pipeline metrics shared by every entry script
+SCAN_SECONDS = histogram('trading_scan_duration_seconds', 'Wall time of one screener pass', ('screener',))
+SYMBOLS_SCANNED = counter('trading_symbols_scanned_total', 'Symbols evaluated by a screener', ('screener',))
+SYMBOLS_SKIPPED = counter('trading_symbols_skipped_total', 'Symbols rejected or skipped, by reason', ('screener', 'reason'))
+FETCH_SECONDS = histogram('trading_fetch_duration_seconds', 'Market data fetch latency', ('provider', 'call'))
+INDICATOR_SECONDS = histogram('trading_indicator_duration_seconds', 'Indicator computation time', ('source',))
+CACHE_REQUESTS = counter('trading_cache_requests_total', 'Cache lookups by result', ('cache', 'result'))
+CACHE_HIT_RATIO = gauge('trading_cache_hit_ratio', 'Hits over lookups since process start', ('cache',))
+BROKER_SECONDS = histogram('trading_broker_request_duration_seconds', 'Broker API call latency', ('endpoint',))
+BROKER_ERRORS = counter('trading_broker_errors_total', 'Broker API errors by HTTP status', ('endpoint', 'status'))
+RATE_LIMITED = counter('trading_http_429_total', 'HTTP 429 responses', ('provider',))
+RETRIES = counter('trading_http_retries_total', 'Requests retried after a retryable response', ('provider',))
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+    hits = CACHE_REQUESTS.labels(cache, 'hit').value
+    misses = CACHE_REQUESTS.labels(cache, 'miss').value
+    CACHE_HIT_RATIO.labels(cache).set(hits / (hits + misses))
+
+def record_fetch_error(provider, error):
+    """Count rate limiting from providers that signal it by exception"""
+    status = getattr(error, 'status_code', None)
+    if status == 429 or 'RateLimit' in type(error).__name__ or '429' in str(error):
+        RATE_LIMITED.labels(provider).inc()
+
+class InstrumentedAPI:
+    """Wraps an alpaca_trade_api REST client, timing every call by endpoint"""
+
+    def __init__(self, api):
+        self._api = api
+        self._wrapped = {}
+        self.hook_retries(api)
+
+    @staticmethod
+    def hook_retries(api):
+        # REST retries 429/504 internally by catching RetryException from
+        # _one_request; count each one on its way through (a 429 that
+        # exhausts its retries still surfaces as an APIError below)
+        one_request = getattr(api, '_one_request', None)
+        if one_request is None:
+            return
+
+        def counted(*args, **kwargs):
+            try:
+                return one_request(*args, **kwargs)
+            except Exception as e:
+                if type(e).__name__ == 'RetryException':
+                    RETRIES.labels('alpaca').inc()
+                raise
+
+        api._one_request = counted
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            timer = BROKER_SECONDS.labels(name)
+
+            def wrapped(*args, **kwargs):
+                started = time.perf_counter()
+                with tracing.span(f"alpaca.{name}", symbol=kwargs.get('symbol')) as span:
+                    try:
+                        result = attr(*args, **kwargs)
+                        span.set(http_status=200)
+                        return result
+                    except Exception as e:
+                        status = getattr(e, 'status_code', None) or 'error'
+                        span.set(http_status=status)
+                        BROKER_ERRORS.labels(name, str(status)).inc()
+                        if status == 429:
+                            RATE_LIMITED.labels('alpaca').inc()
+                        raise
+                    finally:
+                        timer.observe(time.perf_counter() - started)
+
+            self._wrapped[name] = wrapped
+        return wrapped
+
+def instrument(api):
+    return InstrumentedAPI(api)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve(port):
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics on :{port}/metrics", file=sys.stderr)
+    return server
+
+def start(job):
+    """Name this run's metrics and arrange for them to be exported"""
+    REGISTRY.job = job
+    if Config.METRICS_PORT:
+        serve(Config.METRICS_PORT)
+    atexit.register(REGISTRY.dump)
+
+def merge(paths):
+    """Merge dumped .prom files so each family's HELP/TYPE appears once"""
+    families = {}
+    for path in sorted(paths):
+        try:
+            with open(path) as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        current = None
+        for line in lines:
+            if line.startswith(('# HELP ', '# TYPE ')):
+                # Either header can come first; the first file to carry each one wins
+                kind, current = line.split(' ', 3)[1:3]
+                family = families.setdefault(current, {'HELP': None, 'TYPE': None, 'samples': []})
+                if family[kind] is None:
+                    family[kind] = line
+            elif line and current:
+                families[current]['samples'].append(line)
+
+    out = []
+    for family in families.values():
+        out.extend(line for line in (family['HELP'], family['TYPE']) if line)
+        out.extend(family['samples'])
+    return '\n'.join(out) + '\n'
+
+def main():
+    sys.stdout.write(merge(glob.glob(os.path.join(Config.METRICS_DIR, '*.prom'))))
+
+if __name__ == "__main__":
+    main()
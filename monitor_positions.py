@@ -4,94 +4,146 @@ Monitor positions script for Node.js integration
 Monitors MACD and other indicators for open positions
 """
 
-import sys
 import json
 import alpaca_trade_api as tradeapi
-import yfinance as yf
-import pandas_ta as ta
+import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
+import indicators
+import jsonlog
+import latency
+import market_data
+import metrics
+import scheduler
+import tracing
+from risk_engine import RiskEngine
+from trade_journal import TradeJournal
+
 # Load environment variables
 load_dotenv()
 
+logger = jsonlog.get_logger(__name__)
+
+# Same history requirement as the screeners (EMA_200 needs 200 bars)
+MIN_BARS = 200
+MAX_WORKERS = 8
+
 class PositionMonitor:
     def __init__(self):
-        self.api = tradeapi.REST(
+        self.api = metrics.instrument(tradeapi.REST(
             os.getenv('ALPACA_API_KEY'),
             os.getenv('ALPACA_SECRET_KEY'),
             base_url=os.getenv('ALPACA_BASE_URL', 'https://paper-api.alpaca.markets')
-        )
+        ))
+        self.journal = TradeJournal()
+        self.risk = RiskEngine()
+        self.data = market_data.get_provider()
     
     def get_open_positions(self):
         return self.api.list_positions()
     
-    def calculate_technical_indicators(self, ticker):
+    @tracing.traced('monitor.fetch_bars')
+    def fetch_bars(self, symbols):
+        """1-minute bars for every held symbol, batched as the provider allows; (bars, index)"""
+        bars, index = self.data.bars(symbols, period='1d', interval='1m', prepost=True)
+        tracing.current().set(symbols=len(symbols), bars=0 if index is None else len(index))
+        return bars, index
+    
+    def calculate_technical_indicators(self, symbols):
+        """Latest VWAP/EMA/MACD values for all symbols as (symbols,) arrays"""
         try:
-            # Get 1-minute data for technical analysis
-            data = yf.download(ticker, period='1d', interval='1m', prepost=True, progress=False)
+            bars, _ = self.fetch_bars(symbols)
             
-            if data.empty or len(data) < 200:
+            if bars is None:
                 return None
             
-            # Calculate indicators
-            data['VWAP'] = ta.vwap(data['High'], data['Low'], data['Close'], data['Volume'])
-            data['EMA_9'] = ta.ema(data['Close'], length=9)
-            data['EMA_20'] = ta.ema(data['Close'], length=20)
-            data['EMA_200'] = ta.ema(data['Close'], length=200)
-            
-            # MACD calculation
-            macd_data = ta.macd(data['Close'])
-            data['MACD'] = macd_data['MACD_12_26_9']
-            data['MACD_Signal'] = macd_data['MACDs_12_26_9']
-            data['MACD_Histogram'] = macd_data['MACDh_12_26_9']
-            
-            return data.iloc[-1]  # Return latest values
+            with metrics.INDICATOR_SECONDS.labels('monitor').time():
+                close = indicators.ffill(bars['Close'])
+                high = indicators.ffill(bars['High'])
+                low = indicators.ffill(bars['Low'])
+                volume = np.nan_to_num(bars['Volume'])
+                
+                macd, macd_signal, macd_histogram = indicators.macd(close)
+                
+                return {
+                    'valid': indicators.valid_counts(bars['Close']) >= MIN_BARS,
+                    'VWAP': indicators.vwap(high, low, close, volume)[-1],
+                    'EMA_9': indicators.ema(close, 9)[-1],
+                    'EMA_20': indicators.ema(close, 20)[-1],
+                    'EMA_200': indicators.ema(close, 200)[-1],
+                    'MACD': macd[-1],
+                    'MACD_Signal': macd_signal[-1],
+                    'MACD_Histogram': macd_histogram[-1]
+                }
             
         except Exception as e:
-            print(f"Error calculating indicators for {ticker}: {e}", file=sys.stderr)
+            logger.error("Error calculating indicators for %s: %s", ', '.join(symbols), e)
             return None
     
     def is_macd_bullish(self, indicators):
+        # Works on scalars or arrays: MACD above signal and histogram positive
+        return (indicators['MACD'] > indicators['MACD_Signal']) & (indicators['MACD_Histogram'] > 0)
+    
+    def close_positions(self, symbols, reason):
+        """Cancel open orders and close every symbol concurrently"""
+        if not symbols:
+            return {}
+        
+        closed = {symbol: False for symbol in symbols}
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(symbols))) as pool:
+            try:
+                # Only these symbols' orders: a bulk cancel would also kill entry
+                # orders working for symbols we don't hold yet
+                orders = self.api.list_orders(status='open', symbols=symbols, limit=500)
+                list(pool.map(tracing.wrap(lambda order: self.api.cancel_order(order.id)), orders))
+            except Exception as e:
+                logger.error("Error cancelling orders for %s: %s", ', '.join(symbols), e)
+            
+            close = tracing.wrap(self.api.close_position)
+            futures = {pool.submit(close, symbol): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    future.result()
+                    closed[symbol] = True
+                    logger.info("🔴 Closed position %s due to %s", symbol, reason, extra={'symbol': symbol})
+                except Exception as e:
+                    logger.error("Error closing position %s: %s", symbol, e, extra={'symbol': symbol})
+        
+        self.release_exposure([symbol for symbol, ok in closed.items() if ok])
+        return closed
+    
+    def release_exposure(self, symbols):
+        """Free closed positions in the shared risk state so the next entry run sees the room"""
+        if not symbols:
+            return
         try:
-            macd = indicators['MACD']
-            macd_signal = indicators['MACD_Signal']
-            macd_histogram = indicators['MACD_Histogram']
-            
-            # MACD must be above signal line (bullish crossover)
-            macd_above_signal = macd > macd_signal
-            
-            # MACD histogram should be positive (strengthening)
-            histogram_positive = macd_histogram > 0
-            
-            # Both conditions must be true
-            return macd_above_signal and histogram_positive
-            
-        except:
-            return False
+            self.risk.record_closes(symbols)
+        except Exception as e:
+            logger.error("Error updating risk state for %s: %s", ', '.join(symbols), e)
     
-    def close_position_immediately(self, symbol, reason):
+    def journal_close(self, position, price, reason):
         try:
-            # Cancel all open orders for this symbol
-            orders = self.api.list_orders(status='open', symbols=[symbol])
-            for order in orders:
-                self.api.cancel_order(order.id)
-            
-            # Close the position
-            position = self.api.get_position(symbol)
-            if position.qty != '0':
-                self.api.close_position(symbol)
-                print(f"🔴 Closed position {symbol} due to {reason}", file=sys.stderr)
-                return True
-            
+            self.journal.append({
+                'symbol': position.symbol,
+                'action': 'SELL',
+                'shares': abs(float(position.qty)),
+                'price': price,
+                'pnl': float(position.unrealized_pl or 0),
+                'reason': reason
+            })
         except Exception as e:
-            print(f"Error closing position {symbol}: {e}", file=sys.stderr)
-            return False
-        
-        return False
+            logger.error("Error journaling close for %s: %s", position.symbol, e, extra={'symbol': position.symbol})
     
+    def close_position_immediately(self, symbol, reason):
+        return self.close_positions([symbol], reason)[symbol]
+    
+    @tracing.traced('monitor_positions')
     def monitor_positions(self):
-        positions = self.get_open_positions()
+        positions = [p for p in self.get_open_positions() if float(p.qty) != 0]
         
         results = {
             'positions_monitored': len(positions),
@@ -100,28 +152,40 @@ class PositionMonitor:
             'status_updates': []
         }
         
-        print(f"📊 Monitoring {len(positions)} open positions", file=sys.stderr)
+        logger.info("📊 Monitoring %d open positions", len(positions))
         
-        for position in positions:
-            symbol = position.symbol
-            current_price = float(position.market_value) / float(position.qty) if float(position.qty) != 0 else 0
-            
-            print(f"🔍 Checking {symbol} at ${current_price:.2f}", file=sys.stderr)
-            
-            # Get latest indicators
-            indicators = self.calculate_technical_indicators(symbol)
+        if not positions:
+            return results
+        
+        symbols = [p.symbol for p in positions]
+        prices = np.array([float(p.market_value) / float(p.qty) for p in positions])
+        
+        latest = self.calculate_technical_indicators(symbols)
+        
+        if latest is None:
+            results['warnings'].extend(f"Could not get indicators for {symbol}" for symbol in symbols)
+            return results
+        
+        # Evaluate exit rules for the whole book at once
+        valid = latest['valid']
+        macd_bullish = self.is_macd_bullish(latest)
+        exit_mask = valid & ~macd_bullish
+        below_vwap = prices < latest['VWAP']
+        
+        exit_symbols = [symbols[i] for i in np.flatnonzero(exit_mask)]
+        for symbol in exit_symbols:
+            logger.warning("⚠️ MACD turned bearish for %s - CLOSING POSITION", symbol, extra={'symbol': symbol})
+        
+        closed = self.close_positions(exit_symbols, "MACD_BEARISH")
+        
+        for i, symbol in enumerate(symbols):
+            current_price = float(prices[i])
             
-            if indicators is None:
+            if not valid[i]:
                 results['warnings'].append(f"Could not get indicators for {symbol}")
-                continue
-            
-            # Check if MACD turned bearish
-            macd_bullish = self.is_macd_bullish(indicators)
-            
-            if not macd_bullish:
-                print(f"⚠️ MACD turned bearish for {symbol} - CLOSING POSITION", file=sys.stderr)
-                
-                if self.close_position_immediately(symbol, "MACD_BEARISH"):
+            elif exit_mask[i]:
+                if closed.get(symbol):
+                    self.journal_close(positions[i], current_price, 'MACD_BEARISH')
                     results['positions_closed'] += 1
                     results['status_updates'].append({
                         'symbol': symbol,
@@ -130,35 +194,39 @@ class PositionMonitor:
                         'price': current_price
                     })
             else:
-                # Check other indicators for early warnings
-                try:
-                    vwap = indicators['VWAP']
-                    
-                    if current_price < vwap:
-                        results['warnings'].append(f"{symbol} below VWAP - weakness detected")
-                        print(f"⚠️ {symbol} below VWAP - weakness detected", file=sys.stderr)
-                    
-                    results['status_updates'].append({
-                        'symbol': symbol,
-                        'action': 'monitored',
-                        'price': current_price,
-                        'macd_bullish': macd_bullish,
-                        'above_vwap': current_price > vwap,
-                        'indicators': {
-                            'vwap': float(vwap),
-                            'macd': float(indicators['MACD']),
-                            'macd_signal': float(indicators['MACD_Signal'])
-                        }
-                    })
-                    
-                except Exception as e:
-                    print(f"Error processing indicators for {symbol}: {e}", file=sys.stderr)
+                vwap = float(latest['VWAP'][i])
+                
+                if below_vwap[i]:
+                    results['warnings'].append(f"{symbol} below VWAP - weakness detected")
+                    logger.warning("⚠️ %s below VWAP - weakness detected", symbol, extra={'symbol': symbol})
+                
+                results['status_updates'].append({
+                    'symbol': symbol,
+                    'action': 'monitored',
+                    'price': current_price,
+                    'macd_bullish': bool(macd_bullish[i]),
+                    'above_vwap': current_price > vwap,
+                    'indicators': {
+                        'vwap': vwap,
+                        'macd': float(latest['MACD'][i]),
+                        'macd_signal': float(latest['MACD_Signal'][i])
+                    }
+                })
+        
+        # Stamp fill times on latency records for orders that have filled since
+        try:
+            latency.LatencyLog().resolve_fills(self.api)
+        except Exception as e:
+            logger.error("Error resolving order fills: %s", e)
         
-        print(f"📈 Monitoring complete: {results['positions_closed']} positions closed", file=sys.stderr)
+        logger.info("📈 Monitoring complete: %d positions closed", results['positions_closed'])
         
         return results
 
 def main():
+    metrics.start('monitor_positions')
+    tracing.start('monitor_positions')
+    jsonlog.setup('monitor_positions')
     monitor = PositionMonitor()
     results = monitor.monitor_positions()
     
@@ -166,4 +234,4 @@ def main():
     print(json.dumps(results, indent=2))
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'monitor_positions')
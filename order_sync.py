@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Incremental order sync
+Keeps a local SQLite copy of broker orders. Each sync pages forward from a
+high-water mark on submitted_at and refreshes only orders that were still
+working last time, so polling cost scales with activity, not window size.
+
+Orders seen reaching a final state with shares filled are passed to the
+running daily stats, whoever submitted them: entries, profit targets, stops
+and closes count at their actual fill price, and a sell's P&L is matched
+FIFO against the buys in the store. Filled buys also move from pending to
+exposure in the shared risk state, so they stop holding a second claim on
+the symbol cap and position slots until the next resync.
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from config import Config
+from pnl_engine import fetch_orders, market_date, match_fifo
+
+# Orders in these states can still change; everything else is final
+OPEN_STATUSES = ('new', 'partially_filled', 'accepted', 'pending_new', 'accepted_for_bidding',
+                 'pending_cancel', 'pending_replace', 'held', 'calculated', 'done_for_day', 'stopped',
+                 'suspended', 'replaced')
+
+INITIAL_WINDOW_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    symbol TEXT,
+    status TEXT,
+    submitted_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_submitted ON orders (submitted_at);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def iso(value):
+    return value.isoformat() if value else None
+
+def to_float(value):
+    return float(value) if value else None
+
+def order_to_dict(order):
+    """Serialize an Alpaca order the way get_orders.py has always returned it"""
+    return {
+        'id': order.id,
+        'client_order_id': order.client_order_id,
+        'symbol': order.symbol,
+        'asset_id': order.asset_id,
+        'asset_class': order.asset_class,
+        'qty': float(order.qty or 0),
+        'filled_qty': float(order.filled_qty or 0),
+        'side': order.side,
+        'order_type': order.order_type,
+        'time_in_force': order.time_in_force,
+        'limit_price': to_float(order.limit_price),
+        'stop_price': to_float(order.stop_price),
+        'status': order.status,
+        'extended_hours': order.extended_hours,
+        'legs': order.legs,
+        'trail_percent': to_float(order.trail_percent),
+        'trail_price': to_float(order.trail_price),
+        'hwm': to_float(order.hwm),
+        'submitted_at': iso(order.submitted_at),
+        'filled_at': iso(order.filled_at),
+        'expired_at': iso(order.expired_at),
+        'canceled_at': iso(order.canceled_at),
+        'failed_at': iso(order.failed_at),
+        'replaced_at': iso(order.replaced_at),
+        'replaced_by': order.replaced_by,
+        'replaces': order.replaces,
+        'filled_avg_price': to_float(order.filled_avg_price),
+        'updated_at': iso(getattr(order, 'updated_at', None))
+    }
+
+class OrderStore:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.ORDER_STORE_DB
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def upsert(self, orders):
+        rows = [order_to_dict(o) for o in orders]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO orders (id, symbol, status, submitted_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at, data = excluded.data",
+                [(r['id'], r['symbol'], r['status'], r['submitted_at'], r['updated_at'], json.dumps(r)) for r in rows]
+            )
+        return len(rows)
+
+    def get_cursor(self):
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = 'submitted_at'").fetchone()
+        return datetime.fromisoformat(row['value']) if row else None
+
+    def set_cursor(self, value):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES ('submitted_at', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (value.isoformat(),)
+            )
+
+    def statuses(self, ids):
+        """Stored status per order id (missing ids are new to the store)"""
+        ids = list(ids)
+        out = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            out.update((row['id'], row['status']) for row in self.conn.execute(
+                f"SELECT id, status FROM orders WHERE id IN ({placeholders})", chunk))
+        return out
+
+    def filled(self, symbol):
+        """Stored orders for a symbol with shares filled, oldest fill first"""
+        rows = [json.loads(row['data']) for row in self.conn.execute(
+            "SELECT data FROM orders WHERE symbol = ?", (symbol,))]
+        rows = [r for r in rows if r['filled_at'] and r['filled_qty'] > 0 and r['filled_avg_price']]
+        return sorted(rows, key=lambda r: datetime.fromisoformat(r['filled_at']))
+
+    def working_symbols(self, side):
+        """Symbols with a working order on this side"""
+        placeholders = ', '.join('?' for _ in OPEN_STATUSES)
+        return {json.loads(row['data'])['symbol'] for row in self.conn.execute(
+            f"SELECT data FROM orders WHERE status IN ({placeholders})", OPEN_STATUSES
+        ) if json.loads(row['data'])['side'] == side}
+
+    def working_order_ids(self):
+        placeholders = ', '.join('?' for _ in OPEN_STATUSES)
+        return [row['id'] for row in self.conn.execute(
+            f"SELECT id FROM orders WHERE status IN ({placeholders})", OPEN_STATUSES
+        )]
+
+    def query(self, after=None, until=None, limit=None):
+        """Stored orders, newest first"""
+        clauses, params = [], []
+        if after:
+            clauses.append('submitted_at >= ?')
+            params.append(after.isoformat())
+        if until:
+            clauses.append('submitted_at <= ?')
+            params.append(until.isoformat())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = f"SELECT data FROM orders {where} ORDER BY submitted_at DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [json.loads(row['data']) for row in self.conn.execute(sql, params)]
+
+class OrderSync:
+    def __init__(self, api, store=None, stats=None, risk=None):
+        self.api = api
+        self.store = store or OrderStore()
+        self.stats = stats
+        self.risk = risk
+        self.fills = []
+
+    def realized(self, order):
+        """FIFO P&L of a filled sell against the stored fills up to it; None without any buys"""
+        history = [r for r in self.store.filled(order.symbol)
+                   if datetime.fromisoformat(r['filled_at']) <= order.filled_at and r['id'] != order.id]
+        if not any(r['side'] == 'buy' for r in history):
+            return None
+        side = np.array([1 if r['side'] == 'buy' else -1 for r in history] + [-1], dtype=np.int8)
+        qty = np.array([r['filled_qty'] for r in history] + [float(order.filled_qty)])
+        price = np.array([r['filled_avg_price'] for r in history] + [float(order.filled_avg_price)])
+        pnl, _, _ = match_fifo([], side, qty, price)
+        return float(pnl[-1])
+
+    def save(self, orders):
+        """Upsert orders, collecting those that just reached a final state with a fill"""
+        if (self.stats is None and self.risk is None) or not orders:
+            return self.store.upsert(orders)
+
+        before = self.store.statuses(o.id for o in orders)
+        saved = self.store.upsert(orders)
+        for order in orders:
+            previous = before.get(order.id)
+            if (order.status in OPEN_STATUSES or not order.filled_at or not order.filled_avg_price
+                    or float(order.filled_qty or 0) <= 0 or (previous is not None and previous not in OPEN_STATUSES)):
+                continue
+            fill = {
+                'order_id': order.id,
+                'symbol': order.symbol,
+                'action': order.side.upper(),
+                'shares': float(order.filled_qty),
+                'price': float(order.filled_avg_price),
+                'date': market_date(order.filled_at).isoformat(),
+                'time': order.filled_at.timestamp()
+            }
+            if order.side == 'sell':
+                fill['pnl'] = self.realized(order)
+            self.fills.append(fill)
+        return saved
+
+    def sync(self):
+        """Pull new orders past the cursor and refresh any still-working ones"""
+        now = datetime.now(timezone.utc)
+        cursor = self.store.get_cursor() or now - timedelta(days=INITIAL_WINDOW_DAYS)
+
+        # New orders: page forward from the high-water mark (with a small
+        # overlap so orders sharing the cursor timestamp aren't skipped)
+        new_orders = fetch_orders(self.api, cursor - timedelta(seconds=1), now)
+        self.save(new_orders)
+
+        # Changed orders: anything we last saw working. One call covers those
+        # still open; the few that left the open set are fetched individually
+        working = set(self.store.working_order_ids())
+        fetched = {o.id for o in new_orders}
+        refreshed = 0
+        if working - fetched:
+            open_orders = self.api.list_orders(status='open', limit=500)
+            self.save(open_orders)
+            still_open = {o.id for o in open_orders}
+            changed = []
+            for order_id in working - fetched - still_open:
+                try:
+                    changed.append(self.api.get_order(order_id))
+                except Exception as e:
+                    print(f"Error refreshing order {order_id}: {e}", file=sys.stderr)
+            self.save(changed)
+            refreshed = len(open_orders) + len(changed)
+
+        if new_orders:
+            latest = max((o.submitted_at for o in new_orders if o.submitted_at), default=cursor)
+            if latest > cursor:
+                self.store.set_cursor(latest)
+        elif self.store.get_cursor() is None:
+            self.store.set_cursor(cursor)
+
+        recorded = 0
+        if self.fills:
+            if self.stats is not None:
+                recorded = self.stats.record(self.fills)
+            if self.risk is not None:
+                try:
+                    self.risk.record_fills(self.fills, self.store.working_symbols('buy'))
+                except Exception as e:
+                    print(f"Error updating risk state from fills: {e}", file=sys.stderr)
+            self.fills = []
+
+        return {'new_orders': len(new_orders), 'refreshed_orders': refreshed, 'recorded_fills': recorded}
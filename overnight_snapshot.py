@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Overnight precompute for the premarket warm start
+At 4:00 AM there are too few one-minute bars for EMA_200 (and barely enough
+for MACD), so the first premarket scans rejected everything. This nightly
+job computes, for the screeners' universe:
+    prior_close, avg_volume (20 sessions), atr (14, daily)
+    ema_9 / ema_20 / ema_200 and the MACD fast/slow/signal EMAs as of the
+    last extended-hours bar, plus that bar's timestamp
+and stores them as one uncompressed .npz (OVERNIGHT_SNAPSHOT) that loads in
+milliseconds. The premarket screener continues the EMAs from these seeds
+over only the bars printed since. The same one-minute download is folded
+into the time-of-day volume baselines (volume_profile.py).
+
+Usage:
+    overnight_snapshot.py            # build the snapshot
+    overnight_snapshot.py --show     # print the current snapshot as JSON
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import indicators
+import jsonlog
+import market_data
+import metrics
+import scheduler
+import tracing
+import volume_profile
+from config import Config
+
+logger = jsonlog.get_logger(__name__)
+
+AVG_VOLUME_DAYS = 20
+ATR_LENGTH = 14
+# EMA lengths seeded for the screeners (MACD uses its own 12/26/9)
+EMA_LENGTHS = (9, 20, 200)
+SEED_FIELDS = ('ema_9', 'ema_20', 'ema_200', 'macd_fast', 'macd_slow', 'macd_signal')
+FIELDS = ('prior_close', 'avg_volume', 'atr') + SEED_FIELDS + ('seed_bars', 'last_bar_ts')
+# Bars behind a seed before the screener trusts it (same bar as EMA_200 needs)
+MIN_SEED_BARS = 200
+
+def bar_timestamps(index):
+    """Epoch seconds for a bar index (UTC for tz-aware indexes)"""
+    return index.to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+
+def universe():
+    """Every symbol either screener scans"""
+    from run_premarket_screener import PreMarketScreener
+    from run_market_hours_screener import MarketHoursScreener
+    return sorted(set(PreMarketScreener().penny_stocks) | set(MarketHoursScreener().penny_stocks))
+
+def last_valid(values):
+    """Last non-NaN value per column (NaN where a column has none)"""
+    valid = ~np.isnan(values)
+    rows = values.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+    out = values[rows, np.arange(values.shape[1])]
+    return np.where(valid.any(axis=0), out, np.nan)
+
+def daily_stats(symbols):
+    daily, _ = market_data.get_provider().bars(symbols, period='3mo', interval='1d', prepost=False)
+    if daily is None:
+        return {name: np.full(len(symbols), np.nan) for name in ('prior_close', 'avg_volume', 'atr')}
+
+    close = daily['Close']
+    valid = ~np.isnan(close)
+    atr = indicators.atr(indicators.ffill(daily['High']), indicators.ffill(daily['Low']),
+                         indicators.ffill(close), ATR_LENGTH)[-1]
+    recent = daily['Volume'][-AVG_VOLUME_DAYS:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_volume = np.nansum(recent, axis=0) / np.sum(~np.isnan(recent), axis=0)
+    return {
+        'prior_close': last_valid(close),
+        'avg_volume': avg_volume,
+        'atr': np.where(valid.sum(axis=0) > 1, atr, np.nan)
+    }
+
+def intraday_seeds(symbols, bars, index):
+    """EMA/MACD state as of each symbol's last extended-hours bar"""
+    empty = {name: np.full(len(symbols), np.nan) for name in SEED_FIELDS + ('last_bar_ts',)}
+    if bars is None:
+        return dict(empty, seed_bars=np.zeros(len(symbols), dtype=np.int32))
+
+    raw_close = bars['Close']
+    counts = indicators.valid_counts(raw_close)
+    valid = ~np.isnan(raw_close)
+    # Each symbol's seeds come from its own prints only, not the forward-filled
+    # union index: move every column's bars to the end (stable, so in order) and
+    # let ffill repeat the first bar over the gap. A constant lead-in leaves the
+    # EMAs at that bar and MACD at zero, as if the series started there, and the
+    # last row is the symbol's last print, matching last_bar_ts.
+    order = np.argsort(valid, axis=0, kind='stable')
+    close = indicators.ffill(np.take_along_axis(raw_close, order, axis=0))
+    seeds = {f"ema_{length}": indicators.ema(close, length)[-1] for length in EMA_LENGTHS}
+    fast = indicators.ema(close, 12)
+    slow = indicators.ema(close, 26)
+    seeds['macd_fast'] = fast[-1]
+    seeds['macd_slow'] = slow[-1]
+    seeds['macd_signal'] = indicators.ema(fast - slow, 9)[-1]
+
+    # Timestamp of each symbol's own last print, so the screener knows where to resume
+    timestamps = bar_timestamps(index)
+    last_rows = raw_close.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+    seeds['last_bar_ts'] = timestamps[last_rows]
+
+    has_data = counts > 0
+    for name in seeds:
+        seeds[name] = np.where(has_data, seeds[name], np.nan)
+    seeds['seed_bars'] = counts.astype(np.int32)
+    return seeds
+
+def update_volume_profile(symbols, bars, index):
+    """Fold the sessions in the intraday download into the time-of-day volume baselines"""
+    if bars is None:
+        return 0
+    try:
+        profile = volume_profile.VolumeProfile.load(writable=True) or volume_profile.VolumeProfile.empty()
+        folded = profile.update(symbols, bars['Volume'], index)
+        profile.save()
+    except (OSError, ValueError) as e:
+        logger.error("Error updating volume profile: %s", e)
+        return 0
+    logger.info("📊 Volume profile: folded %d symbol-sessions", folded)
+    return folded
+
+@tracing.traced('overnight.build')
+def build(symbols=None, path=None):
+    """Compute and atomically write the snapshot; returns a summary"""
+    symbols = list(symbols or universe())
+    path = path or Config.OVERNIGHT_SNAPSHOT
+    started = time.perf_counter()
+
+    columns = daily_stats(symbols)
+    bars, index = market_data.get_provider().bars(symbols, period='5d', interval='1m', prepost=True)
+    columns.update(intraday_seeds(symbols, bars, index))
+    folded = update_volume_profile(symbols, bars, index)
+    arrays = {name: np.asarray(columns[name], dtype=np.int32 if name == 'seed_bars' else np.float64)
+              for name in FIELDS}
+
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, symbols=np.array(symbols), created=np.float64(time.time()), **arrays)
+    os.replace(tmp_path, path)
+
+    seeded = int(np.sum(arrays['seed_bars'] >= MIN_SEED_BARS))
+    tracing.current().set(symbols=len(symbols), seeded=seeded)
+    logger.info("🌙 Overnight snapshot: %d symbols, %d with %d+ seed bars -> %s",
+                len(symbols), seeded, MIN_SEED_BARS, path)
+    return {
+        'path': path,
+        'symbols': len(symbols),
+        'seeded': seeded,
+        'missing': [s for s, n in zip(symbols, arrays['seed_bars']) if n == 0],
+        'volume_profile_sessions': folded,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+class OvernightSnapshot:
+    """Read side: per-symbol rows of the nightly arrays"""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.symbols = [str(s) for s in arrays['symbols']]
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.created = float(arrays['created'])
+
+    @classmethod
+    def load(cls, path=None, max_age_hours=None):
+        """The snapshot, or None if missing, unreadable or older than max_age_hours"""
+        path = path or Config.OVERNIGHT_SNAPSHOT
+        max_age_hours = Config.OVERNIGHT_SNAPSHOT_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+        try:
+            with np.load(path) as npz:
+                snapshot = cls({name: npz[name] for name in npz.files})
+        except FileNotFoundError:
+            metrics.record_cache('overnight_snapshot', False)
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Error loading overnight snapshot %s: %s", path, e)
+            return None
+
+        fresh = time.time() - snapshot.created <= max_age_hours * 3600
+        metrics.record_cache('overnight_snapshot', fresh)
+        return snapshot if fresh else None
+
+    def get(self, symbol):
+        i = self.index.get(symbol)
+        if i is None or self.arrays['seed_bars'][i] == 0:
+            return None
+        return {name: self.arrays[name][i].item() for name in FIELDS}
+
+def main():
+    parser = argparse.ArgumentParser(description='Nightly indicator seeds for the premarket screener')
+    parser.add_argument('--show', action='store_true', help='Print the current snapshot instead of building one')
+    args = parser.parse_args()
+
+    metrics.start('overnight_snapshot')
+    tracing.start('overnight_snapshot')
+    jsonlog.setup('overnight_snapshot')
+
+    if args.show:
+        snapshot = OvernightSnapshot.load(max_age_hours=float('inf'))
+        if snapshot is None:
+            print(json.dumps({'error': 'No overnight snapshot'}))
+            sys.exit(1)
+        print(json.dumps({'created': snapshot.created,
+                          'symbols': {s: snapshot.get(s) for s in snapshot.symbols}}, indent=2))
+        return
+
+    try:
+        result = build()
+    except Exception as e:
+        logger.error("Overnight snapshot failed: %s", e)
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+    print(json.dumps({'success': True, **result}, indent=2))
+
+if __name__ == "__main__":
+    scheduler.run(main, 'overnight_snapshot')
@@ -5,7 +5,6 @@ Comprehensive breakout and candlestick pattern recognition system
 Includes algorithmic definitions with percentage thresholds
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import pandas_ta as ta
@@ -15,53 +14,82 @@ from typing import Dict, List, Tuple, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+import jsonlog
+import market_data
+import metrics
+import tracing
+import volume_profile
+
 class PatternAnalyzer:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.patterns_found = {}
+        self.data = market_data.get_provider()
+        self.volume_profile = volume_profile.VolumeProfile.load()
         
+    @tracing.traced('pattern.get_stock_data')
     def get_stock_data(self, ticker: str, period: str = "5d", interval: str = "1m") -> pd.DataFrame:
         """Get stock data with multiple timeframes for pattern analysis"""
+        span = tracing.current().set(symbol=ticker)
         try:
-            stock = yf.Ticker(ticker)
-            data = stock.history(period=period, interval=interval, prepost=True)
+            data = self.data.history(ticker, period=period, interval=interval, prepost=True)
+            span.set(bars=len(data))
             
             if data.empty:
-                self.logger.warning(f"No data found for {ticker}")
+                self.logger.warning("No data found for %s", ticker, extra={'symbol': ticker})
                 return pd.DataFrame()
-                
-            # Calculate technical indicators
+            
+            return self.add_indicators(ticker, data)
+            
+        except Exception as e:
+            self.logger.error("Error getting data for %s: %s", ticker, e, extra={'symbol': ticker})
+            return pd.DataFrame()
+    
+    def add_indicators(self, ticker: str, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add the indicator columns the detectors read to an OHLCV frame. Frames
+        with a Duration column (volume/dollar/range/tick bars from bar_builder)
+        measure volume surges as volume per second, since their bars hold
+        roughly equal volume by construction.
+        """
+        # Calculate technical indicators
+        with metrics.INDICATOR_SECONDS.labels('pattern_analyzer').time():
             data['SMA_20'] = ta.sma(data['Close'], length=20)
             data['SMA_50'] = ta.sma(data['Close'], length=50)
             data['EMA_9'] = ta.ema(data['Close'], length=9)
             data['EMA_20'] = ta.ema(data['Close'], length=20)
             data['EMA_200'] = ta.ema(data['Close'], length=200)
             data['VWAP'] = ta.vwap(data['High'], data['Low'], data['Close'], data['Volume'])
-            
+        
             # MACD
             macd_data = ta.macd(data['Close'])
             data['MACD'] = macd_data['MACD_12_26_9']
             data['MACD_Signal'] = macd_data['MACDs_12_26_9']
             data['MACD_Histogram'] = macd_data['MACDh_12_26_9']
-            
+        
             # RSI
             data['RSI'] = ta.rsi(data['Close'], length=14)
-            
+        
             # Bollinger Bands
             bb = ta.bbands(data['Close'], length=20)
             data['BB_Upper'] = bb['BBU_20_2.0']
             data['BB_Middle'] = bb['BBM_20_2.0'] 
             data['BB_Lower'] = bb['BBL_20_2.0']
-            
-            # Volume analysis
+        
+            # Volume analysis: against the usual volume for that minute of day
+            # where there's a baseline, otherwise the last 20 bars
             data['Volume_SMA'] = ta.sma(data['Volume'], length=20)
-            data['Volume_Ratio'] = data['Volume'] / data['Volume_SMA']
-            
-            return data
-            
-        except Exception as e:
-            self.logger.error(f"Error getting data for {ticker}: {e}")
-            return pd.DataFrame()
+            if 'Duration' in data.columns:
+                rate = data['Volume'] / data['Duration'].clip(lower=1.0)
+                data['Volume_Ratio'] = rate / ta.sma(rate, length=20)
+            else:
+                baseline = data['Volume_SMA']
+                if self.volume_profile is not None and self.volume_profile.ready(ticker):
+                    baseline = pd.Series(self.volume_profile.baseline(ticker, data.index),
+                                         index=data.index).fillna(data['Volume_SMA'])
+                data['Volume_Ratio'] = data['Volume'] / baseline
+        
+        return data
     
     def analyze_breakout_patterns(self, ticker: str, data: pd.DataFrame) -> Dict[str, any]:
         """Analyze all breakout patterns"""
@@ -102,7 +130,7 @@ class PatternAnalyzer:
             patterns['broadening_formation'] = self.detect_broadening_formation(data)
             
         except Exception as e:
-            self.logger.error(f"Error analyzing breakout patterns for {ticker}: {e}")
+            self.logger.error("Error analyzing breakout patterns for %s: %s", ticker, e, extra={'symbol': ticker})
             
         return patterns
     
@@ -150,7 +178,7 @@ class PatternAnalyzer:
             patterns['kicking_pattern'] = self.detect_kicking_pattern(data)
             
         except Exception as e:
-            self.logger.error(f"Error analyzing candlestick patterns for {ticker}: {e}")
+            self.logger.error("Error analyzing candlestick patterns for %s: %s", ticker, e, extra={'symbol': ticker})
             
         return patterns
 
@@ -694,10 +722,10 @@ class PatternAnalyzer:
     def detect_harami(self, data): return {'detected': False}
     def detect_kicking_pattern(self, data): return {'detected': False}
 
+    @tracing.traced('pattern.analyze')
     def analyze_stock_comprehensive(self, ticker: str) -> Dict[str, any]:
         """Comprehensive pattern analysis for a stock"""
-        print(f"\n🔍 ANALYZING {ticker.upper()} - COMPREHENSIVE PATTERN DETECTION")
-        print("=" * 70)
+        tracing.current().set(symbol=ticker)
         
         # Get stock data
         data = self.get_stock_data(ticker, period="5d", interval="1m")
@@ -705,13 +733,16 @@ class PatternAnalyzer:
         if data.empty:
             return {'error': f'No data available for {ticker}'}
         
+        return self.analyze_bars(ticker, data)
+    
+    def analyze_bars(self, ticker: str, data: pd.DataFrame) -> Dict[str, any]:
+        """Run every detector over an indicator frame (time bars or bar_builder bars)"""
         current_price = data['Close'].iloc[-1]
         daily_change = (current_price - data['Close'].iloc[0]) / data['Close'].iloc[0] * 100
         volume_ratio = data['Volume_Ratio'].iloc[-1] if 'Volume_Ratio' in data.columns else 1.0
         
-        print(f"📊 Current Price: ${current_price:.2f}")
-        print(f"📈 Daily Change: {daily_change:+.2f}%")
-        print(f"📊 Volume Ratio: {volume_ratio:.2f}x average")
+        self.logger.debug("🔍 %s: $%.2f (%+.2f%%), volume %.2fx average",
+                          ticker.upper(), current_price, daily_change, volume_ratio, extra={'symbol': ticker})
         
         # Analyze patterns
         breakout_patterns = self.analyze_breakout_patterns(ticker, data)
@@ -743,42 +774,49 @@ class PatternAnalyzer:
         }
     
     def display_pattern_results(self, ticker: str, breakouts: Dict, candlesticks: Dict):
-        """Display pattern analysis results"""
+        """Log pattern analysis results (debug level; skipped entirely otherwise)"""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         
+        lines = []
         if breakouts:
-            print(f"\n🚀 BREAKOUT PATTERNS DETECTED:")
-            print("-" * 40)
+            lines.append("🚀 BREAKOUT PATTERNS DETECTED:")
             for pattern, details in breakouts.items():
                 pattern_name = pattern.replace('_', ' ').title()
                 pattern_type = details.get('pattern_type', 'neutral')
                 strength = details.get('strength', 'moderate')
                 
                 emoji = "🟢" if pattern_type == 'bullish' else "🔴" if pattern_type == 'bearish' else "🟡"
-                print(f"{emoji} {pattern_name} ({pattern_type.upper()}) - {strength}")
+                lines.append(f"{emoji} {pattern_name} ({pattern_type.upper()}) - {strength}")
                 
                 if 'breakout_confirmed' in details:
                     status = "✅ CONFIRMED" if details['breakout_confirmed'] else "⏳ FORMING"
-                    print(f"   Status: {status}")
+                    lines.append(f"   Status: {status}")
                     
                 if 'breakout_target' in details:
-                    print(f"   Target: ${details['breakout_target']:.2f}")
+                    lines.append(f"   Target: ${details['breakout_target']:.2f}")
         
         if candlesticks:
-            print(f"\n🕯️ CANDLESTICK PATTERNS DETECTED:")
-            print("-" * 40)
+            lines.append("🕯️ CANDLESTICK PATTERNS DETECTED:")
             for pattern, details in candlesticks.items():
                 pattern_name = pattern.replace('_', ' ').title()
                 pattern_type = details.get('pattern_type', 'neutral')
                 strength = details.get('strength', 'moderate')
                 
                 emoji = "🟢" if pattern_type == 'bullish' else "🔴" if pattern_type == 'bearish' else "🟡"
-                print(f"{emoji} {pattern_name} ({pattern_type.upper()}) - {strength}")
+                lines.append(f"{emoji} {pattern_name} ({pattern_type.upper()}) - {strength}")
                 
                 if details.get('confirmation_needed'):
-                    print(f"   ⚠️ Requires confirmation")
+                    lines.append("   ⚠️ Requires confirmation")
+        
+        if not lines:
+            lines.append(f"📊 No significant patterns detected for {ticker}")
         
-        if not breakouts and not candlesticks:
-            print(f"\n📊 No significant patterns detected for {ticker}")
+        self.logger.debug('\n'.join(lines), extra={
+            'symbol': ticker,
+            'breakouts': list(breakouts),
+            'candlesticks': list(candlesticks)
+        })
     
     def calculate_overall_signal(self, breakouts: Dict, candlesticks: Dict, data: pd.DataFrame) -> Dict[str, any]:
         """Calculate overall trading signal based on all patterns"""
@@ -839,6 +877,7 @@ class PatternAnalyzer:
 
 def main():
     """Test the pattern analyzer"""
+    jsonlog.setup('pattern_analyzer')
     analyzer = PatternAnalyzer()
     
     # Test with some penny stocks
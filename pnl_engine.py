@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Realized P&L engine
+Pages through every order fill, matches lots FIFO per symbol and caches
+finished days as immutable snapshots, so month-to-date and year-to-date
+reports only recompute the current day.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import metrics
+
+PAGE_SIZE = 500
+SNAPSHOT_DIR = 'pnl_snapshots'
+# Trading days are Eastern calendar days; an 8 PM ET fill is 00:00 UTC the next day
+MARKET_TZ = ZoneInfo('America/New_York')
+# Seconds each page re-reads before its cursor, so orders sharing the last timestamp aren't skipped
+PAGE_OVERLAP = 1
+
+def market_date(ts):
+    """Eastern calendar date of a broker timestamp (naive ones are UTC)"""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(MARKET_TZ).date()
+
+def market_today():
+    return datetime.now(MARKET_TZ).date()
+
+def market_day_bounds(start, end):
+    """Aware datetimes spanning Eastern days start..end"""
+    return (datetime.combine(start, datetime.min.time(), tzinfo=MARKET_TZ),
+            datetime.combine(end, datetime.max.time(), tzinfo=MARKET_TZ))
+
+def fetch_orders(api, after, until, status='all'):
+    """All orders submitted in (after, until], following pages oldest first"""
+    orders = {}
+    cursor = after
+
+    while True:
+        page = api.list_orders(
+            status=status,
+            limit=PAGE_SIZE,
+            after=cursor.isoformat(),
+            until=until.isoformat(),
+            direction='asc'
+        )
+        new = 0
+        for order in page:
+            new += order.id not in orders
+            orders[order.id] = order
+
+        # A short page is the last; a full page of orders already seen can't move us forward
+        if len(page) < PAGE_SIZE or not new:
+            break
+
+        last_submitted = page[-1].submitted_at
+        if last_submitted is None:
+            break
+        # `after` is strict: step back so orders sharing the last timestamp come round again
+        cursor = last_submitted - timedelta(seconds=PAGE_OVERLAP)
+
+    return sorted(orders.values(), key=lambda o: o.submitted_at)
+
+def fills_from_orders(orders):
+    """Filled orders as columnar arrays, ordered by fill time"""
+    filled = [o for o in orders if o.filled_at and float(o.filled_qty or 0) > 0 and o.filled_avg_price]
+    filled.sort(key=lambda o: o.filled_at)
+
+    return {
+        'id': np.array([o.id for o in filled], dtype=object),
+        'symbol': np.array([o.symbol for o in filled], dtype=object),
+        'side': np.array([1 if o.side == 'buy' else -1 for o in filled], dtype=np.int8),
+        'qty': np.array([float(o.filled_qty) for o in filled]),
+        'price': np.array([float(o.filled_avg_price) for o in filled]),
+        'date': np.array([market_date(o.filled_at).isoformat() for o in filled], dtype=object),
+        'time': np.array([o.filled_at.timestamp() for o in filled], dtype=float)
+    }
+
+def match_fifo(open_lots, side, qty, price):
+    """
+    FIFO-match one symbol's fills (long only) against its open lots.
+
+    Cost of the first Q shares ever bought is a piecewise-linear function of
+    cumulative bought quantity, so each sell's cost basis is just
+    cost(sold after) - cost(sold before), evaluated with np.interp.
+    Returns (realized pnl per fill, remaining open lots, unmatched sell qty).
+    """
+    lot_qty = np.array([lot[0] for lot in open_lots], dtype=float)
+    lot_price = np.array([lot[1] for lot in open_lots], dtype=float)
+
+    buys = side > 0
+    buy_qty = np.concatenate([lot_qty, qty[buys]])
+    buy_price = np.concatenate([lot_price, price[buys]])
+
+    cum_buy_qty = np.concatenate([[0.0], np.cumsum(buy_qty)])
+    cum_buy_cost = np.concatenate([[0.0], np.cumsum(buy_qty * buy_price)])
+
+    # Sells beyond what we ever bought have no basis in this history
+    sell_qty = np.where(buys, 0.0, qty)
+    cum_sold = np.cumsum(sell_qty)
+    cum_sold_before = cum_sold - sell_qty
+    matched_after = np.minimum(cum_sold, cum_buy_qty[-1])
+    matched_before = np.minimum(cum_sold_before, cum_buy_qty[-1])
+    matched_qty = matched_after - matched_before
+
+    cost = np.interp(matched_after, cum_buy_qty, cum_buy_cost) - np.interp(matched_before, cum_buy_qty, cum_buy_cost)
+    realized = np.where(buys, 0.0, matched_qty * price - cost)
+
+    # Whatever hasn't been sold stays open, oldest lots consumed first
+    sold_total = matched_after[-1] if len(matched_after) else 0.0
+    remaining = np.maximum(cum_buy_qty[1:] - np.maximum(cum_buy_qty[:-1], sold_total), 0.0)
+    lots = [[float(q), float(p)] for q, p in zip(remaining, buy_price) if q > 0]
+
+    unmatched = float(sell_qty.sum() - matched_qty.sum())
+    return realized, lots, unmatched
+
+def compute_day(day, fills, open_lots):
+    """Stats for one day's fills given the open lots carried in from before"""
+    mask = fills['date'] == day
+    symbols = fills['symbol'][mask]
+    side = fills['side'][mask]
+    qty = fills['qty'][mask]
+    price = fills['price'][mask]
+
+    realized = np.zeros(len(qty))
+    lots_out = {s: list(l) for s, l in open_lots.items()}
+    unmatched = 0.0
+
+    for symbol in np.unique(symbols) if len(symbols) else []:
+        idx = np.flatnonzero(symbols == symbol)
+        pnl, lots, missing = match_fifo(open_lots.get(symbol, []), side[idx], qty[idx], price[idx])
+        realized[idx] = pnl
+        unmatched += missing
+        if lots:
+            lots_out[symbol] = lots
+        else:
+            lots_out.pop(symbol, None)
+
+    sells = side < 0
+    by_symbol = {}
+    for symbol in np.unique(symbols[sells]) if sells.any() else []:
+        by_symbol[symbol] = float(realized[symbols == symbol].sum())
+
+    return {
+        'date': day,
+        'realized_pnl': float(realized.sum()),
+        'fills': int(mask.sum()),
+        'buy_fills': int((side > 0).sum()),
+        'sell_fills': int(sells.sum()),
+        'winning_sells': int((realized[sells] > 0).sum()),
+        'losing_sells': int((realized[sells] < 0).sum()),
+        'volume': float((qty * price).sum()),
+        'unmatched_sell_qty': unmatched,
+        'by_symbol': by_symbol,
+        'open_lots': lots_out
+    }
+
+class PnLEngine:
+    def __init__(self, api, snapshot_dir=SNAPSHOT_DIR):
+        self.api = api
+        self.snapshot_dir = snapshot_dir
+        self.orders = []
+
+    def snapshot_path(self, day):
+        return os.path.join(self.snapshot_dir, f"{day}.json")
+
+    def load_snapshot(self, day):
+        try:
+            with open(self.snapshot_path(day)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_snapshot(self, stats):
+        """Finished days never change, so write once and never recompute"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self.snapshot_path(stats['date'])
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(stats, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error saving P&L snapshot for {stats['date']}: {e}", file=sys.stderr)
+
+    def latest_lots_before(self, day):
+        """Open lots from the most recent snapshot before day"""
+        if not os.path.isdir(self.snapshot_dir):
+            return {}
+        earlier = sorted(f[:-5] for f in os.listdir(self.snapshot_dir) if f.endswith('.json') and f[:-5] < day)
+        if not earlier:
+            return {}
+        snapshot = self.load_snapshot(earlier[-1])
+        return snapshot.get('open_lots', {}) if snapshot else {}
+
+    def report_range(self, start, end):
+        """Per-day stats for every weekday in [start, end]; only uncached days hit the broker"""
+        today = market_today()
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        days = [d for d in days if d.weekday() < 5 or d == today]
+
+        missing = [d for d in days if d >= today or self.load_snapshot(d.isoformat()) is None]
+        for d in days:
+            if d < today:
+                metrics.record_cache('pnl_snapshot', d not in missing)
+        fills = None
+        if missing:
+            # One paginated fetch covers every day that needs computing;
+            # start a day early to catch orders submitted before they filled
+            after, until = market_day_bounds(missing[0] - timedelta(days=1), end)
+            self.orders = fetch_orders(self.api, after, until)
+            fills = fills_from_orders(self.orders)
+
+        results = []
+        lots = self.latest_lots_before(days[0].isoformat()) if days else {}
+        for d in days:
+            day = d.isoformat()
+            stats = self.load_snapshot(day) if d < today else None
+            if stats is None:
+                stats = compute_day(day, fills, lots)
+                if d < today:
+                    self.save_snapshot(stats)
+            lots = stats['open_lots']
+            results.append(stats)
+
+        return results
+
+    def day(self, d=None):
+        d = d or market_today()
+        return self.report_range(d, d)[0]
+
+    def period_totals(self, start, end):
+        days = self.report_range(start, end)
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'realized_pnl': sum(s['realized_pnl'] for s in days),
+            'fills': sum(s['fills'] for s in days),
+            'winning_sells': sum(s['winning_sells'] for s in days),
+            'losing_sells': sum(s['losing_sells'] for s in days),
+            'volume': sum(s['volume'] for s in days)
+        }
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling for entry scripts
+Enable with PROFILE=1 (or PROFILE=cprofile) in the environment, or --profile
+on the command line. Each run writes, under PROFILE_DIR with a shared run id:
+    <run_id>.collapsed   sampled stacks in flamegraph.pl / speedscope format
+    <run_id>.prof        cProfile stats, plus <run_id>.functions.txt (PROFILE=cprofile only)
+    <run_id>.alloc.txt   tracemalloc top allocations at the memory high-water mark and at exit
+When disabled, profiling.run(main, name) just calls main().
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from config import Config
+
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 40
+# Check for a new memory high-water mark every this many stack samples
+SNAPSHOT_EVERY = 40
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Background thread that samples every thread's stack at a fixed interval,
+    and snapshots tracemalloc whenever traced memory reaches a new high
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.peak_size = 0
+        self.peak_snapshot = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            if self.samples % SNAPSHOT_EVERY == 0:
+                self.check_memory()
+
+    def check_memory(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.peak_size:
+            self.peak_size = current
+            self.peak_snapshot = tracemalloc.take_snapshot()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def enabled():
+    return bool(os.getenv('PROFILE')) or '--profile' in sys.argv
+
+def write_allocations(path, run_id, snapshots, peak):
+    with open(path, 'w') as f:
+        f.write(f"run {run_id}\npeak traced memory {peak / 1024:.1f} KiB\n")
+        for title, snapshot in snapshots:
+            if snapshot is None:
+                continue
+            stats = snapshot.statistics('lineno')
+            total = sum(stat.size for stat in stats)
+            f.write(f"\n{title}: {total / 1024:.1f} KiB traced\n")
+            for stat in stats[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                f.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}\n")
+
+def write_functions(path, profiler):
+    with open(path, 'w') as f:
+        stats = pstats.Stats(profiler, stream=f)
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+def run(main, name):
+    """Run an entry point, profiled when PROFILE or --profile is set"""
+    if not enabled():
+        return main()
+
+    # Entry scripts parse sys.argv themselves; don't let them see our flag
+    if '--profile' in sys.argv:
+        sys.argv.remove('--profile')
+
+    mode = os.getenv('PROFILE', 'sample').lower()
+    run_id = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    base = os.path.join(Config.PROFILE_DIR, run_id)
+
+    print(f"🔬 Profiling {name} as {run_id}", file=sys.stderr)
+
+    tracemalloc.start(Config.PROFILE_TRACE_DEPTH)
+    sampler = StackSampler(Config.PROFILE_INTERVAL_MS / 1000)
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+    started = time.perf_counter()
+
+    sampler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        return main()
+    finally:
+        if profiler:
+            profiler.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        try:
+            sampler.write(f"{base}.collapsed")
+            write_allocations(f"{base}.alloc.txt", run_id,
+                              [('largest sampled', sampler.peak_snapshot), ('at exit', snapshot)], peak)
+            if profiler:
+                profiler.dump_stats(f"{base}.prof")
+                write_functions(f"{base}.functions.txt", profiler)
+            print(f"🔬 {run_id}: {elapsed:.2f}s, {sampler.samples} samples, peak {peak / 1048576:.1f} MiB -> {base}.*",
+                  file=sys.stderr)
+        except OSError as e:
+            print(f"Error writing profile for {run_id}: {e}", file=sys.stderr)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Incremental rankings over the screening universe
+RankTree is an order-statistic treap: a randomized balanced search tree
+whose nodes also count their subtree, so inserting, removing, finding the
+k-th key and counting keys below a value are all O(log n). Ranking keeps one
+tree per metric (change%, relative volume, momentum score) keyed on
+(value, symbol); updating a symbol is a remove and an insert per metric, and
+top-K or a symbol's percentile in the universe is answered straight from the
+tree instead of sorting everything again.
+
+ScanState keeps a Ranking of every symbol it has recorded, so the screeners
+rank against the whole universe rather than against this scan's qualifiers.
+Run as a script, GapTracker does the same from live feed events against last
+night's prior closes. That keeps the premarket top gappers list current
+without rescanning.
+
+Usage:
+    ranking.py [--top 10] [--min-change 0] [--symbols AAA,BBB]   # live top gappers
+    ranking.py --replay FILE [--speed 1] [--top 10] [--stream]
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+
+import event_stream
+import jsonlog
+import metrics
+import profiling
+import tracing
+from market_feed import AlpacaStreamFeed, ReplayFeed
+
+logger = jsonlog.get_logger(__name__)
+
+METRICS = ('change_percent', 'volume_ratio', 'score')
+# Minimum seconds between live top-K checks
+TOP_INTERVAL = 0.5
+
+UPDATES = metrics.counter('trading_ranking_updates_total', 'Symbol updates applied to the live ranking')
+TRACKED = metrics.gauge('trading_ranking_symbols', 'Symbols in the live ranking')
+
+class Node:
+    __slots__ = ('key', 'priority', 'size', 'left', 'right')
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+def size(node):
+    return node.size if node else 0
+
+def split(node, key):
+    """(keys < key, keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = split(node.right, key)
+        node.size = 1 + size(node.left) + size(node.right)
+        return node, right
+    left, node.left = split(node.left, key)
+    node.size = 1 + size(node.left) + size(node.right)
+    return left, node
+
+def merge(left, right):
+    """Join two treaps where every key in left is below every key in right"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = merge(left.right, right)
+        left.size = 1 + size(left.left) + size(left.right)
+        return left
+    right.left = merge(left, right.left)
+    right.size = 1 + size(right.left) + size(right.right)
+    return right
+
+class RankTree:
+    """Order-statistic treap of unique, mutually comparable keys"""
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self):
+        return size(self.root)
+
+    def insert(self, key):
+        """Insert a key not already present"""
+        new = Node(key)
+        parent, node = None, self.root
+        # Walk down past higher-priority nodes, then split what's below in two
+        while node and node.priority > new.priority:
+            node.size += 1
+            parent, node = node, (node.left if key < node.key else node.right)
+        new.left, new.right = split(node, key)
+        new.size = 1 + size(new.left) + size(new.right)
+        if parent is None:
+            self.root = new
+        elif key < parent.key:
+            parent.left = new
+        else:
+            parent.right = new
+
+    def remove(self, key):
+        """Remove a key known to be present"""
+        parent, node = None, self.root
+        path = []
+        while node.key != key:
+            path.append(node)
+            parent, node = node, (node.left if key < node.key else node.right)
+        joined = merge(node.left, node.right)
+        if parent is None:
+            self.root = joined
+        elif parent.left is node:
+            parent.left = joined
+        else:
+            parent.right = joined
+        for ancestor in path:
+            ancestor.size -= 1
+
+    def count_below(self, key):
+        """Number of keys strictly below key"""
+        count, node = 0, self.root
+        while node:
+            if node.key < key:
+                count += size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def select(self, index):
+        """The index-th smallest key (0-based)"""
+        node = self.root
+        while node:
+            left = size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.key
+            else:
+                index -= left + 1
+                node = node.right
+        raise IndexError(index)
+
+    def descending(self):
+        """Keys from largest to smallest; O(log n) to the first, O(1) amortized after"""
+        stack, node = [], self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.right
+            node = stack.pop()
+            yield node.key
+            node = node.left
+
+def missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+class Ranking:
+    """Per-metric RankTrees over a universe of symbols"""
+
+    def __init__(self, names=METRICS):
+        self.trees = {metric: RankTree() for metric in names}
+        self.values = {metric: {} for metric in names}
+
+    def __len__(self):
+        return len(set().union(*self.values.values()))
+
+    def update(self, symbol, **values):
+        """Set a symbol's metrics; None or NaN takes it out of that metric's ranking"""
+        for metric, value in values.items():
+            tree, current = self.trees[metric], self.values[metric]
+            old = current.pop(symbol, None)
+            if old is not None:
+                tree.remove((old, symbol))
+            if not missing(value):
+                tree.insert((value, symbol))
+                current[symbol] = value
+
+    def remove(self, symbol):
+        self.update(symbol, **{metric: None for metric in self.trees})
+
+    def value(self, metric, symbol):
+        return self.values[metric].get(symbol)
+
+    def top(self, metric, k=None):
+        """[(symbol, value)] for the k highest values (all of them if k is None)"""
+        out = []
+        for value, symbol in self.trees[metric].descending():
+            if k is not None and len(out) >= k:
+                break
+            out.append((symbol, value))
+        return out
+
+    def rank(self, metric, symbol):
+        """1 for the highest value, None if the symbol isn't ranked on this metric"""
+        value = self.values[metric].get(symbol)
+        if value is None:
+            return None
+        tree = self.trees[metric]
+        return len(tree) - tree.count_below((value, symbol))
+
+    def percentile(self, metric, symbol):
+        """Share of the other ranked symbols with a lower value, 0-100"""
+        value = self.values[metric].get(symbol)
+        if value is None:
+            return None
+        tree = self.trees[metric]
+        others = len(tree) - 1
+        if others <= 0:
+            return 100.0
+        # Count ties as neither above nor below: compare on the value alone
+        below = tree.count_below((value, ''))
+        return round(100.0 * below / others, 1)
+
+    def percentiles(self, symbol):
+        return {metric: self.percentile(metric, symbol) for metric in self.trees}
+
+class GapTracker:
+    """
+    Live change% against the prior close, volume against the average daily
+    volume, and momentum score for every symbol the feed reports, ranked as
+    the events arrive
+    """
+
+    def __init__(self, snapshot=None, ranking=None):
+        from scan_state import momentum_score
+        self.momentum_score = momentum_score
+        self.snapshot = snapshot
+        self.ranking = ranking or Ranking()
+        self.volume = defaultdict(float)
+        self.price = {}
+        self.traded = set()
+        self.updates = 0
+
+    def reference(self, symbol):
+        seed = self.snapshot.get(symbol) if self.snapshot else None
+        if not seed or not seed['prior_close'] or math.isnan(seed['prior_close']):
+            return None, None
+        avg_volume = seed['avg_volume'] if seed['avg_volume'] and not math.isnan(seed['avg_volume']) else None
+        return seed['prior_close'], avg_volume
+
+    def on_event(self, event):
+        symbol = event['symbol']
+        if event['type'] == 'trade':
+            self.traded.add(symbol)
+            price, volume = event['price'], event['size']
+        elif symbol in self.traded:
+            # Trades already carry this minute's price and volume
+            return
+        else:
+            price, volume = event['close'], event['volume']
+
+        prior_close, avg_volume = self.reference(symbol)
+        if prior_close is None:
+            return
+        self.volume[symbol] += volume
+        self.price[symbol] = price
+        change_percent = (price - prior_close) / prior_close * 100
+        volume_ratio = self.volume[symbol] / avg_volume if avg_volume else None
+        self.ranking.update(symbol, change_percent=change_percent, volume_ratio=volume_ratio,
+                            score=self.momentum_score({'change_percent': change_percent, 'volume_ratio': volume_ratio}))
+        self.updates += 1
+        UPDATES.inc()
+
+    def top(self, k, min_change=None):
+        """The k biggest gappers (at least min_change%), with universe percentiles"""
+        rows = []
+        for symbol, change_percent in self.ranking.top('change_percent'):
+            if len(rows) >= k or (min_change is not None and change_percent < min_change):
+                break
+            rows.append({
+                'symbol': symbol,
+                'price': self.price[symbol],
+                'change_percent': round(change_percent, 2),
+                'volume': int(self.volume[symbol]),
+                'volume_ratio': self.ranking.value('volume_ratio', symbol),
+                'percentile': self.ranking.percentiles(symbol)
+            })
+        return rows
+
+def main():
+    events = event_stream.from_argv()
+    parser = argparse.ArgumentParser(description='Live top gappers from the market data feed')
+    parser.add_argument('--replay', help='Replay events from a local NDJSON or CSV file')
+    parser.add_argument('--speed', type=float, default=0, help='Replay speed multiplier (0 = as fast as possible)')
+    parser.add_argument('--symbols', help="Comma-separated symbols (default: the screeners' universe)")
+    parser.add_argument('--top', type=int, default=10, help='Gappers to report')
+    parser.add_argument('--min-change', type=float, help='Only report gappers up at least this many percent')
+    args = parser.parse_args()
+
+    metrics.start('ranking')
+    tracing.start('ranking')
+    jsonlog.setup('ranking')
+
+    from overnight_snapshot import OvernightSnapshot, universe
+    snapshot = OvernightSnapshot.load()
+    if snapshot is None:
+        print(json.dumps({'error': 'No overnight snapshot; run overnight_snapshot.py first'}))
+        sys.exit(1)
+
+    # A replay without --symbols ranks everything in the file
+    symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else []
+    if not symbols and not args.replay:
+        symbols = universe()
+    tracker = GapTracker(snapshot)
+    feed = ReplayFeed(args.replay, speed=args.speed) if args.replay else AlpacaStreamFeed()
+    feed.subscribe(symbols)
+
+    logger.info("🏁 Ranking gappers from %s", args.replay or f"{len(symbols)} live symbols")
+    started = time.perf_counter()
+    last_check = 0.0
+    last_top = None
+    try:
+        for event in feed.events():
+            tracker.on_event(event)
+            now = time.monotonic()
+            if now - last_check >= TOP_INTERVAL:
+                last_check = now
+                TRACKED.set(len(tracker.price))
+                top = tracker.top(args.top, args.min_change)
+                if [row['symbol'] for row in top] != last_top:
+                    last_top = [row['symbol'] for row in top]
+                    events.emit('top', data=top)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
+    elapsed = time.perf_counter() - started
+
+    events.summary({
+        'symbols': len(tracker.price),
+        'updates': tracker.updates,
+        'updates_per_second': round(tracker.updates / elapsed) if elapsed > 0 else None,
+        'top_gappers': tracker.top(args.top, args.min_change)
+    })
+
+if __name__ == "__main__":
+    profiling.run(main, 'ranking')
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Pre-trade risk engine
+Holds exposure, pending-order notional and position limits in memory and
+validates a whole batch of proposed orders in one pass. The state file is
+shared by every process that trades or closes positions; each change is
+applied to the latest copy under a file lock.
+"""
+
+import fcntl
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+import metrics
+from config import Config
+
+class RiskEngine:
+    def __init__(self, state_file=None, max_positions=None, max_symbol_pct=None,
+                 max_symbol_notional=None, ttl=None):
+        self.state_file = state_file or Config.RISK_STATE_FILE
+        self.max_positions = max_positions if max_positions is not None else Config.MAX_CONCURRENT_POSITIONS
+        self.max_symbol_pct = max_symbol_pct if max_symbol_pct is not None else Config.MAX_SYMBOL_ALLOCATION_PCT
+        self.max_symbol_notional = max_symbol_notional if max_symbol_notional is not None else Config.MAX_SYMBOL_NOTIONAL
+        self.ttl = ttl if ttl is not None else Config.RISK_STATE_TTL
+
+        # Buying power already net of every buy recorded since the last sync
+        self.buying_power = 0.0
+        self.equity = 0.0
+        self.exposure = {}   # symbol -> market value of open position
+        self.pending = {}    # symbol -> notional of unfilled buy orders
+        self.filled_orders = []  # buys moved from pending to exposure since the last sync
+        self.synced_at = 0.0
+
+        self.load_state()
+
+    def load_state(self):
+        """Load the last persisted state, if any"""
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+            self.buying_power = float(state.get('buying_power', 0))
+            self.equity = float(state.get('equity', 0))
+            self.exposure = {k: float(v) for k, v in state.get('exposure', {}).items()}
+            self.pending = {k: float(v) for k, v in state.get('pending', {}).items()}
+            self.filled_orders = list(state.get('filled_orders', []))
+            self.synced_at = float(state.get('synced_at', 0))
+        except (OSError, ValueError):
+            pass
+
+    @contextmanager
+    def locked(self):
+        """Serialize read-modify-write of the state file across processes"""
+        with open(f"{self.state_file}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save_state(self):
+        """Persist state atomically so the next process starts warm (call under locked())"""
+        state = {
+            'buying_power': self.buying_power,
+            'equity': self.equity,
+            'exposure': self.exposure,
+            'pending': self.pending,
+            'filled_orders': self.filled_orders,
+            'synced_at': self.synced_at
+        }
+        tmp_path = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            print(f"Error saving risk state: {e}", file=sys.stderr)
+
+    def is_stale(self):
+        return time.time() - self.synced_at > self.ttl
+
+    def sync(self, api):
+        """Rebuild state from the broker (account, positions, open orders)"""
+        account = api.get_account()
+        positions = api.list_positions()
+        open_orders = api.list_orders(status='open')
+
+        self.buying_power = float(account.buying_power)
+        self.equity = float(account.equity)
+        self.exposure = {p.symbol: abs(float(p.market_value or 0)) for p in positions}
+
+        self.pending = {}
+        for order in open_orders:
+            if order.side != 'buy':
+                continue
+            remaining = float(order.qty or 0) - float(order.filled_qty or 0)
+            price = float(order.limit_price or order.stop_price or 0)
+            self.pending[order.symbol] = self.pending.get(order.symbol, 0.0) + remaining * price
+
+        self.filled_orders = []
+        self.synced_at = time.time()
+
+    def ensure_fresh(self, api):
+        """Reload the shared state; only hit the broker when it has expired"""
+        with self.locked():
+            self.load_state()
+            stale = self.is_stale()
+            metrics.record_cache('risk_state', not stale)
+            if stale:
+                self.sync(api)
+                self.save_state()
+        return stale
+
+    def open_position_count(self):
+        symbols = {s for s, v in self.exposure.items() if v > 0}
+        symbols.update(s for s, v in self.pending.items() if v > 0)
+        return len(symbols)
+
+    def symbol_cap(self):
+        cap = self.equity * self.max_symbol_pct / 100 if self.equity > 0 else np.inf
+        if self.max_symbol_notional > 0:
+            cap = min(cap, self.max_symbol_notional)
+        return cap
+
+    def size_batch(self, stocks):
+        """Split available buying power evenly, then validate the batch"""
+        if not stocks:
+            return {}
+
+        symbols = [s['symbol'] for s in stocks]
+        prices = np.nan_to_num(np.array([float(s.get('price') or 0) for s in stocks]))
+        allocation = max(self.buying_power, 0.0) / len(stocks)
+        qty = np.floor(np.divide(allocation, prices, out=np.zeros_like(prices), where=prices > 0))
+        qty = np.minimum(qty, np.iinfo(np.int64).max).astype(np.int64)
+
+        approved_qty, reasons = self.validate_batch(symbols, qty, prices)
+        reasons[prices <= 0] = 'no_price'
+
+        return {
+            symbol: {
+                'shares': int(approved_qty[i]),
+                'allocation': allocation,
+                'price': float(prices[i]),
+                'total_value': float(approved_qty[i] * prices[i]),
+                'risk_reason': reasons[i] or None
+            }
+            for i, symbol in enumerate(symbols)
+        }
+
+    def validate_batch(self, symbols, qty, prices):
+        """
+        Validate proposed buys in order of priority.
+        Returns (approved_qty, reasons) where a reason is set for any order
+        that was reduced or rejected.
+        """
+        qty = np.array(qty, dtype=np.int64)
+        prices = np.asarray(prices, dtype=float)
+        reasons = np.full(len(symbols), '', dtype=object)
+
+        if len(symbols) == 0:
+            return qty, reasons
+
+        held = np.array([self.exposure.get(s, 0.0) + self.pending.get(s, 0.0) for s in symbols])
+
+        # Per-symbol cap counts what we already hold or have working
+        room = np.maximum(self.symbol_cap() - held, 0.0)
+        max_qty = np.floor(np.divide(room, prices, out=np.zeros_like(room), where=prices > 0))
+        max_qty = np.minimum(max_qty, np.iinfo(np.int64).max).astype(np.int64)
+        capped = qty > max_qty
+        qty = np.minimum(qty, max_qty)
+        reasons[capped] = 'symbol_cap'
+
+        # First come first served: each new symbol takes a position slot, and
+        # the notional of orders approved so far must stay within buying power.
+        # A rejected order uses up neither, so a later one that fits still goes.
+        slots = self.max_positions - self.open_position_count()
+        power = self.buying_power + 1e-9
+        for i in np.flatnonzero(qty > 0):
+            notional = qty[i] * prices[i]
+            if held[i] == 0 and slots <= 0:
+                qty[i] = 0
+                reasons[i] = 'max_positions'
+            elif notional > power:
+                qty[i] = 0
+                reasons[i] = 'buying_power'
+            else:
+                power -= notional
+                slots -= held[i] == 0
+
+        reasons[(qty <= 0) & (reasons == '')] = 'zero_shares'
+
+        return qty, reasons
+
+    def record_order(self, symbol, shares, price):
+        """Account for a submitted buy without waiting for a resync"""
+        notional = shares * price
+        with self.locked():
+            self.load_state()
+            self.pending[symbol] = self.pending.get(symbol, 0.0) + notional
+            self.buying_power -= notional
+            self.save_state()
+
+    def record_fills(self, fills, working=()):
+        """
+        Move filled buys from pending to exposure without waiting for a resync.
+        fills: order sync's fill dicts; working: symbols with buy orders still open,
+        whose pending notional is kept net of what filled
+        """
+        buys = [f for f in fills if f['action'] == 'BUY']
+        if not buys:
+            return 0
+        applied = 0
+        with self.locked():
+            self.load_state()
+            for fill in buys:
+                # A sync after the fill already saw it in positions
+                if fill['order_id'] in self.filled_orders or fill['time'] <= self.synced_at:
+                    continue
+                symbol, value = fill['symbol'], fill['shares'] * fill['price']
+                self.exposure[symbol] = self.exposure.get(symbol, 0.0) + value
+                left = self.pending.pop(symbol, 0.0) - value
+                if symbol in working and left > 0:
+                    self.pending[symbol] = left
+                self.filled_orders.append(fill['order_id'])
+                applied += 1
+            if applied:
+                self.save_state()
+        return applied
+
+    def record_closes(self, symbols):
+        """
+        Drop exposure and working buys for closed positions and free their
+        value, so the next run doesn't wait out the TTL to see the room
+        """
+        with self.locked():
+            self.load_state()
+            for symbol in symbols:
+                self.buying_power += self.exposure.pop(symbol, 0.0) + self.pending.pop(symbol, 0.0)
+            self.save_state()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo risk-of-ruin simulator
+Bootstraps per-trade returns from realized fills and replays hundreds of
+thousands of trade sequences under different allocation fractions, the way
+execute_trades.py splits buying power evenly across concurrent positions.
+Reports drawdown distribution and probability of ruin for each fraction.
+
+Usage:
+    risk_of_ruin.py [--source auto|broker|journal] [--paths 200000] [--trades 250]
+                    [--fractions 0.25,0.5,0.75,1.0] [--positions 1] [--ruin 0.5]
+                    [--workers 4] [--seed 42]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analytics import PerformanceAnalytics, period_bounds
+
+MIN_TRADES = 20
+CHUNK_PATHS = 20000
+DRAWDOWN_LEVELS = (0.2, 0.3, 0.5)
+
+def trade_returns(data):
+    """
+    Per-trade return on capital deployed, from closed trades' realized P&L:
+    entry = exit - pnl/qty, return = (pnl/qty) / entry
+    """
+    side = np.asarray(data['side'])
+    pnl = np.asarray(data['pnl'])
+    qty = np.asarray(data['qty'])
+    price = np.asarray(data['price'])
+
+    closed = (side < 0) & np.isfinite(pnl) & (qty > 0)
+    per_share = pnl[closed] / qty[closed]
+    entry = price[closed] - per_share
+    valid = entry > 0
+    return per_share[valid] / entry[valid]
+
+def simulate_chunk(returns, fractions, paths, trades, positions, ruin, seed):
+    """
+    One block of paths. Every fraction sees the same sampled trades (common
+    random numbers), so differences between fractions are the policy, not noise.
+    Returns (max drawdown, ruined, final equity) arrays shaped (fractions, paths).
+    """
+    rng = np.random.default_rng(seed)
+    returns = np.asarray(returns, dtype=np.float32)
+    # Each step deploys the fraction evenly across `positions` bootstrapped trades
+    draws = rng.integers(0, len(returns), size=(paths, trades, positions), dtype=np.int32)
+    sampled = returns[draws].mean(axis=2, dtype=np.float32)
+
+    ruin_level = np.log1p(-ruin)
+    max_drawdown = np.empty((len(fractions), paths), dtype=np.float32)
+    ruined = np.empty((len(fractions), paths), dtype=bool)
+    final = np.empty((len(fractions), paths), dtype=np.float32)
+
+    for i, fraction in enumerate(fractions):
+        # Work in log equity; a step can't lose more than everything
+        steps = np.log(np.maximum(np.float32(1.0) + np.float32(fraction) * sampled, np.float32(1e-12)))
+        log_equity = np.cumsum(steps, axis=1, dtype=np.float32)
+        peak = np.maximum(np.maximum.accumulate(log_equity, axis=1), 0.0)
+        max_drawdown[i] = 1.0 - np.exp((log_equity - peak).min(axis=1))
+        ruined[i] = log_equity.min(axis=1) <= ruin_level
+        final[i] = np.exp(log_equity[:, -1])
+
+    return max_drawdown, ruined, final
+
+def split_paths(total, chunk):
+    sizes = [chunk] * (total // chunk)
+    if total % chunk:
+        sizes.append(total % chunk)
+    return sizes
+
+def simulate(returns, fractions, paths=200000, trades=250, positions=1, ruin=0.5, workers=0, seed=None):
+    """Run all paths in blocks, optionally across a process pool"""
+    sizes = split_paths(paths, CHUNK_PATHS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(returns, fractions, size, trades, positions, ruin, s) for size, s in zip(sizes, seeds)]
+
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(simulate_chunk, *zip(*jobs)))
+    else:
+        results = [simulate_chunk(*job) for job in jobs]
+
+    max_drawdown = np.concatenate([r[0] for r in results], axis=1)
+    ruined = np.concatenate([r[1] for r in results], axis=1)
+    final = np.concatenate([r[2] for r in results], axis=1)
+    return max_drawdown, ruined, final
+
+def summarize(fractions, max_drawdown, ruined, final):
+    results = []
+    for i, fraction in enumerate(fractions):
+        dd = max_drawdown[i]
+        results.append({
+            'allocation_fraction': fraction,
+            'ruin_probability': float(ruined[i].mean()),
+            'max_drawdown': {
+                'p50': float(np.percentile(dd, 50)),
+                'p95': float(np.percentile(dd, 95)),
+                'p99': float(np.percentile(dd, 99)),
+                'mean': float(dd.mean())
+            },
+            'drawdown_exceedance': {f"{int(level * 100)}%": float((dd >= level).mean()) for level in DRAWDOWN_LEVELS},
+            'final_equity_multiple': {
+                'p5': float(np.percentile(final[i], 5)),
+                'p50': float(np.percentile(final[i], 50)),
+                'p95': float(np.percentile(final[i], 95))
+            }
+        })
+    return results
+
+def load_returns(source, start, end):
+    """Closed-trade returns for the period; broker fills first, journal if the broker has too few"""
+    sources = [source] if source != 'auto' else ['broker', 'journal']
+    for name in sources:
+        try:
+            data, _, _ = PerformanceAnalytics(source=name).load(start, end)
+        except Exception as e:
+            print(f"Error loading {name} fills: {e}", file=sys.stderr)
+            continue
+        returns = trade_returns(data)
+        if len(returns) >= MIN_TRADES or name == sources[-1]:
+            return returns, name
+    return np.zeros(0), sources[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo risk of ruin over realized trade returns')
+    parser.add_argument('--source', choices=['auto', 'broker', 'journal'], default='auto',
+                        help='Broker order fills, the trade journal (includes trade_log.csv), or broker with journal fallback')
+    parser.add_argument('--period', choices=['mtd', 'ytd', 'all'], default='all')
+    parser.add_argument('--paths', type=int, default=200000, help='Simulated trade sequences')
+    parser.add_argument('--trades', type=int, default=250, help='Trades (allocation steps) per sequence')
+    parser.add_argument('--fractions', default='0.25,0.5,0.75,1.0', help='Comma-separated fractions of buying power')
+    parser.add_argument('--positions', type=int, default=1, help='Concurrent positions the fraction is split across')
+    parser.add_argument('--ruin', type=float, default=0.5, help='Loss of starting equity counted as ruin')
+    parser.add_argument('--workers', type=int, default=0, help='Process pool size (0 = run in-process, -1 = one per CPU)')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    try:
+        start, end = period_bounds(args.period)
+        returns, source = load_returns(args.source, start, end)
+        if len(returns) < MIN_TRADES:
+            print(json.dumps({
+                'error': True,
+                'message': f"Need at least {MIN_TRADES} closed trades to bootstrap, found {len(returns)}"
+            }))
+            sys.exit(1)
+
+        fractions = [float(f) for f in args.fractions.split(',')]
+        workers = args.workers if args.workers >= 0 else os.cpu_count()
+
+        print(f"🎲 Simulating {args.paths:,} sequences of {args.trades} trades from {len(returns)} {source} trades", file=sys.stderr)
+        started = time.perf_counter()
+        max_drawdown, ruined, final = simulate(returns, fractions, args.paths, args.trades,
+                                               args.positions, args.ruin, workers, args.seed)
+        elapsed = time.perf_counter() - started
+
+        result = {
+            'source': source,
+            'sample': {
+                'trades': len(returns),
+                'mean_return': float(returns.mean()),
+                'std_return': float(returns.std(ddof=1)),
+                'win_rate': float((returns > 0).mean() * 100),
+                'worst_return': float(returns.min()),
+                'best_return': float(returns.max())
+            },
+            'paths': args.paths,
+            'trades_per_path': args.trades,
+            'positions': args.positions,
+            'ruin_threshold': args.ruin,
+            'elapsed_seconds': elapsed,
+            'results': summarize(fractions, max_drawdown, ruined, final)
+        }
+
+        # Output JSON to stdout for Node.js consumption
+        print(json.dumps(result, indent=2))
+
+    except SystemExit:
+        raise
+    except Exception as e:
+        print(json.dumps({'error': True, 'message': f"Risk of ruin simulation failed: {str(e)}"}))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
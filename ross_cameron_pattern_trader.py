@@ -5,9 +5,13 @@ Integrates comprehensive pattern analysis with Ross Cameron momentum criteria
 """
 
 from pattern_analyzer import PatternAnalyzer
-import yfinance as yf
+import jsonlog
+import latency
+import market_data
+import tracing
 from datetime import datetime, timedelta
 import logging
+import time
 
 class RossCameronPatternTrader:
     def __init__(self):
@@ -29,24 +33,33 @@ class RossCameronPatternTrader:
             'STRONG_SELL': -5
         }
     
+    @tracing.traced('pattern_trader.candidates')
     def get_ross_cameron_candidates(self, tickers_list):
         """Screen stocks using Ross Cameron criteria"""
         candidates = []
         
-        print("🔍 SCREENING FOR ROSS CAMERON CANDIDATES")
-        print("=" * 50)
+        self.logger.info("🔍 Screening %d tickers for Ross Cameron candidates", len(tickers_list))
+        
+        # One batched snapshot call per provider batch instead of a request per ticker
+        try:
+            snapshots = market_data.get_provider().snapshots(tickers_list)
+        except Exception as e:
+            self.logger.error("Error fetching snapshots: %s", e)
+            return candidates
+        arrived = time.time()
         
         for ticker in tickers_list:
             try:
-                stock = yf.Ticker(ticker)
-                data = stock.history(period="2d", interval="1d", prepost=True)
+                snapshot = snapshots.get(ticker)
+                record = latency.new_record(ticker, source='pattern_trader')
+                latency.mark(record, 'data_arrival', arrived)
                 
-                if len(data) < 2:
+                if snapshot is None or not snapshot['prev_close']:
                     continue
                     
-                current_price = data['Close'].iloc[-1]
-                prev_close = data['Close'].iloc[-2]
-                volume = data['Volume'].iloc[-1]
+                current_price = snapshot['price']
+                prev_close = snapshot['prev_close']
+                volume = snapshot['volume']
                 change_percent = ((current_price - prev_close) / prev_close) * 100
                 
                 # Apply Ross Cameron filters
@@ -55,29 +68,35 @@ class RossCameronPatternTrader:
                 volume_ok = volume >= self.min_volume
                 
                 if price_ok and change_ok and volume_ok:
+                    # Only a real last print dates the data; a daily bar's midnight stamp would skew tick-to-trade
+                    if snapshot['timestamp'] is not None:
+                        latency.mark(record, 'bar_ts', snapshot['timestamp'])
+                    latency.mark(record, 'screen_complete')
                     candidates.append({
                         'ticker': ticker,
                         'price': current_price,
                         'change_percent': change_percent,
-                        'volume': volume
+                        'volume': volume,
+                        'latency': record
                     })
                     
-                    print(f"✅ {ticker}: ${current_price:.2f} (+{change_percent:.1f}%) Vol: {volume:,}")
+                    self.logger.info("✅ %s: $%.2f (+%.1f%%) Vol: %d", ticker, current_price, change_percent, volume,
+                                     extra={'symbol': ticker})
                 
             except Exception as e:
-                self.logger.error(f"Error screening {ticker}: {e}")
+                self.logger.error("Error screening %s: %s", ticker, e, extra={'symbol': ticker})
                 
         return candidates
     
+    @tracing.traced('pattern_trader.scoring')
     def analyze_candidates_with_patterns(self, candidates):
         """Analyze Ross Cameron candidates with comprehensive pattern analysis"""
         
         if not candidates:
-            print("❌ No Ross Cameron candidates found")
+            self.logger.info("❌ No Ross Cameron candidates found")
             return []
             
-        print(f"\n🎯 ANALYZING {len(candidates)} CANDIDATES WITH PATTERN ANALYSIS")
-        print("=" * 70)
+        self.logger.info("🎯 Analyzing %d candidates with pattern analysis", len(candidates))
         
         enhanced_analysis = []
         
@@ -86,7 +105,9 @@ class RossCameronPatternTrader:
             
             try:
                 # Get comprehensive pattern analysis
-                pattern_analysis = self.pattern_analyzer.analyze_stock_comprehensive(ticker)
+                with tracing.span('pattern_trader.score', symbol=ticker) as span:
+                    pattern_analysis = self.pattern_analyzer.analyze_stock_comprehensive(ticker)
+                    span.set(signal=pattern_analysis.get('overall_signal', {}).get('signal'))
                 
                 # Combine Ross Cameron data with pattern analysis
                 if 'overall_signal' in pattern_analysis:
@@ -96,6 +117,7 @@ class RossCameronPatternTrader:
                     # Calculate final trading score
                     ross_score = self.calculate_ross_score(candidate)
                     final_score = ross_score + pattern_score
+                    latency.mark(candidate.get('latency'), 'signal')
                     
                     enhanced_candidate = {
                         **candidate,
@@ -116,7 +138,7 @@ class RossCameronPatternTrader:
                     self.display_candidate_analysis(enhanced_candidate)
                     
             except Exception as e:
-                self.logger.error(f"Error analyzing {ticker}: {e}")
+                self.logger.error("Error analyzing %s: %s", ticker, e, extra={'symbol': ticker})
                 
         return enhanced_analysis
     
@@ -158,24 +180,25 @@ class RossCameronPatternTrader:
             return "NEUTRAL - No clear direction"
     
     def display_candidate_analysis(self, candidate):
-        """Display detailed analysis for a candidate"""
-        ticker = candidate['ticker']
+        """Log detailed analysis for a candidate (debug level)"""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         
-        print(f"\n📊 {ticker.upper()} - DETAILED ANALYSIS")
-        print("-" * 40)
-        print(f"💰 Price: ${candidate['price']:.2f} (+{candidate['change_percent']:.1f}%)")
-        print(f"📊 Volume: {candidate['volume']:,}")
-        print(f"🎯 Pattern Signal: {candidate['pattern_signal']} ({candidate['pattern_confidence']}%)")
-        print(f"🔍 Patterns Found: {candidate['breakout_patterns']} breakout, {candidate['candlestick_patterns']} candlestick")
-        
-        # Technical status
+        ticker = candidate['ticker']
         tech = candidate['technical_data']
         macd_status = "✅ Bullish" if tech.get('macd_bullish') else "❌ Bearish"
         vwap_status = "✅ Above" if tech.get('above_vwap') else "❌ Below"
         
-        print(f"🔧 Technical: MACD {macd_status}, VWAP {vwap_status}, RSI {tech.get('rsi', 50):.1f}")
-        print(f"📈 Final Score: {candidate['final_score']:.1f}")
-        print(f"🎯 Recommendation: {candidate['recommendation']}")
+        self.logger.debug(
+            "📊 %s: $%.2f (+%.1f%%) Vol: %d | %s (%s%%) | %d breakout, %d candlestick | "
+            "MACD %s, VWAP %s, RSI %.1f | score %.1f: %s",
+            ticker.upper(), candidate['price'], candidate['change_percent'], candidate['volume'],
+            candidate['pattern_signal'], candidate['pattern_confidence'],
+            candidate['breakout_patterns'], candidate['candlestick_patterns'],
+            macd_status, vwap_status, tech.get('rsi', 50),
+            candidate['final_score'], candidate['recommendation'],
+            extra={'symbol': ticker, 'score': candidate['final_score'], 'signal': candidate['pattern_signal']}
+        )
     
     def get_top_trading_opportunities(self, enhanced_analysis, top_n=3):
         """Get top trading opportunities ranked by final score"""
@@ -218,6 +241,8 @@ class RossCameronPatternTrader:
 def main():
     """Test the integrated Ross Cameron + Pattern analysis system"""
     
+    jsonlog.setup('pattern_trader')
+    
     # Initialize the trader
     trader = RossCameronPatternTrader()
     
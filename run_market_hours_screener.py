@@ -3,12 +3,11 @@
 Market Hours Screener - Ross Cameron style momentum screening for regular market hours
 """
 
-import json
+import argparse
 import sys
 import os
 from pathlib import Path
 from datetime import datetime
-import yfinance as yf
 import pandas as pd
 import pandas_ta as ta
 
@@ -17,6 +16,18 @@ parent_dir = Path(__file__).parent.parent
 sys.path.append(str(parent_dir))
 
 from config import Config
+import event_stream
+import jsonlog
+import latency
+import market_data
+import metrics
+import ranking
+import scan_state
+import scheduler
+import tracing
+import volume_profile
+
+logger = jsonlog.get_logger(__name__)
 
 class MarketHoursScreener:
     def __init__(self):
@@ -28,32 +39,77 @@ class MarketHoursScreener:
             'VERB', 'KPTI', 'RMED', 'VYNE', 'GTHX', 'MARA', 'RIOT', 'BTBT',
             'XELA', 'SENS', 'DATS', 'INPX', 'IBIO', 'IMMP', 'GSAT', 'APRN'
         ]
+        self.volume_profile = volume_profile.VolumeProfile.load()
+        self.data = market_data.get_provider()
+        # Qualifiers ranked on (technical score, change%) as they're found
+        self.qualifiers = ranking.Ranking(('score',))
+        self.found = {}
     
-    def screen_stocks(self, criteria):
-        """Screen stocks based on Ross Cameron criteria"""
+    @tracing.traced('market.scan')
+    def screen_stocks(self, criteria, events=None, deadline=None):
+        """Screen stocks based on Ross Cameron criteria, strongest recent movers first"""
+        events = events or event_stream.EventWriter()
+        tracing.current().set(symbols=len(self.penny_stocks), deadline=deadline)
         qualifying_stocks = []
+        scanned = metrics.SYMBOLS_SCANNED.labels('market')
+        state = self.state = scan_state.ScanState('market')
+        plan = scan_state.ScanPlan(state, self.penny_stocks, deadline)
+        
+        with metrics.SCAN_SECONDS.labels('market').time():
+            for done, ticker in enumerate(plan, 1):
+                scanned.inc()
+                try:
+                    stock_data = self.analyze_stock(ticker, criteria)
+                    if stock_data:
+                        avg_volume = stock_data.get('avg_volume') or 0
+                        state.record(ticker, stock_data['change_percent'],
+                                     stock_data['volume'] / avg_volume if avg_volume else None)
+                    if stock_data and stock_data['qualifies']:
+                        qualifying_stocks.append(stock_data)
+                        self.found[ticker] = stock_data
+                        self.qualifiers.update(ticker, score=(stock_data['technical_score'], stock_data['change_percent']))
+                        events.candidate(stock_data)
+                    elif stock_data:
+                        metrics.SYMBOLS_SKIPPED.labels('market', 'criteria').inc()
+                        
+                except Exception as e:
+                    metrics.SYMBOLS_SKIPPED.labels('market', 'error').inc()
+                    logger.error("Error analyzing %s: %s", ticker, e, extra={'symbol': ticker})
+                finally:
+                    events.progress(done, len(plan.order), found=len(qualifying_stocks))
         
-        for ticker in self.penny_stocks:
-            try:
-                stock_data = self.analyze_stock(ticker, criteria)
-                if stock_data and stock_data['qualifies']:
-                    qualifying_stocks.append(stock_data)
-                    
-            except Exception as e:
-                print(f"Error analyzing {ticker}: {str(e)}", file=sys.stderr)
-                continue
+        self.coverage = plan.finish()
+        tracing.current().set(coverage=self.coverage['coverage'])
+        events.emit('coverage', data=self.coverage)
+        if self.coverage['deadline_hit']:
+            logger.warning("⏱️ Deadline reached after %d/%d symbols; %d carried to next scan",
+                           self.coverage['scanned'], self.coverage['total'], len(self.coverage['carried_over']))
         
         return qualifying_stocks
     
+    def top_stocks(self, k):
+        """Best k qualifiers, each with its percentile across the whole universe"""
+        top = []
+        for ticker, _ in self.qualifiers.top('score', k):
+            stock = self.found[ticker]
+            stock['percentile'] = self.state.ranking.percentiles(ticker)
+            top.append(stock)
+        return top
+    
+    @tracing.traced('market.analyze_stock')
     def analyze_stock(self, ticker, criteria):
         """Analyze individual stock against criteria"""
+        span = tracing.current().set(symbol=ticker)
         try:
             # Get current stock data
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            hist = stock.history(period='1d', interval='1m')
+            info = self.data.fundamentals(ticker)
+            hist = self.data.history(ticker, period='1d', interval='1m', prepost=False)
+            record = latency.new_record(ticker, source='market')
+            latency.mark(record, 'data_arrival')
             
+            span.set(bars=len(hist))
             if hist.empty:
+                metrics.SYMBOLS_SKIPPED.labels('market', 'no_data').inc()
                 return None
             
             current_price = hist['Close'].iloc[-1]
@@ -69,11 +125,14 @@ class MarketHoursScreener:
             volume_ok = volume >= criteria['min_volume']
             
             qualifies = price_ok and change_ok and volume_ok
+            span.set(qualifies=bool(qualifies))
             
             # Get technical indicators if qualifying
             technical_score = 0
             if qualifies:
                 technical_score = self.calculate_technical_score(ticker, hist)
+                latency.mark(record, 'bar_ts', hist.index[-1])
+                latency.mark(record, 'screen_complete')
             
             return {
                 'symbol': ticker,
@@ -82,13 +141,16 @@ class MarketHoursScreener:
                 'volume': int(volume),
                 'qualifies': qualifies,
                 'technical_score': technical_score,
-                'market_cap': info.get('marketCap', 0),
-                'avg_volume': info.get('averageVolume', 0)
+                'market_cap': info.get('market_cap') or 0,
+                'avg_volume': info.get('average_volume') or 0,
+                'latency': record
             }
             
         except Exception as e:
+            metrics.SYMBOLS_SKIPPED.labels('market', 'error').inc()
             return None
     
+    @tracing.traced('market.technical_score')
     def calculate_technical_score(self, ticker, hist_data):
         """Calculate technical analysis score"""
         try:
@@ -100,9 +162,10 @@ class MarketHoursScreener:
             
             # Calculate basic indicators
             data = hist_data.copy()
-            data['VWAP'] = ta.vwap(data['High'], data['Low'], data['Close'], data['Volume'])
-            data['EMA_9'] = ta.ema(data['Close'], length=9)
-            data['EMA_20'] = ta.ema(data['Close'], length=20)
+            with metrics.INDICATOR_SECONDS.labels('market').time():
+                data['VWAP'] = ta.vwap(data['High'], data['Low'], data['Close'], data['Volume'])
+                data['EMA_9'] = ta.ema(data['Close'], length=9)
+                data['EMA_20'] = ta.ema(data['Close'], length=20)
             
             current_price = data['Close'].iloc[-1]
             vwap = data['VWAP'].iloc[-1]
@@ -117,9 +180,14 @@ class MarketHoursScreener:
             if current_price > ema_9 > ema_20:
                 score += 30
             
-            # Volume analysis (40 points)
-            avg_volume = data['Volume'].rolling(20).mean().iloc[-1]
+            # Volume analysis (40 points): against the usual volume for this
+            # minute of day, or the last 20 bars without a baseline
             current_volume = data['Volume'].iloc[-1]
+            avg_volume = None
+            if self.volume_profile is not None:
+                avg_volume = self.volume_profile.baseline(ticker, data.index[-1:])[0]
+            if avg_volume is None or pd.isna(avg_volume):
+                avg_volume = data['Volume'].rolling(20).mean().iloc[-1]
             if current_volume > avg_volume * 2:
                 score += 40
             elif current_volume > avg_volume * 1.5:
@@ -130,7 +198,7 @@ class MarketHoursScreener:
         except:
             return 0
 
-def run_market_hours_screener():
+def run_market_hours_screener(events=None, deadline=None):
     """Run market hours screening with enhanced criteria"""
     try:
         screener = MarketHoursScreener()
@@ -145,18 +213,16 @@ def run_market_hours_screener():
         }
         
         # Get qualifying stocks
-        qualifying_stocks = screener.screen_stocks(criteria)
+        screener.screen_stocks(criteria, events, deadline)
         
-        # Sort by technical score and change percentage
-        qualifying_stocks.sort(key=lambda x: (x.get('technical_score', 0), x.get('change_percent', 0)), reverse=True)
-        
-        # Limit to top 10 for focused trading
-        top_stocks = qualifying_stocks[:10]
+        # Top 10 by technical score and change percentage, for focused trading
+        top_stocks = screener.top_stocks(10)
         
         result = {
             'timestamp': datetime.now().isoformat(),
             'session': 'market',
-            'total_scanned': len(screener.penny_stocks),
+            'total_scanned': screener.coverage['scanned'],
+            'coverage': screener.coverage,
             'qualifying_stocks': top_stocks,
             'criteria': criteria,
             'success': True
@@ -177,9 +243,18 @@ def run_market_hours_screener():
 
 def main():
     """Main function to run market hours screener and return results as JSON"""
+    events = event_stream.from_argv()
+    parser = argparse.ArgumentParser(description='Market hours momentum screener')
+    parser.add_argument('--deadline', type=float, default=Config.SCAN_DEADLINE_SECONDS,
+                        help='Seconds to spend before returning partial results (0 = no limit)')
+    args = parser.parse_args()
+    
+    metrics.start('market_hours_screener')
+    tracing.start('market_hours_screener')
+    jsonlog.setup('market_hours_screener')
     try:
-        result = run_market_hours_screener()
-        print(json.dumps(result, indent=2))
+        result = run_market_hours_screener(events, deadline=args.deadline)
+        events.summary(result)
         
         if not result.get('success', False):
             sys.exit(1)
@@ -191,8 +266,8 @@ def main():
             'qualifying_stocks': [],
             'success': False
         }
-        print(json.dumps(error_response))
+        events.summary(error_response)
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'market_hours_screener')
@@ -4,18 +4,31 @@ Pre-market screener script for Node.js integration
 Returns JSON list of qualifying stocks
 """
 
-import sys
-import json
-import yfinance as yf
+import argparse
+import numpy as np
 import pandas as pd
 import pandas_ta as ta
 from datetime import datetime, time as dt_time
 import os
 from dotenv import load_dotenv
 
+from config import Config
+import event_stream
+import indicators as ind
+import jsonlog
+import latency
+import market_data
+import metrics
+import overnight_snapshot
+import scan_state
+import scheduler
+import tracing
+
 # Load environment variables
 load_dotenv()
 
+logger = jsonlog.get_logger(__name__)
+
 class PreMarketScreener:
     def __init__(self):
         self.penny_stocks = [
@@ -25,6 +38,15 @@ class PreMarketScreener:
             'ZOM', 'JAGX', 'ONTX', 'SHIP', 'EAST', 'ADMP', 'BOXL', 'CORZ',
             'VERB', 'KPTI', 'RMED', 'VYNE', 'GTHX', 'MARA', 'RIOT', 'BTBT'
         ]
+        self._overnight = None
+        self.data = market_data.get_provider()
+    
+    @property
+    def overnight(self):
+        """Nightly indicator seeds, loaded on first use (False if unavailable)"""
+        if self._overnight is None:
+            self._overnight = overnight_snapshot.OvernightSnapshot.load() or False
+        return self._overnight
     
     def get_current_session(self):
         now = datetime.now().time()
@@ -35,32 +57,70 @@ class PreMarketScreener:
         else:
             return 'closed'
     
+    @tracing.traced('premarket.indicators')
     def calculate_technical_indicators(self, ticker):
         try:
             # Get 1-minute data for technical analysis
-            data = yf.download(ticker, period='1d', interval='1m', prepost=True, progress=False)
+            data = self.data.history(ticker, period='1d', interval='1m', prepost=True)
             
-            if data.empty or len(data) < 200:
+            tracing.current().set(symbol=ticker, bars=len(data))
+            if data.empty:
                 return None
             
-            # Calculate indicators
-            data['VWAP'] = ta.vwap(data['High'], data['Low'], data['Close'], data['Volume'])
-            data['EMA_9'] = ta.ema(data['Close'], length=9)
-            data['EMA_20'] = ta.ema(data['Close'], length=20)
-            data['EMA_200'] = ta.ema(data['Close'], length=200)
+            # Early premarket has too few bars for EMA_200; continue from last night's state
+            seed = self.overnight.get(ticker) if self.overnight else None
+            if seed is not None and seed['seed_bars'] >= overnight_snapshot.MIN_SEED_BARS:
+                with metrics.INDICATOR_SECONDS.labels('premarket').time():
+                    latest = self.continue_from_snapshot(data, seed)
+                if latest is not None:
+                    tracing.current().set(seeded=True)
+                    return latest
             
-            # MACD calculation
-            macd_data = ta.macd(data['Close'])
-            data['MACD'] = macd_data['MACD_12_26_9']
-            data['MACD_Signal'] = macd_data['MACDs_12_26_9']
-            data['MACD_Histogram'] = macd_data['MACDh_12_26_9']
+            if len(data) < 200:
+                return None
+            
+            # Calculate indicators
+            with metrics.INDICATOR_SECONDS.labels('premarket').time():
+                data['VWAP'] = ta.vwap(data['High'], data['Low'], data['Close'], data['Volume'])
+                data['EMA_9'] = ta.ema(data['Close'], length=9)
+                data['EMA_20'] = ta.ema(data['Close'], length=20)
+                data['EMA_200'] = ta.ema(data['Close'], length=200)
+                
+                # MACD calculation
+                macd_data = ta.macd(data['Close'])
+                data['MACD'] = macd_data['MACD_12_26_9']
+                data['MACD_Signal'] = macd_data['MACDs_12_26_9']
+                data['MACD_Histogram'] = macd_data['MACDh_12_26_9']
             
             return data.iloc[-1]  # Return latest values
             
         except Exception as e:
-            print(f"Error calculating indicators for {ticker}: {e}", file=sys.stderr)
+            logger.error("Error calculating indicators for %s: %s", ticker, e, extra={'symbol': ticker})
             return None
     
+    def continue_from_snapshot(self, data, seed):
+        """Latest indicators from the overnight seeds plus only the bars printed since"""
+        new = data[overnight_snapshot.bar_timestamps(data.index) > seed['last_bar_ts']]
+        if new.empty:
+            return None
+        
+        close = ind.ffill(np.ravel(new['Close'].to_numpy(dtype=float)))
+        macd, macd_signal, macd_histogram = ind.macd(
+            close, seeds=(seed['macd_fast'], seed['macd_slow'], seed['macd_signal']))
+        # VWAP is a session measure, so it only uses today's bars
+        vwap = ind.vwap(*(ind.ffill(np.ravel(data[field].to_numpy(dtype=float))) for field in ('High', 'Low', 'Close')),
+                        np.nan_to_num(np.ravel(data['Volume'].to_numpy(dtype=float))))
+        
+        return pd.Series({
+            'VWAP': vwap[-1],
+            'EMA_9': ind.ema(close, 9, seed['ema_9'])[-1],
+            'EMA_20': ind.ema(close, 20, seed['ema_20'])[-1],
+            'EMA_200': ind.ema(close, 200, seed['ema_200'])[-1],
+            'MACD': macd[-1],
+            'MACD_Signal': macd_signal[-1],
+            'MACD_Histogram': macd_histogram[-1]
+        }, name=data.index[-1])
+    
     def is_macd_bullish(self, indicators):
         try:
             macd = indicators['MACD']
@@ -113,26 +173,39 @@ class PreMarketScreener:
             return all(all_conditions), indicators
             
         except Exception as e:
-            print(f"Error checking technical confluence for {ticker}: {e}", file=sys.stderr)
+            logger.error("Error checking technical confluence for %s: %s", ticker, e, extra={'symbol': ticker})
             return False, None
     
-    def screen_stock(self, ticker):
+    @tracing.traced('premarket.screen_stock')
+    def screen_stock(self, ticker, state=None):
+        span = tracing.current().set(symbol=ticker)
         try:
             # Get current stock data
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period='2d', prepost=True)
+            hist = self.data.history(ticker, period='2d', interval='1d', prepost=True)
+            record = latency.new_record(ticker, source='premarket')
+            latency.mark(record, 'data_arrival')
             
+            span.set(bars=len(hist))
             if hist.empty:
+                span.set(outcome='no_data')
+                metrics.SYMBOLS_SKIPPED.labels('premarket', 'no_data').inc()
                 return None
             
             current_price = hist['Close'].iloc[-1]
-            prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
+            if len(hist) > 1:
+                prev_close = hist['Close'].iloc[-2]
+            else:
+                seed = self.overnight.get(ticker) if self.overnight else None
+                prev_close = seed['prior_close'] if seed and np.isfinite(seed['prior_close']) else current_price
             
             # Calculate percentage change
             change_percent = ((current_price - prev_close) / prev_close) * 100
             
             # Get volume
             current_volume = hist['Volume'].iloc[-1]
+            if state is not None:
+                prev_volume = hist['Volume'].iloc[-2] if len(hist) > 1 else 0
+                state.record(ticker, change_percent, current_volume / prev_volume if prev_volume else None)
             
             # Ross Cameron criteria for pre-market
             ross_criteria_met = (
@@ -142,14 +215,22 @@ class PreMarketScreener:
             )
             
             if not ross_criteria_met:
+                span.set(outcome='criteria')
+                metrics.SYMBOLS_SKIPPED.labels('premarket', 'criteria').inc()
                 return None
             
             # Check technical confluence
             technical_ok, indicators = self.check_technical_confluence(ticker, current_price)
             
             if not technical_ok:
+                span.set(outcome='technical')
+                metrics.SYMBOLS_SKIPPED.labels('premarket', 'technical').inc()
                 return None
             
+            latency.mark(record, 'bar_ts', indicators.name)
+            latency.mark(record, 'screen_complete')
+            span.set(outcome='qualified')
+            
             return {
                 'symbol': ticker,
                 'price': float(current_price),
@@ -164,44 +245,78 @@ class PreMarketScreener:
                     'macd': float(indicators['MACD']) if indicators is not None else None,
                     'macd_signal': float(indicators['MACD_Signal']) if indicators is not None else None,
                     'macd_bullish': self.is_macd_bullish(indicators) if indicators is not None else False
-                }
+                },
+                'latency': record
             }
             
         except Exception as e:
-            print(f"Error screening {ticker}: {e}", file=sys.stderr)
+            span.set(outcome='error')
+            metrics.SYMBOLS_SKIPPED.labels('premarket', 'error').inc()
+            logger.error("Error screening %s: %s", ticker, e, extra={'symbol': ticker})
             return None
     
-    def run_screening(self):
+    @tracing.traced('premarket.scan')
+    def run_screening(self, events=None, deadline=None):
+        events = events or event_stream.EventWriter()
+        tracing.current().set(symbols=len(self.penny_stocks), deadline=deadline)
         qualifying_stocks = []
         
-        print(f"🔍 Screening {len(self.penny_stocks)} stocks for pre-market opportunities...", file=sys.stderr)
+        logger.info("🔍 Screening %d stocks for pre-market opportunities...", len(self.penny_stocks))
+        
+        # Strongest movers (and anything a deadline cut off last time) first
+        state = scan_state.ScanState('premarket')
+        plan = scan_state.ScanPlan(state, self.penny_stocks, deadline)
+        scanned = metrics.SYMBOLS_SCANNED.labels('premarket')
+        with metrics.SCAN_SECONDS.labels('premarket').time():
+            for done, ticker in enumerate(plan, 1):
+                scanned.inc()
+                result = self.screen_stock(ticker, state)
+                if result:
+                    qualifying_stocks.append(result)
+                    logger.info("✅ %s: $%.2f (+%.1f%%)", ticker, result['price'], result['change_percent'],
+                                extra={'symbol': ticker})
+                    events.candidate(result)
+                events.progress(done, len(plan.order), found=len(qualifying_stocks))
         
-        for ticker in self.penny_stocks:
-            result = self.screen_stock(ticker)
-            if result:
-                qualifying_stocks.append(result)
-                print(f"✅ {ticker}: ${result['price']:.2f} (+{result['change_percent']:.1f}%)", file=sys.stderr)
+        self.coverage = plan.finish()
+        tracing.current().set(coverage=self.coverage['coverage'])
+        events.emit('coverage', data=self.coverage)
+        if self.coverage['deadline_hit']:
+            logger.warning("⏱️ Deadline reached after %d/%d symbols; %d carried to next scan",
+                           self.coverage['scanned'], self.coverage['total'], len(self.coverage['carried_over']))
         
-        # Sort by percentage change (highest first)
-        qualifying_stocks.sort(key=lambda x: x['change_percent'], reverse=True)
+        # Biggest gappers first, from the state's universe-wide ranking
+        found = {stock['symbol']: stock for stock in qualifying_stocks}
+        qualifying_stocks = [found[ticker] for ticker, _ in state.ranking.top('change_percent') if ticker in found]
+        for stock in qualifying_stocks:
+            stock['percentile'] = state.ranking.percentiles(stock['symbol'])
         
-        print(f"📊 Found {len(qualifying_stocks)} qualifying stocks for pre-market", file=sys.stderr)
+        logger.info("📊 Found %d qualifying stocks for pre-market", len(qualifying_stocks))
         
         return qualifying_stocks
 
 def main():
+    events = event_stream.from_argv()
+    parser = argparse.ArgumentParser(description='Pre-market momentum screener')
+    parser.add_argument('--deadline', type=float, default=Config.SCAN_DEADLINE_SECONDS,
+                        help='Seconds to spend before returning partial results (0 = no limit)')
+    args = parser.parse_args()
+    
+    metrics.start('premarket_screener')
+    tracing.start('premarket_screener')
+    jsonlog.setup('premarket_screener')
     screener = PreMarketScreener()
     
     # Check if we're in pre-market hours
     session = screener.get_current_session()
     if session != 'premarket':
-        print(f"⚠️ Not in pre-market hours (current session: {session})", file=sys.stderr)
+        logger.warning("⚠️ Not in pre-market hours (current session: %s)", session)
     
     # Run screening
-    qualifying_stocks = screener.run_screening()
+    qualifying_stocks = screener.run_screening(events, deadline=args.deadline)
     
     # Output JSON to stdout for Node.js consumption
-    print(json.dumps(qualifying_stocks, indent=2))
+    events.summary(qualifying_stocks)
 
 if __name__ == "__main__":
-    main()
+    scheduler.run(main, 'premarket_screener')
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Symbol priority and time budgets for the screeners
+Each screener keeps a small JSON state file (SCAN_STATE_DIR/<screener>.json)
+with the last change% and relative volume seen per symbol, plus the symbols
+a deadline cut off last cycle. ScanPlan orders the universe so carried-over
+symbols come first, then symbols never seen, then the rest by momentum, and
+stops handing out symbols once the deadline would be overrun. Whatever is
+left is carried to the front of the next cycle.
+
+Every recorded symbol is also kept in a ranking.Ranking (change%, relative
+volume, momentum score), so top movers and a symbol's percentile across the
+whole universe come straight from it without re-sorting.
+"""
+
+import json
+import math
+import os
+import sys
+import time
+
+import metrics
+import ranking
+from config import Config
+
+COVERAGE = metrics.gauge('trading_scan_coverage_ratio', 'Share of the universe screened before the deadline', ('screener',))
+
+def momentum_score(entry):
+    """Higher for bigger up-moves on heavier relative volume"""
+    change = max(entry.get('change_percent') or 0.0, 0.0)
+    volume_ratio = max(entry.get('volume_ratio') or 0.0, 0.0)
+    return change * (1.0 + math.log1p(volume_ratio))
+
+class ScanState:
+    def __init__(self, screener, directory=None):
+        self.screener = screener
+        self.path = os.path.join(directory or Config.SCAN_STATE_DIR, f"{screener}.json")
+        self.symbols = {}
+        self.carry_over = []
+        self.ranking = ranking.Ranking()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            self.symbols = state.get('symbols', {})
+            self.carry_over = state.get('carry_over', [])
+            for symbol, entry in self.symbols.items():
+                self.rank(symbol, entry)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading scan state {self.path}: {e}", file=sys.stderr)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'symbols': self.symbols, 'carry_over': self.carry_over}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing scan state {self.path}: {e}", file=sys.stderr)
+
+    def record(self, symbol, change_percent, volume_ratio=None):
+        self.symbols[symbol] = {
+            'change_percent': float(change_percent),
+            'volume_ratio': float(volume_ratio) if volume_ratio is not None and math.isfinite(volume_ratio) else None,
+            'updated': time.time()
+        }
+        self.rank(symbol, self.symbols[symbol])
+
+    def rank(self, symbol, entry):
+        self.ranking.update(symbol, change_percent=entry.get('change_percent'),
+                            volume_ratio=entry.get('volume_ratio'), score=momentum_score(entry))
+
+    def order(self, universe):
+        """Carried-over symbols, then unseen ones, then the rest by last momentum"""
+        members = set(universe)
+        first = [s for s in dict.fromkeys(self.carry_over) if s in members]
+        seen = set(first)
+        unseen = [s for s in universe if s not in seen and s not in self.symbols]
+        seen.update(unseen)
+        known = [s for s, _ in self.ranking.top('score') if s in members and s not in seen]
+        seen.update(known)
+        # Symbols without a usable score (e.g. a NaN change%) go last
+        return first + unseen + known + [s for s in universe if s not in seen]
+
+class ScanPlan:
+    """
+    Iterates a screener's universe in priority order under an optional deadline
+    (seconds from now; 0/None = no limit), then reports coverage
+    """
+
+    def __init__(self, state, universe, deadline=None):
+        self.state = state
+        self.order = state.order(universe)
+        self.deadline = deadline or 0
+        self.started = time.monotonic()
+        self.ends = self.started + self.deadline if self.deadline > 0 else None
+        self.done = 0
+        self.deadline_hit = False
+
+    def remaining(self):
+        return None if self.ends is None else self.ends - time.monotonic()
+
+    def __iter__(self):
+        for symbol in self.order:
+            if self.ends is not None and self.done:
+                # Don't start a symbol the average so far says won't finish in time
+                average = (time.monotonic() - self.started) / self.done
+                if self.remaining() < average:
+                    self.deadline_hit = True
+                    break
+            elif self.ends is not None and self.remaining() <= 0:
+                self.deadline_hit = True
+                break
+            yield symbol
+            self.done += 1
+
+    def finish(self):
+        """Carry unscreened symbols over, persist state and return coverage stats"""
+        unfinished = self.order[self.done:]
+        self.state.carry_over = unfinished
+        self.state.save()
+
+        total = len(self.order)
+        coverage = self.done / total if total else 1.0
+        COVERAGE.labels(self.state.screener).set(coverage)
+        if unfinished:
+            metrics.SYMBOLS_SKIPPED.labels(self.state.screener, 'deadline').inc(len(unfinished))
+        return {
+            'scanned': self.done,
+            'total': total,
+            'coverage': round(coverage, 4),
+            'deadline_seconds': self.deadline or None,
+            'deadline_hit': self.deadline_hit,
+            'elapsed_seconds': round(time.monotonic() - self.started, 3),
+            'carried_over': unfinished
+        }
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Cross-process job scheduler for entry scripts
+The Node worker can start the same script from several timers in one
+minute (the minute scanner, the monitoring interval, the real-time scans),
+and a scan that overruns its minute overlaps the next tick's copy. Entry
+scripts therefore start through scheduler.run(main, job), which gives:
+
+  single-flight   a run identical to one already in flight (same job, argv
+                  and stdin) waits for it and replays its output instead of
+                  running again; only successful runs are shared, and an
+                  entry whose twin failed or overran exits 1 rather than
+                  placing the same orders again
+  priority        at most SCHEDULER_SLOTS jobs run at once, admitted in
+                  priority order (exits, then entries, then reporting) and
+                  arrival order within a priority; exits never wait for a slot
+  telemetry       queue depth, admission wait and coalesced runs go to the
+                  metrics registry; `scheduler.py status` shows the live queue
+
+State lives in SCHEDULER_DIR as flock'd files, so a crashed process releases
+its slot and single-flight lock automatically. SCHEDULER=0 bypasses it all.
+
+Usage:
+    scheduler.py status      # JSON: running jobs, queued jobs and their waits
+"""
+
+import fcntl
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+
+import metrics
+import profiling
+from config import Config
+
+EXITS, ENTRIES, REPORTING = 0, 1, 2
+PRIORITY_NAMES = {EXITS: 'exits', ENTRIES: 'entries', REPORTING: 'reporting'}
+
+JOB_PRIORITIES = {
+    'monitor_positions': EXITS,
+    'exit_evaluator': EXITS,
+    'close_all_positions': EXITS,
+    'execute_trades': ENTRIES,
+    'premarket_screener': ENTRIES,
+    'market_hours_screener': ENTRIES,
+    'get_positions': REPORTING,
+    'get_account_info': REPORTING,
+    'get_orders': REPORTING,
+    'daily_report': REPORTING,
+    'overnight_snapshot': REPORTING
+}
+
+# Seconds between queue checks while waiting for a slot or an in-flight twin
+POLL_INTERVAL = 0.05
+# Shared results (and their idle locks) older than this are removed
+RESULT_TTL = 86400
+
+QUEUE_DEPTH = metrics.gauge('trading_scheduler_queue_depth', 'Jobs waiting for a slot when this job was admitted', ('priority',))
+WAIT_SECONDS = metrics.histogram('trading_scheduler_wait_seconds', 'Time from arrival to admission', ('job_name', 'priority'))
+COALESCED = metrics.counter('trading_scheduler_coalesced_total', 'Runs answered by an identical in-flight run', ('job_name',))
+
+def enabled():
+    return os.getenv('SCHEDULER', '1') not in ('0', 'false', 'no')
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def write_json(path, data):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def read_entries(directory):
+    """Ticket files in a queue/running directory, dropping ones whose process is gone"""
+    entries = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return entries
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not pid_alive(entry.get('pid', 0)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        entries.append(entry)
+    return entries
+
+def acquire(path, timeout=None):
+    """flock a file exclusively; None if timeout passes first (0 = don't wait)"""
+    f = open(path, 'a+')
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return f
+        except BlockingIOError:
+            if deadline is not None and time.monotonic() >= deadline:
+                f.close()
+                return None
+            time.sleep(POLL_INTERVAL)
+
+class Tee(io.TextIOBase):
+    """Passes writes through to a stream while keeping a copy"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    def write(self, text):
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+class Scheduler:
+    def __init__(self, directory=None, slots=None):
+        self.directory = directory or Config.SCHEDULER_DIR
+        self.slots = max(1, slots or Config.SCHEDULER_SLOTS)
+        self.queue_dir = os.path.join(self.directory, 'queue')
+        self.running_dir = os.path.join(self.directory, 'running')
+        os.makedirs(self.queue_dir, exist_ok=True)
+        os.makedirs(self.running_dir, exist_ok=True)
+
+    def flight_key(self, job, argv, stdin_data):
+        digest = hashlib.sha1(json.dumps([job, argv]).encode())
+        digest.update(stdin_data.encode())
+        return f"{job}-{digest.hexdigest()[:16]}"
+
+    def admit(self, job, priority, arrived):
+        """Wait for a slot in (priority, arrival) order; returns the held slot file or None for exits"""
+        ticket = {'job': job, 'priority': priority, 'arrived': arrived, 'pid': os.getpid()}
+        ticket_path = os.path.join(self.queue_dir, f"{os.getpid()}.json")
+        write_json(ticket_path, ticket)
+        try:
+            while True:
+                queue = sorted(read_entries(self.queue_dir), key=lambda t: (t['priority'], t['arrived'], t['pid']))
+                if priority == EXITS or (queue and queue[0]['pid'] == os.getpid()):
+                    QUEUE_DEPTH.labels(PRIORITY_NAMES[priority]).set(len(queue) - 1)
+                    if priority == EXITS:
+                        return None
+                    for slot in range(self.slots):
+                        held = acquire(os.path.join(self.directory, f"slot-{slot}.lock"), timeout=0)
+                        if held:
+                            return held
+                time.sleep(POLL_INTERVAL)
+        finally:
+            try:
+                os.remove(ticket_path)
+            except OSError:
+                pass
+
+    def replay(self, result_path, arrived):
+        """Output of an identical run that finished after we arrived, if it succeeded"""
+        try:
+            with open(result_path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if result.get('code') != 0 or result.get('finished', 0) < arrived:
+            return None
+        return result
+
+    def prune(self):
+        cutoff = time.time() - RESULT_TTL
+        for name in os.listdir(self.directory):
+            if not name.endswith(('.result.json', '.lock')) or name.startswith('slot-'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if name.endswith('.lock'):
+                    held = acquire(path, timeout=0)
+                    if held is None:
+                        continue
+                    os.remove(path)
+                    held.close()
+                else:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def run(self, main, job, reads_stdin=False):
+        arrived = time.time()
+        priority = JOB_PRIORITIES.get(job, REPORTING)
+        argv = [arg for arg in sys.argv[1:] if arg != '--profile']
+        # Input is part of the job's identity; only read it from scripts that take
+        # it (Node leaves stdin open otherwise)
+        stdin_data = ''
+        if reads_stdin:
+            stdin_data = sys.stdin.read()
+            sys.stdin = io.StringIO(stdin_data)
+
+        key = self.flight_key(job, argv, stdin_data)
+        result_path = os.path.join(self.directory, f"{key}.result.json")
+        flight = acquire(os.path.join(self.directory, f"{key}.lock"), timeout=0)
+        if flight is None:
+            # An identical run is in flight: wait for it and reuse its output
+            flight = acquire(os.path.join(self.directory, f"{key}.lock"), timeout=Config.SCHEDULER_COALESCE_TIMEOUT)
+            result = self.replay(result_path, arrived)
+            if result is not None:
+                COALESCED.labels(job).inc()
+                metrics.REGISTRY.job = job
+                metrics.REGISTRY.dump(os.path.join(Config.METRICS_DIR, f"{job}.coalesced.prom"))
+                print(f"🔁 {job}: reusing in-flight run from pid {result['pid']}", file=sys.stderr)
+                sys.stdout.write(result['stdout'])
+                sys.stdout.flush()
+                return
+            if priority == ENTRIES:
+                # The twin may have submitted orders before it failed or overran; running
+                # this input again could submit them twice
+                if flight:
+                    flight.close()
+                reason = 'failed' if flight else f"still running after {Config.SCHEDULER_COALESCE_TIMEOUT:g}s"
+                print(f"❌ {job}: identical in-flight run {reason}; not re-executing", file=sys.stderr)
+                sys.exit(1)
+
+        slot = self.admit(job, priority, arrived)
+        WAIT_SECONDS.labels(job, PRIORITY_NAMES[priority]).observe(time.time() - arrived)
+
+        running_path = os.path.join(self.running_dir, f"{os.getpid()}.json")
+        write_json(running_path, {'job': job, 'priority': priority, 'arrived': arrived,
+                                  'started': time.time(), 'pid': os.getpid()})
+        tee = Tee(sys.stdout)
+        sys.stdout = tee
+        code = 1
+        try:
+            profiling.run(main, job)
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            raise
+        finally:
+            sys.stdout = tee.stream
+            try:
+                write_json(result_path, {'job': job, 'pid': os.getpid(), 'code': code,
+                                         'finished': time.time(), 'stdout': tee.copy.getvalue()})
+                os.remove(running_path)
+            except OSError as e:
+                print(f"Error recording {job} result: {e}", file=sys.stderr)
+            if slot:
+                slot.close()
+            if flight:
+                flight.close()
+            self.prune()
+
+    def status(self):
+        now = time.time()
+        queue = sorted(read_entries(self.queue_dir), key=lambda t: (t['priority'], t['arrived']))
+        running = sorted(read_entries(self.running_dir), key=lambda t: t['started'])
+        for entry in queue:
+            entry['waiting_seconds'] = round(now - entry['arrived'], 3)
+        for entry in running:
+            entry['running_seconds'] = round(now - entry['started'], 3)
+            entry['waited_seconds'] = round(entry['started'] - entry['arrived'], 3)
+        for entry in queue + running:
+            entry['priority'] = PRIORITY_NAMES.get(entry['priority'], entry['priority'])
+        return {
+            'slots': self.slots,
+            'queue_depth': len(queue),
+            'oldest_wait_seconds': max((e['waiting_seconds'] for e in queue), default=0),
+            'running': running,
+            'queued': queue
+        }
+
+def run(main, job, reads_stdin=False):
+    """Run an entry point through the scheduler (profiled when enabled)"""
+    if not enabled():
+        return profiling.run(main, job)
+    try:
+        scheduler = Scheduler()
+    except OSError as e:
+        print(f"⚠️ Scheduler unavailable ({e}); running {job} directly", file=sys.stderr)
+        return profiling.run(main, job)
+    return scheduler.run(main, job, reads_stdin)
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] != 'status':
+        print("Usage: scheduler.py status", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(Scheduler().status(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import math
+
+import numpy as np
+import pytest
+
+from bar_stream import CLOSE, TIMESTAMP, VOLUME, BarAggregator, BarStore
+
+M = 1_760_000_000 // 60 * 60
+
+def trade(ts, price, size=100):
+    return {'type': 'trade', 'symbol': 'AAA', 'timestamp': ts, 'price': price, 'size': size}
+
+def bar(ts, open_, high, low, close, volume):
+    return {'type': 'bar', 'symbol': 'AAA', 'timestamp': ts, 'open': open_, 'high': high,
+            'low': low, 'close': close, 'volume': volume}
+
+@pytest.fixture
+def aggregator(tmp_path):
+    store = BarStore.create(str(tmp_path / 'bars.dat'), slots=4, capacity=8)
+    aggregator = BarAggregator(store)
+    aggregator.subscribe(['AAA'])
+    return aggregator
+
+def rows(aggregator):
+    return aggregator.store.window('AAA').T.tolist()
+
+def test_trades_build_the_partial_bar(aggregator):
+    aggregator.on_event(trade(M + 1, 10.0))
+    aggregator.on_event(trade(M + 20, 10.5))
+    aggregator.on_event(trade(M + 40, 9.8, 50))
+
+    assert rows(aggregator) == []
+    assert aggregator.store.latest('AAA') == {'timestamp': M, 'open': 10.0, 'high': 10.5, 'low': 9.8,
+                                              'close': 9.8, 'volume': 250.0}
+
+def test_next_minute_trade_commits_the_partial(aggregator):
+    aggregator.on_event(trade(M + 1, 10.0))
+    aggregator.on_event(trade(M + 61, 11.0))
+
+    assert rows(aggregator) == [[M, 10.0, 10.0, 10.0, 10.0, 100.0]]
+    assert aggregator.store.latest('AAA')['timestamp'] == M + 60
+
+def test_feed_bar_after_next_minute_trade_replaces_trade_built_bar(aggregator):
+    aggregator.on_event(trade(M + 1, 10.0))
+    aggregator.on_event(trade(M + 61, 11.0))
+    aggregator.on_event(bar(M, 10.0, 10.8, 9.9, 10.6, 5000))
+
+    assert rows(aggregator) == [[M, 10.0, 10.8, 9.9, 10.6, 5000.0]]
+    # The in-progress minute is untouched
+    assert aggregator.store.latest('AAA')['close'] == 11.0
+
+def test_feed_bar_for_the_partial_minute_supersedes_it(aggregator):
+    aggregator.on_event(trade(M + 1, 10.0))
+    aggregator.on_event(bar(M, 10.0, 10.8, 9.9, 10.6, 5000))
+
+    assert rows(aggregator) == [[M, 10.0, 10.8, 9.9, 10.6, 5000.0]]
+    assert aggregator.store.latest('AAA') is None
+
+def test_feed_bar_for_a_quiet_minute_keeps_the_next_partial(aggregator):
+    aggregator.on_event(trade(M + 61, 11.0))
+    aggregator.on_event(bar(M, 10.0, 10.8, 9.9, 10.6, 5000))
+
+    assert rows(aggregator) == [[M, 10.0, 10.8, 9.9, 10.6, 5000.0]]
+    assert aggregator.store.latest('AAA')['timestamp'] == M + 60
+
+def test_events_for_older_minutes_are_late(aggregator):
+    aggregator.on_event(trade(M + 1, 10.0))
+    aggregator.on_event(trade(M + 121, 12.0))
+    aggregator.on_event(trade(M + 5, 99.0))
+    aggregator.on_event(bar(M - 60, 1, 1, 1, 1, 1))
+    aggregator.on_event(trade(M + 61, 99.0))
+
+    assert rows(aggregator) == [[M, 10.0, 10.0, 10.0, 10.0, 100.0]]
+    assert aggregator.store.latest('AAA')['close'] == 12.0
+
+def test_flush_commits_quiet_minutes_after_the_grace_period(aggregator):
+    aggregator.on_event(trade(M + 1, 10.0))
+
+    aggregator.flush(M + 60)
+    assert rows(aggregator) == []
+    aggregator.flush(M + 65)
+    assert rows(aggregator) == [[M, 10.0, 10.0, 10.0, 10.0, 100.0]]
+    assert aggregator.store.latest('AAA') is None
+
+def test_window_stays_contiguous_across_the_ring_wrap(aggregator):
+    for i in range(12):
+        aggregator.on_event(bar(M + 60 * i, i, i, i, i, i))
+
+    window = aggregator.store.window('AAA')
+    assert window.shape == (6, 8)
+    assert window[TIMESTAMP].tolist() == [M + 60 * i for i in range(4, 12)]
+    assert window[CLOSE].tolist() == list(map(float, range(4, 12)))
+
+def test_replace_last_after_wrap_overwrites_the_newest_row(aggregator):
+    for i in range(9):
+        aggregator.on_event(trade(M + 60 * i + 1, float(i)))
+    aggregator.on_event(bar(M + 60 * 7, 7, 7, 7, 7, 777))
+
+    window = aggregator.store.window('AAA')
+    assert window[TIMESTAMP, -1] == M + 60 * 7
+    assert window[VOLUME, -1] == 777.0
+    assert window[VOLUME, -2] == 100.0
+
+def test_seed_skips_minutes_already_committed(aggregator):
+    import pandas as pd
+    index = pd.to_datetime([M, M + 60, M + 120], unit='s', utc=True)
+    frame = pd.DataFrame({'Open': [1.0, 2.0, 3.0], 'High': [1.0, 2.0, 3.0], 'Low': [1.0, 2.0, 3.0],
+                          'Close': [1.0, math.nan, 3.0], 'Volume': [10.0, 20.0, 30.0]}, index=index)
+    aggregator.seed('AAA', frame)
+    aggregator.seed('AAA', frame)
+
+    assert np.asarray(rows(aggregator))[:, TIMESTAMP].tolist() == [M, M + 120]
@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+
+import daily_stats
+from daily_stats import RunningDailyStats
+
+@pytest.fixture
+def today(monkeypatch):
+    current = {'day': date(2026, 10, 19)}
+    monkeypatch.setattr(daily_stats, 'market_today', lambda: current['day'])
+    return current
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / 'daily_stats.json')
+
+def fill(action, day='2026-10-19', **extra):
+    return dict({'symbol': 'AAA', 'action': action, 'shares': 10, 'price': 2.0, 'date': day}, **extra)
+
+def test_sells_update_pnl_aggregates(today, checkpoint):
+    stats = RunningDailyStats(checkpoint)
+    stats.record([fill('BUY'), fill('SELL', pnl=5.0), fill('SELL', pnl=-2.0), fill('SELL', pnl=0.0)])
+
+    snapshot = stats.snapshot()
+    assert (snapshot['fills'], snapshot['buys'], snapshot['sells']) == (4, 1, 3)
+    assert (snapshot['winningTrades'], snapshot['losingTrades']) == (1, 1)
+    assert snapshot['totalPnL'] == 3.0
+    assert (snapshot['maxWin'], snapshot['maxLoss']) == (5.0, -2.0)
+    assert snapshot['pnlBySymbol'] == {'AAA': 3.0}
+    assert snapshot['volume'] == 80.0
+
+def test_checkpoint_is_shared_across_instances(today, checkpoint):
+    RunningDailyStats(checkpoint).record([fill('BUY')])
+    RunningDailyStats(checkpoint).record([fill('SELL', pnl=1.0)])
+
+    assert RunningDailyStats(checkpoint).snapshot()['fills'] == 2
+
+def test_new_market_day_starts_from_zero(today, checkpoint):
+    RunningDailyStats(checkpoint).record([fill('SELL', pnl=4.0)])
+
+    today['day'] = date(2026, 10, 20)
+    stats = RunningDailyStats(checkpoint)
+    assert stats.snapshot()['date'] == '2026-10-20'
+    assert stats.snapshot()['fills'] == 0
+
+    stats.record([fill('BUY', day='2026-10-20')])
+    assert RunningDailyStats(checkpoint).snapshot()['fills'] == 1
+
+def test_fill_for_a_later_day_rolls_over(today, checkpoint):
+    stats = RunningDailyStats(checkpoint)
+    stats.record([fill('SELL', pnl=4.0), fill('BUY', day='2026-10-20')])
+
+    snapshot = stats.snapshot()
+    assert snapshot['date'] == '2026-10-20'
+    assert (snapshot['fills'], snapshot['totalPnL']) == (1, 0.0)
+
+def test_fills_from_earlier_days_are_ignored(today, checkpoint):
+    stats = RunningDailyStats(checkpoint)
+
+    assert stats.record([fill('SELL', day='2026-10-16', pnl=4.0)]) == 0
+    assert stats.snapshot()['fills'] == 0
+
+def test_each_order_counts_once(today, checkpoint):
+    RunningDailyStats(checkpoint).record([fill('BUY', order_id='a')])
+    applied = RunningDailyStats(checkpoint).record([fill('BUY', order_id='a'), fill('SELL', order_id='b', pnl=1.0)])
+
+    assert applied == 1
+    assert RunningDailyStats(checkpoint).snapshot()['fills'] == 2
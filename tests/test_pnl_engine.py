@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from pnl_engine import compute_day, fills_from_orders, market_date, match_fifo
+
+def arrays(*fills):
+    side = np.array([1 if s == 'buy' else -1 for s, _, _ in fills], dtype=np.int8)
+    qty = np.array([q for _, q, _ in fills], dtype=float)
+    price = np.array([p for _, _, p in fills], dtype=float)
+    return side, qty, price
+
+def test_sell_matches_oldest_lots_first():
+    realized, lots, unmatched = match_fifo([], *arrays(('buy', 10, 1.0), ('buy', 10, 2.0), ('sell', 15, 3.0)))
+
+    # 10 @ 1.0 and 5 @ 2.0 against 15 @ 3.0
+    assert realized.tolist() == pytest.approx([0.0, 0.0, 25.0])
+    assert lots == [[5.0, 2.0]]
+    assert unmatched == 0.0
+
+def test_open_lots_carried_in_are_matched_before_new_buys():
+    realized, lots, _ = match_fifo([[4.0, 5.0]], *arrays(('buy', 4, 6.0), ('sell', 6, 7.0)))
+
+    assert realized[-1] == pytest.approx(4 * 2.0 + 2 * 1.0)
+    assert lots == [[2.0, 6.0]]
+
+def test_sells_beyond_held_shares_are_unmatched():
+    realized, lots, unmatched = match_fifo([], *arrays(('buy', 5, 10.0), ('sell', 8, 9.0)))
+
+    assert realized[-1] == pytest.approx(-5.0)
+    assert lots == []
+    assert unmatched == 3.0
+
+def test_several_sells_each_take_their_own_basis():
+    realized, lots, _ = match_fifo([], *arrays(('buy', 5, 1.0), ('buy', 5, 3.0), ('sell', 5, 2.0), ('sell', 5, 2.0)))
+
+    assert realized.tolist() == pytest.approx([0.0, 0.0, 5.0, -5.0])
+    assert lots == []
+
+def order(order_id, symbol, side, qty, price, filled_at):
+    return SimpleNamespace(id=order_id, symbol=symbol, side=side, filled_qty=qty,
+                           filled_avg_price=price, filled_at=filled_at)
+
+def test_fills_bucket_on_the_eastern_day():
+    # 00:30 UTC on the 20th is still the evening of the 19th in New York
+    late = datetime(2026, 10, 20, 0, 30, tzinfo=timezone.utc)
+
+    assert market_date(late).isoformat() == '2026-10-19'
+    assert fills_from_orders([order('a', 'AAA', 'buy', 1, 1.0, late)])['date'].tolist() == ['2026-10-19']
+
+def test_compute_day_carries_lots_and_splits_pnl_by_symbol():
+    day = datetime(2026, 10, 19, 15, tzinfo=timezone.utc)
+    fills = fills_from_orders([
+        order('a', 'AAA', 'buy', 10, 1.0, day),
+        order('b', 'BBB', 'sell', 5, 4.0, day.replace(hour=16)),
+        order('c', 'AAA', 'sell', 4, 2.0, day.replace(hour=17)),
+        order('d', 'AAA', 'buy', 1, 9.0, day.replace(day=20))
+    ])
+
+    stats = compute_day('2026-10-19', fills, {'BBB': [[5.0, 3.0]]})
+
+    assert stats['fills'] == 3
+    assert (stats['buy_fills'], stats['sell_fills']) == (1, 2)
+    assert stats['by_symbol'] == pytest.approx({'AAA': 4.0, 'BBB': 5.0})
+    assert stats['realized_pnl'] == pytest.approx(9.0)
+    assert stats['winning_sells'] == 2
+    assert stats['open_lots'] == {'AAA': [[6.0, 1.0]]}
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from ranking import Ranking, RankTree
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(7)
+
+def test_tree_matches_a_sorted_list_through_inserts_and_removes():
+    tree, keys = RankTree(), []
+    rng = random.Random(1)
+    for step in range(2000):
+        if keys and rng.random() < 0.4:
+            key = keys.pop(rng.randrange(len(keys)))
+            tree.remove(key)
+        else:
+            key = (rng.random(), f"S{step}")
+            tree.insert(key)
+            keys.append(key)
+    keys.sort()
+
+    assert len(tree) == len(keys)
+    assert [tree.select(i) for i in range(len(keys))] == keys
+    assert list(tree.descending()) == keys[::-1]
+    for i in range(0, len(keys), 37):
+        assert tree.count_below(keys[i]) == i
+
+def test_select_past_the_end_raises():
+    tree = RankTree()
+    tree.insert((1.0, 'AAA'))
+
+    with pytest.raises(IndexError):
+        tree.select(1)
+
+def test_update_moves_a_symbol_and_none_unranks_it():
+    ranking = Ranking()
+    ranking.update('AAA', change_percent=5.0)
+    ranking.update('BBB', change_percent=10.0)
+    ranking.update('CCC', change_percent=1.0)
+
+    assert ranking.top('change_percent', 2) == [('BBB', 10.0), ('AAA', 5.0)]
+    assert ranking.rank('change_percent', 'CCC') == 3
+
+    ranking.update('CCC', change_percent=20.0)
+    ranking.update('BBB', change_percent=float('nan'))
+
+    assert ranking.top('change_percent') == [('CCC', 20.0), ('AAA', 5.0)]
+    assert ranking.rank('change_percent', 'BBB') is None
+    assert ranking.value('change_percent', 'BBB') is None
+
+def test_percentile_counts_ties_as_neither_above_nor_below():
+    ranking = Ranking()
+    for symbol, value in (('AAA', 1.0), ('BBB', 2.0), ('CCC', 2.0), ('DDD', 3.0), ('EEE', 4.0)):
+        ranking.update(symbol, score=value)
+
+    assert ranking.percentile('score', 'AAA') == 0.0
+    assert ranking.percentile('score', 'BBB') == ranking.percentile('score', 'CCC') == 25.0
+    assert ranking.percentile('score', 'EEE') == 100.0
+    assert ranking.percentile('volume_ratio', 'EEE') is None
+
+def test_single_symbol_is_the_top_percentile():
+    ranking = Ranking()
+    ranking.update('AAA', volume_ratio=2.0)
+
+    assert ranking.percentile('volume_ratio', 'AAA') == 100.0
+    assert len(ranking) == 1
+
+def test_remove_drops_every_metric():
+    ranking = Ranking()
+    ranking.update('AAA', change_percent=1.0, volume_ratio=2.0, score=3.0)
+    ranking.update('BBB', change_percent=2.0)
+    ranking.remove('AAA')
+
+    assert len(ranking) == 1
+    assert all(len(tree) == 0 for metric, tree in ranking.trees.items() if metric != 'change_percent')
@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+import pytest
+
+from risk_engine import RiskEngine
+
+@pytest.fixture
+def engine(tmp_path):
+    risk = RiskEngine(state_file=str(tmp_path / 'risk_state.json'), max_positions=3,
+                      max_symbol_pct=10, max_symbol_notional=0, ttl=60)
+    risk.buying_power = 10000.0
+    risk.equity = 10000.0
+    risk.synced_at = time.time()
+    return risk
+
+def test_symbol_cap_counts_held_and_pending(engine):
+    engine.exposure = {'AAA': 600.0}
+    engine.pending = {'AAA': 200.0}
+
+    qty, reasons = engine.validate_batch(['AAA', 'BBB'], [100, 100], [10.0, 10.0])
+
+    assert list(qty) == [20, 100]
+    assert list(reasons) == ['symbol_cap', '']
+
+def test_max_positions_rejects_new_symbols_only(engine):
+    engine.exposure = {'AAA': 100.0, 'BBB': 100.0}
+
+    qty, reasons = engine.validate_batch(['CCC', 'DDD', 'AAA'], [10, 10, 10], [5.0, 5.0, 5.0])
+
+    assert list(qty) == [10, 0, 10]
+    assert list(reasons) == ['', 'max_positions', '']
+
+def test_buying_power_skips_orders_that_do_not_fit(engine):
+    engine.buying_power = 1000.0
+
+    qty, reasons = engine.validate_batch(['AAA', 'BBB', 'CCC'], [80, 50, 20], [10.0, 10.0, 10.0])
+
+    assert list(qty) == [80, 0, 20]
+    assert list(reasons) == ['', 'buying_power', '']
+
+def test_zero_quantity_is_flagged(engine):
+    qty, reasons = engine.validate_batch(['AAA'], [0], [10.0])
+
+    assert list(qty) == [0]
+    assert list(reasons) == ['zero_shares']
+
+def test_size_batch_rejects_missing_and_zero_prices(engine):
+    sized = engine.size_batch([{'symbol': 'AAA', 'price': 10.0}, {'symbol': 'BBB', 'price': 0},
+                               {'symbol': 'CCC', 'price': None}, {'symbol': 'DDD', 'price': float('nan')}])
+
+    assert sized['AAA']['shares'] == 100
+    for symbol in ('BBB', 'CCC', 'DDD'):
+        assert sized[symbol]['shares'] == 0
+        assert sized[symbol]['risk_reason'] == 'no_price'
+
+def buy(order_id, symbol='AAA', shares=10, price=10.0, at=None):
+    return {'order_id': order_id, 'symbol': symbol, 'action': 'BUY', 'shares': shares,
+            'price': price, 'time': at if at is not None else time.time()}
+
+def test_filled_buy_moves_from_pending_to_exposure(engine):
+    with engine.locked():
+        engine.save_state()
+    engine.record_order('AAA', 10, 10.0)
+
+    assert engine.record_fills([buy('o1', price=10.2)]) == 1
+
+    assert engine.pending == {}
+    assert engine.exposure == {'AAA': 102.0}
+    assert engine.open_position_count() == 1
+
+def test_partial_fill_keeps_the_rest_pending_while_working(engine):
+    with engine.locked():
+        engine.save_state()
+    engine.record_order('AAA', 20, 10.0)
+
+    engine.record_fills([buy('o1', shares=5)], working={'AAA'})
+
+    assert engine.pending == {'AAA': 150.0}
+    assert engine.exposure == {'AAA': 50.0}
+
+def test_fills_are_applied_once_and_not_before_the_last_sync(engine):
+    with engine.locked():
+        engine.save_state()
+    engine.record_order('AAA', 10, 10.0)
+
+    assert engine.record_fills([buy('o1')]) == 1
+    assert engine.record_fills([buy('o1')]) == 0
+    # Positions from a sync after the fill already include it
+    assert engine.record_fills([buy('o2', symbol='BBB', at=engine.synced_at - 1)]) == 0
+
+    assert RiskEngine(state_file=engine.state_file).exposure == {'AAA': 100.0}
+
+def test_validate_batch_accepts_numpy_inputs(engine):
+    qty, reasons = engine.validate_batch(np.array(['AAA']), np.array([5]), np.array([10.0]))
+
+    assert qty.dtype == np.int64
+    assert list(qty) == [5]
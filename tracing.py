@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Lightweight span tracing for the screening-to-execution pipeline
+Spans nest through contextvars (parent/child), carry attributes such as
+symbol, bar count and HTTP status, and are exported as Chrome trace-event
+JSON (chrome://tracing, Perfetto, speedscope) under TRACE_DIR.
+
+The Node worker starts a trace per tick and passes it to every script it
+spawns in the W3C TRACEPARENT env var, so the screener, pattern scoring,
+executor and broker calls of one minute tick share a trace id. With no
+TRACEPARENT and TRACING unset, span() is a no-op.
+
+Usage:
+    tracing.py merge TRACE_ID     # combine every process's file for a trace
+"""
+
+import atexit
+import contextvars
+import functools
+import glob
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+
+from config import Config
+
+current_span = contextvars.ContextVar('current_span', default=None)
+
+def parse_traceparent(value):
+    """'00-<trace_id>-<parent_span_id>-<flags>' -> (trace_id, parent_span_id)"""
+    try:
+        version, trace_id, parent_id, flags = value.strip().split('-')
+        if len(trace_id) == 32 and len(parent_id) == 16:
+            return trace_id, parent_id
+    except (AttributeError, ValueError):
+        pass
+    return None, None
+
+class Span:
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id', 'attributes',
+                 'start_ns', 'end_ns', 'thread', 'token')
+
+    def __init__(self, tracer, name, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = tracer.trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.thread = threading.get_ident()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self):
+        self.token = current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        current_span.reset(self.token)
+        if exc_type is not None:
+            self.attributes['error'] = f"{exc_type.__name__}: {exc}"
+        self.tracer.finish(self)
+        return False
+
+    def to_event(self, pid):
+        args = {'span_id': self.span_id, 'parent_id': self.parent_id, 'trace_id': self.trace_id}
+        args.update(self.attributes)
+        return {
+            'name': self.name,
+            'cat': self.tracer.service,
+            'ph': 'X',
+            'ts': self.start_ns / 1000,
+            'dur': (self.end_ns - self.start_ns) / 1000,
+            'pid': pid,
+            'tid': self.thread,
+            'args': args
+        }
+
+class NoopSpan:
+    def set(self, **attributes):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NOOP_SPAN = NoopSpan()
+
+class Tracer:
+    def __init__(self):
+        self.trace_id, self.root_parent = parse_traceparent(os.getenv('TRACEPARENT'))
+        self.enabled = self.trace_id is not None or bool(os.getenv('TRACING'))
+        if self.enabled and self.trace_id is None:
+            self.trace_id = secrets.token_hex(16)
+        self.service = 'python'
+        self.spans = []
+        self.lock = threading.Lock()
+        self.exporting = False
+
+    def span(self, name, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = current_span.get()
+        return Span(self, name, parent.span_id if parent else self.root_parent, attributes)
+
+    def finish(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def path(self):
+        return os.path.join(Config.TRACE_DIR, f"{self.trace_id}-{self.service}-{os.getpid()}.json")
+
+    def export(self):
+        """Write this process's spans as a Chrome trace-event file"""
+        if not self.enabled or not self.spans:
+            return None
+        pid = os.getpid()
+        with self.lock:
+            events = [span.to_event(pid) for span in self.spans]
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f"{self.service} ({pid})"}})
+
+        path = self.path()
+        try:
+            os.makedirs(Config.TRACE_DIR, exist_ok=True)
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                           'otherData': {'trace_id': self.trace_id}}, f, default=str)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            print(f"Error writing trace {self.trace_id}: {e}", file=sys.stderr)
+            return None
+        return path
+
+TRACER = Tracer()
+
+def span(name, **attributes):
+    """Context manager for a child of the current span (no-op when tracing is off)"""
+    return TRACER.span(name, **attributes)
+
+def current():
+    """The active span, for adding attributes from inside a traced function"""
+    return current_span.get() or NOOP_SPAN
+
+def traced(name):
+    """Decorator: run the function inside a span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def wrap(fn):
+    """Carry the caller's span into a pool thread"""
+    if not TRACER.enabled:
+        return fn
+    parent = current_span.get()
+
+    def run(*args, **kwargs):
+        current_span.set(parent)
+        return fn(*args, **kwargs)
+    # A Context can only be entered by one thread at a time, so every call gets its own copy
+    return lambda *args, **kwargs: contextvars.copy_context().run(run, *args, **kwargs)
+
+def trace_id():
+    return TRACER.trace_id if TRACER.enabled else None
+
+def start(service):
+    """Name this process in the trace and export its spans at exit"""
+    TRACER.service = service
+    if TRACER.enabled and not TRACER.exporting:
+        TRACER.exporting = True
+        atexit.register(TRACER.export)
+
+def merge(trace):
+    """Combine the per-process files of one trace into a single trace-event file"""
+    paths = sorted(p for p in glob.glob(os.path.join(Config.TRACE_DIR, f"{trace}-*.json")))
+    events = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                events.extend(json.load(f).get('traceEvents', []))
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {e}", file=sys.stderr)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'trace_id': trace, 'files': len(paths)}}
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] != 'merge':
+        print("Usage: tracing.py merge TRACE_ID", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(merge(sys.argv[2])))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Trade journal backed by SQLite (WAL mode)
+Replaces the append-only trade_log.csv with an indexed store so range and
+per-day queries only touch the rows they need.
+
+Usage:
+    trade_journal.py trades [--start DATE] [--end DATE] [--symbol SYM]
+    trade_journal.py daily-stats [--date DATE] [--days 30]
+    trade_journal.py migrate [--csv trade_log.csv] [--force]
+    trade_journal.py export
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+from config import Config
+from pnl_engine import market_date, market_today
+
+COLUMNS = ('timestamp', 'date', 'symbol', 'action', 'shares', 'price', 'value', 'stop_loss',
+           'take_profit', 'change_pct', 'volume', 'pnl', 'reason', 'session', 'order_id')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    date TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    action TEXT NOT NULL,
+    shares REAL,
+    price REAL,
+    value REAL,
+    stop_loss REAL,
+    take_profit REAL,
+    change_pct REAL,
+    volume REAL,
+    pnl REAL,
+    reason TEXT,
+    session TEXT,
+    order_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trades_date ON trades (date);
+CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades (symbol, timestamp);
+"""
+
+class TradeJournal:
+    def __init__(self, db_path=None, legacy_csv=None):
+        self.db_path = db_path or Config.TRADE_JOURNAL_DB
+        is_new = not os.path.exists(self.db_path)
+
+        # Exits are journaled from worker threads, so share the connection under a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+        # First run: carry over the legacy CSV log
+        legacy_csv = legacy_csv or Config.TRADE_LOG_CSV
+        if is_new and os.path.exists(legacy_csv):
+            imported = self.import_csv(legacy_csv)
+            print(f"📥 Migrated {imported} trades from {legacy_csv}", file=sys.stderr)
+
+    def close(self):
+        self.conn.close()
+
+    def normalize(self, trade):
+        """Fill derived columns (date, value, pnl) for a trade dict"""
+        row = {column: trade.get(column) for column in COLUMNS}
+        row['timestamp'] = row['timestamp'] or datetime.now(timezone.utc).isoformat()
+        row['date'] = row['date'] or trade_date(row['timestamp'])
+        row['action'] = str(row['action']).upper()
+
+        if row['value'] is None and row['shares'] is not None and row['price'] is not None:
+            row['value'] = row['shares'] * row['price']
+
+        if row['action'] == 'SELL' and row['pnl'] is None and row['price'] is not None:
+            buy = self.last_buy(row['symbol'], row['timestamp'])
+            if buy is not None and row['shares'] is not None:
+                row['pnl'] = (row['price'] - buy['price']) * row['shares']
+
+        return row
+
+    def append(self, trade):
+        return self.append_many([trade])
+
+    def append_many(self, trades):
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        sql = f"INSERT INTO trades ({', '.join(COLUMNS)}) VALUES ({placeholders})"
+        rows = []
+        with self.lock, self.conn:
+            # Row by row so a SELL can be matched against a BUY earlier in the same batch
+            for trade in trades:
+                row = self.normalize(trade)
+                self.conn.execute(sql, tuple(row[c] for c in COLUMNS))
+                rows.append(row)
+
+        return len(rows)
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM trades').fetchone()[0]
+
+    def last_buy(self, symbol, before):
+        return self.conn.execute(
+            "SELECT * FROM trades WHERE symbol = ? AND action = 'BUY' AND timestamp < ? "
+            "ORDER BY timestamp DESC LIMIT 1",
+            (symbol, before)
+        ).fetchone()
+
+    def query_range(self, start=None, end=None, symbol=None):
+        """Trades with start <= date <= end (ISO dates), oldest first"""
+        clauses, params = [], []
+        if start:
+            clauses.append('date >= ?')
+            params.append(start)
+        if end:
+            clauses.append('date <= ?')
+            params.append(end)
+        if symbol:
+            clauses.append('symbol = ?')
+            params.append(symbol)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return [dict(row) for row in self.conn.execute(
+            f"SELECT * FROM trades {where} ORDER BY timestamp, id", params
+        )]
+
+    def daily_stats(self, start=None, end=None):
+        """Per-day aggregates over closed trades (SELLs) plus total volume"""
+        clauses, params = [], []
+        if start:
+            clauses.append('date >= ?')
+            params.append(start)
+        if end:
+            clauses.append('date <= ?')
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        rows = self.conn.execute(f"""
+            SELECT date,
+                   SUM(action = 'SELL') AS total_trades,
+                   SUM(action = 'SELL' AND pnl > 0) AS winning_trades,
+                   SUM(action = 'SELL' AND pnl < 0) AS losing_trades,
+                   COALESCE(SUM(CASE WHEN action = 'SELL' THEN pnl END), 0) AS total_pnl,
+                   AVG(CASE WHEN action = 'SELL' AND pnl > 0 THEN pnl END) AS avg_win,
+                   AVG(CASE WHEN action = 'SELL' AND pnl < 0 THEN pnl END) AS avg_loss,
+                   COALESCE(SUM(value), 0) AS volume
+            FROM trades {where}
+            GROUP BY date
+            ORDER BY date
+        """, params)
+
+        stats = []
+        for row in rows:
+            total = row['total_trades'] or 0
+            stats.append({
+                'date': row['date'],
+                'totalTrades': total,
+                'winningTrades': row['winning_trades'] or 0,
+                'losingTrades': row['losing_trades'] or 0,
+                'winRate': (row['winning_trades'] or 0) / total * 100 if total else 0,
+                'totalPnL': row['total_pnl'],
+                'avgWin': row['avg_win'] or 0,
+                'avgLoss': row['avg_loss'] or 0,
+                'volume': row['volume']
+            })
+        return stats
+
+    def day_stats(self, date):
+        stats = self.daily_stats(date, date)
+        if stats:
+            return stats[0]
+        return {'date': date, 'totalTrades': 0, 'winningTrades': 0, 'losingTrades': 0, 'winRate': 0,
+                'totalPnL': 0, 'avgWin': 0, 'avgLoss': 0, 'volume': 0}
+
+    def import_csv(self, path):
+        """Import the legacy trade_log.csv, including rows glued together by a literal '\\n'"""
+        with open(path, newline='') as f:
+            text = f.read().replace('\\n', '\n')
+
+        trades = []
+        for values in csv.reader(io.StringIO(text)):
+            if not values or values[0] == 'timestamp':
+                continue
+            trade = parse_legacy_row(values)
+            if trade:
+                trades.append(trade)
+
+        return self.append_many(trades)
+
+    def export_csv(self, out):
+        writer = csv.writer(out)
+        writer.writerow(COLUMNS)
+        for row in self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM trades ORDER BY timestamp, id"):
+            writer.writerow(['' if v is None else v for v in row])
+
+def trade_date(timestamp):
+    """Eastern market date of an aware timestamp; naive legacy ones keep the date they were written with"""
+    try:
+        ts = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+    except ValueError:
+        return str(timestamp)[:10]
+    return market_date(ts).isoformat() if ts.tzinfo else ts.date().isoformat()
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_legacy_row(values):
+    """
+    Legacy rows come in two layouts:
+    timestamp,symbol,action,shares,price,value,stopLoss,takeProfit,changePct,volume
+    timestamp,symbol,SELL,qty,MARKET,market_value,,,pnl,CLOSE_POSITION  (PositionCloser)
+    """
+    if len(values) < 4:
+        return None
+    values = values + [''] * (10 - len(values))
+
+    if values[4] == 'MARKET':
+        shares = to_float(values[3])
+        value = to_float(values[5])
+        return {
+            'timestamp': values[0],
+            'symbol': values[1],
+            'action': values[2],
+            'shares': shares,
+            'price': value / shares if value is not None and shares else None,
+            'value': value,
+            'pnl': to_float(values[8]),
+            'reason': values[9] or None
+        }
+
+    return {
+        'timestamp': values[0],
+        'symbol': values[1],
+        'action': values[2],
+        'shares': to_float(values[3]),
+        'price': to_float(values[4]),
+        'value': to_float(values[5]),
+        'stop_loss': to_float(values[6]),
+        'take_profit': to_float(values[7]),
+        'change_pct': to_float(values[8]),
+        'volume': to_float(values[9])
+    }
+
+def to_api_trade(row):
+    """Shape a journal row the way the dashboard's /api/trades expects"""
+    return {
+        'id': f"trade_{row['id']}",
+        'timestamp': row['timestamp'],
+        'symbol': row['symbol'],
+        'action': row['action'],
+        'shares': row['shares'] or 0,
+        'price': row['price'] or 0,
+        'value': row['value'] or 0,
+        'stopLoss': row['stop_loss'],
+        'takeProfit': row['take_profit'],
+        'changePct': row['change_pct'] or 0,
+        'volume': row['volume'] or 0,
+        'pnl': row['pnl'],
+        'reason': row['reason'],
+        'session': row['session'] or ('premarket' if row['action'] == 'BUY' else 'market'),
+        'strategy': 'Ross Cameron Pattern'
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Trade journal queries')
+    parser.add_argument('command', choices=['trades', 'daily-stats', 'migrate', 'export'])
+    parser.add_argument('--start', help='First date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='Last date (YYYY-MM-DD)')
+    parser.add_argument('--date', help='Single date (YYYY-MM-DD)')
+    parser.add_argument('--symbol')
+    parser.add_argument('--days', type=int, default=30, help='Days of history for daily-stats')
+    parser.add_argument('--csv', default=Config.TRADE_LOG_CSV, help='Legacy CSV to migrate')
+    parser.add_argument('--force', action='store_true', help='Migrate even if the journal is not empty')
+    args = parser.parse_args()
+
+    try:
+        journal = TradeJournal()
+
+        if args.command == 'trades':
+            start = args.date or args.start
+            end = args.date or args.end
+            trades = [to_api_trade(row) for row in journal.query_range(start, end, args.symbol)]
+            result = {
+                'trades': trades,
+                'totalTrades': len(trades),
+                'lastUpdate': datetime.now().isoformat()
+            }
+        elif args.command == 'daily-stats':
+            if args.date:
+                result = journal.day_stats(args.date)
+            else:
+                start = (market_today() - timedelta(days=args.days)).isoformat()
+                result = journal.daily_stats(start)
+        elif args.command == 'migrate':
+            if journal.count() and not args.force:
+                result = {'imported': 0, 'message': 'Journal already has trades, use --force to import again'}
+            else:
+                result = {'imported': journal.import_csv(args.csv)}
+        else:
+            journal.export_csv(sys.stdout)
+            return
+
+        print(json.dumps(result, indent=2))
+
+    except Exception as e:
+        print(json.dumps({'error': True, 'message': f"Trade journal failed: {str(e)}"}))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,37 @@
 const { spawn } = require('child_process');
+const { AsyncLocalStorage } = require('async_hooks');
+const crypto = require('crypto');
 const path = require('path');
 const fs = require('fs');
 
+// Active trace for the current tick; Python scripts inherit it via TRACEPARENT
+const traceContext = new AsyncLocalStorage();
+
+// Python logging levels -> Logger methods
+const PYTHON_LOG_LEVELS = {
+  debug: 'debug',
+  info: 'info',
+  warning: 'warn',
+  error: 'error',
+  critical: 'error'
+};
+
+// Undo event_stream.py --compact column-wise lists: {_columns, _rows} -> [{...}]
+function expandColumns(value) {
+  if (Array.isArray(value)) {
+    return value.map(expandColumns);
+  }
+  if (value && typeof value === 'object') {
+    if (Array.isArray(value._columns) && Array.isArray(value._rows)) {
+      return value._rows.map((row) => Object.fromEntries(
+        value._columns.map((column, i) => [column, expandColumns(row[i])])
+      ));
+    }
+    return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, expandColumns(item)]));
+  }
+  return value;
+}
+
 class TradingBot {
   constructor(logger, smsService = null) {
     this.logger = logger;
@@ -38,12 +68,13 @@ class TradingBot {
     });
   }
 
-  async runPreMarketScreener() {
+  async runPreMarketScreener(onEvent = null, deadlineSeconds = null) {
     this.logger.info('🔍 Running pre-market screener...');
     
     try {
-      const results = await this.executePythonScript('run_premarket_screener.py');
-      const qualifyingStocks = JSON.parse(results);
+      // Streamed so callers see each candidate as soon as it qualifies
+      const args = deadlineSeconds ? ['--deadline', String(deadlineSeconds)] : [];
+      const qualifyingStocks = await this.executePythonScriptStream('run_premarket_screener.py', { args, onEvent });
       
       this.logger.info(`Found ${qualifyingStocks.length} qualifying stocks for pre-market`);
       return qualifyingStocks;
@@ -54,12 +85,12 @@ class TradingBot {
     }
   }
 
-  async runMarketHoursScreener() {
+  async runMarketHoursScreener(onEvent = null, deadlineSeconds = null) {
     this.logger.info('🔍 Running market hours screener...');
     
     try {
-      const results = await this.executePythonScript('run_market_hours_screener.py');
-      const qualifyingStocks = JSON.parse(results);
+      const args = deadlineSeconds ? ['--deadline', String(deadlineSeconds)] : [];
+      const qualifyingStocks = await this.executePythonScriptStream('run_market_hours_screener.py', { args, onEvent });
       
       this.logger.info(`Found ${qualifyingStocks.length} qualifying stocks for market hours`);
       return qualifyingStocks;
@@ -216,10 +247,18 @@ class TradingBot {
 
   async closeAllPositions() {
     try {
-      const results = await this.executePythonScript('close_all_positions.py');
+      const results = await this.executePythonScript('close_all_positions.py', null, ['--json']);
       const closeResults = JSON.parse(results);
       
-      this.logger.info(`🔴 Closed ${closeResults.positions_closed} positions`);
+      this.logger.info(`🔴 Closed ${closeResults.positions_closed} positions in ${closeResults.time_to_flat_ms} ms`);
+      
+      if (!closeResults.flat) {
+        this.logger.error(`🚨 Account not flat: ${closeResults.positions_remaining} positions remaining`, closeResults.errors);
+        if (this.smsService) {
+          await this.smsService.notifyError(
+            `${closeResults.positions_remaining} positions still open after flatten`, 'Close All Positions');
+        }
+      }
       
       // Send SMS notification for all positions closed
       if (this.smsService && closeResults.positions_closed > 0) {
@@ -241,6 +280,81 @@ class TradingBot {
     }
   }
 
+  async getTrades(options = {}) {
+    try {
+      const args = ['trades'];
+      if (options.date) args.push('--date', options.date);
+      if (options.start) args.push('--start', options.start);
+      if (options.end) args.push('--end', options.end);
+      if (options.symbol) args.push('--symbol', options.symbol);
+      
+      const results = await this.executePythonScript('trade_journal.py', null, args);
+      return JSON.parse(results);
+    } catch (error) {
+      this.logger.error('Failed to get trades:', error);
+      throw error;
+    }
+  }
+
+  async getTradeStats(date = null) {
+    try {
+      const args = date ? ['daily-stats', '--date', date] : ['daily-stats'];
+      const results = await this.executePythonScript('trade_journal.py', null, args);
+      return JSON.parse(results);
+    } catch (error) {
+      this.logger.error('Failed to get trade stats:', error);
+      throw error;
+    }
+  }
+
+  async getDailyStats() {
+    try {
+      const results = await this.executePythonScript('daily_stats.py');
+      return JSON.parse(results);
+    } catch (error) {
+      this.logger.error('Failed to get daily stats:', error);
+      throw error;
+    }
+  }
+
+  async buildOvernightSnapshot() {
+    try {
+      const results = await this.executePythonScript('overnight_snapshot.py');
+      return JSON.parse(results);
+    } catch (error) {
+      this.logger.error('Failed to build overnight snapshot:', error);
+      throw error;
+    }
+  }
+
+  async getSchedulerStatus() {
+    try {
+      const results = await this.executePythonScript('scheduler.py', null, ['status']);
+      return JSON.parse(results);
+    } catch (error) {
+      this.logger.error('Failed to read scheduler status:', error);
+      throw error;
+    }
+  }
+
+  async getMetrics() {
+    try {
+      return await this.executePythonScript('metrics.py');
+    } catch (error) {
+      this.logger.error('Failed to read metrics:', error);
+      throw error;
+    }
+  }
+
+  async exportTrades() {
+    try {
+      return await this.executePythonScript('trade_journal.py', null, ['export']);
+    } catch (error) {
+      this.logger.error('Failed to export trades:', error);
+      throw error;
+    }
+  }
+
   async generateDailyReport() {
     try {
       const results = await this.executePythonScript('generate_daily_report.py');
@@ -251,7 +365,107 @@ class TradingBot {
     }
   }
 
-  async executePythonScript(scriptName, inputData = null) {
+  // Run fn as one trace: every Python script it spawns joins the same trace id
+  async withTrace(name, fn) {
+    const trace = {
+      name,
+      traceId: crypto.randomBytes(16).toString('hex'),
+      spanId: crypto.randomBytes(8).toString('hex'),
+      start: Date.now()
+    };
+    
+    try {
+      return await traceContext.run(trace, fn);
+    } finally {
+      this.writeTraceSpan(trace, Date.now());
+    }
+  }
+
+  traceparent() {
+    const trace = traceContext.getStore();
+    return trace ? `00-${trace.traceId}-${trace.spanId}-01` : null;
+  }
+
+  writeTraceSpan(trace, end) {
+    // Root span in the same Chrome trace-event format the Python side writes
+    const traceDir = process.env.TRACE_DIR || 'traces';
+    const event = {
+      name: trace.name,
+      cat: 'node',
+      ph: 'X',
+      ts: trace.start * 1000,
+      dur: (end - trace.start) * 1000,
+      pid: process.pid,
+      tid: 0,
+      args: { span_id: trace.spanId, parent_id: null, trace_id: trace.traceId }
+    };
+    
+    try {
+      fs.mkdirSync(traceDir, { recursive: true });
+      fs.writeFileSync(
+        path.join(traceDir, `${trace.traceId}-node-${process.pid}.json`),
+        JSON.stringify({ traceEvents: [event], displayTimeUnit: 'ms', otherData: { trace_id: trace.traceId } })
+      );
+    } catch (error) {
+      this.logger.error('Failed to write trace span:', error);
+    }
+  }
+
+  forwardPythonLog(scriptName, line) {
+    // jsonlog.py writes one JSON object per line: {ts, level, logger, msg, ...fields}
+    if (!line.startsWith('{')) {
+      return false;
+    }
+    
+    let entry;
+    try {
+      entry = JSON.parse(line);
+    } catch (error) {
+      return false;
+    }
+    if (typeof entry.msg !== 'string' || typeof entry.level !== 'string') {
+      return false;
+    }
+    
+    const method = PYTHON_LOG_LEVELS[entry.level] || 'info';
+    const context = entry.symbol ? ` [${entry.symbol}]` : '';
+    this.logger[method](`[${scriptName}]${context} ${entry.msg}`);
+    if (entry.exc) {
+      this.logger[method](entry.exc);
+    }
+    return true;
+  }
+
+  async executePythonScriptStream(scriptName, { inputData = null, args = [], compact = false, onEvent = null } = {}) {
+    // Run with --stream: onEvent gets each NDJSON event as it arrives, the summary event's data is returned
+    let summary;
+    const streamArgs = [...args, '--stream', ...(compact ? ['--compact'] : [])];
+    
+    await this.executePythonScript(scriptName, inputData, streamArgs, (line) => {
+      let event;
+      try {
+        event = expandColumns(JSON.parse(line));
+      } catch (error) {
+        this.logger.warn(`[${scriptName}] Unparseable stream line: ${line.slice(0, 200)}`);
+        return;
+      }
+      
+      if (event.event === 'summary') {
+        summary = event.data;
+      } else if (onEvent) {
+        Promise.resolve()
+          .then(() => onEvent(event))
+          .catch((error) => this.logger.error(`[${scriptName}] ${event.event} handler failed:`, error));
+      }
+    });
+    
+    if (summary === undefined) {
+      throw new Error(`Python script ${scriptName} exited without a summary event`);
+    }
+    return summary;
+  }
+
+  async executePythonScript(scriptName, inputData = null, args = [], onStdoutLine = null) {
     return new Promise((resolve, reject) => {
       const scriptPath = path.join(__dirname, '..', 'python_scripts', scriptName);
       const pythonPath = path.join(__dirname, '..', 'venv311', 'bin', 'python');
@@ -261,20 +475,53 @@ class TradingBot {
         return;
       }
 
-      const pythonProcess = spawn(pythonPath, [scriptPath]);
+      const traceparent = this.traceparent();
+      const env = traceparent ? { ...process.env, TRACEPARENT: traceparent } : process.env;
+      const pythonProcess = spawn(pythonPath, [scriptPath, ...args], { env });
       
       let stdout = '';
       let stderr = '';
+      let pending = '';
+      let pendingStdout = '';
+      
+      // Decode as a stream so a multi-byte character split across chunks (emoji in logs) survives
+      pythonProcess.stdout.setEncoding('utf8');
+      pythonProcess.stderr.setEncoding('utf8');
       
       pythonProcess.stdout.on('data', (data) => {
-        stdout += data.toString();
+        if (!onStdoutLine) {
+          stdout += data;
+          return;
+        }
+        
+        const lines = (pendingStdout + data).split('\n');
+        pendingStdout = lines.pop();
+        for (const line of lines) {
+          if (line.trim()) {
+            onStdoutLine(line);
+          }
+        }
       });
       
       pythonProcess.stderr.on('data', (data) => {
-        stderr += data.toString();
+        // Structured log lines go to our logger; anything else is kept for the error message
+        const lines = (pending + data).split('\n');
+        pending = lines.pop();
+        for (const line of lines) {
+          if (!this.forwardPythonLog(scriptName, line)) {
+            stderr += line + '\n';
+          }
+        }
       });
       
       pythonProcess.on('close', (code) => {
+        if (pending && !this.forwardPythonLog(scriptName, pending)) {
+          stderr += pending;
+        }
+        if (onStdoutLine && pendingStdout.trim()) {
+          onStdoutLine(pendingStdout);
+        }
+        
         if (code === 0) {
           resolve(stdout.trim());
         } else {
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Time-of-day volume baselines
+A 20-bar rolling mean makes 4:00 AM and the open look like huge spikes and
+lunch look dead. This keeps, per symbol, the average one-minute volume at
+each minute of the extended session (4:00 AM - 8:00 PM ET = 960 minutes),
+averaged over the last VOLUME_PROFILE_SESSIONS sessions:
+
+    VOLUME_PROFILE_DIR/profile.npy   float32 (symbols x 960), memory-mapped
+    VOLUME_PROFILE_DIR/meta.json     symbol order, sessions folded per symbol,
+                                     last session folded per symbol
+
+Relative volume is then one array lookup: volume / profile[symbol, minute].
+The overnight job folds each new session in with update(); sessions already
+folded are skipped, so re-running it is harmless.
+
+Usage:
+    volume_profile.py SYMBOL     # print the symbol's baseline by minute
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+MINUTES = 960
+SESSION_START = 4 * 60  # 4:00 AM ET, minute 0
+TIMEZONE = 'America/New_York'
+# Fewer sessions than this and a symbol's baseline is too noisy to use
+MIN_SESSIONS = 3
+
+def minute_of_day(index):
+    """Profile column for each bar of a DatetimeIndex (-1 outside 4:00 AM - 8:00 PM ET)"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert(TIMEZONE)
+    minutes = np.asarray(index.hour * 60 + index.minute, dtype=np.int64) - SESSION_START
+    return np.where((minutes >= 0) & (minutes < MINUTES), minutes, -1)
+
+def session_days(index):
+    """ET calendar day of each bar, as days since the epoch"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert(TIMEZONE)
+    return index.normalize().tz_localize(None).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+class VolumeProfile:
+    def __init__(self, profile, meta, path=None):
+        self.profile = profile
+        self.symbols = meta['symbols']
+        self.sessions = np.asarray(meta['sessions'], dtype=np.int32)
+        self.last_session = np.asarray(meta['last_session'], dtype=np.int64)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.path = path
+
+    @classmethod
+    def load(cls, directory=None, writable=False):
+        """Memory-mapped profile, or None if there isn't a usable one yet"""
+        directory = directory or Config.VOLUME_PROFILE_DIR
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+            profile = np.load(os.path.join(directory, 'profile.npy'), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error loading volume profile {directory}: {e}", file=sys.stderr)
+            return None
+        if profile.shape != (len(meta['symbols']), MINUTES):
+            # Caught between the nightly job's two renames; next load will match
+            return None
+        if writable:
+            profile = np.array(profile)
+        return cls(profile, meta, directory)
+
+    @classmethod
+    def empty(cls, directory=None):
+        meta = {'symbols': [], 'sessions': [], 'last_session': []}
+        return cls(np.zeros((0, MINUTES), dtype=np.float32), meta, directory or Config.VOLUME_PROFILE_DIR)
+
+    def ready(self, symbol):
+        i = self.index.get(symbol)
+        return i is not None and self.sessions[i] >= MIN_SESSIONS
+
+    def baseline(self, symbol, index):
+        """Average volume for each bar's minute of day (NaN where there's no usable baseline)"""
+        out = np.full(len(index), np.nan)
+        if not self.ready(symbol):
+            return out
+        minutes = minute_of_day(index)
+        inside = minutes >= 0
+        out[inside] = self.profile[self.index[symbol], minutes[inside]]
+        out[out <= 0] = np.nan
+        return out
+
+    def relative_volume(self, symbol, timestamp, volume):
+        """volume over the symbol's usual volume at that minute, or None without a baseline"""
+        if not self.ready(symbol):
+            return None
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert(TIMEZONE)
+        minute = timestamp.hour * 60 + timestamp.minute - SESSION_START
+        if not 0 <= minute < MINUTES:
+            return None
+        expected = float(self.profile[self.index[symbol], minute])
+        return float(volume) / expected if expected > 0 else None
+
+    def add_symbols(self, symbols):
+        new = [s for s in dict.fromkeys(symbols) if s not in self.index]
+        if not new:
+            return
+        self.profile = np.vstack([self.profile, np.zeros((len(new), MINUTES), dtype=np.float32)])
+        self.sessions = np.concatenate([self.sessions, np.zeros(len(new), dtype=np.int32)])
+        self.last_session = np.concatenate([self.last_session, np.zeros(len(new), dtype=np.int64)])
+        for symbol in new:
+            self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+    def update(self, symbols, volume, index, max_sessions=None):
+        """
+        Fold every not-yet-seen session in a (bars x symbols) volume array into
+        the running averages; returns the number of symbol-sessions added
+        """
+        max_sessions = max_sessions or Config.VOLUME_PROFILE_SESSIONS
+        self.add_symbols(symbols)
+        rows = np.array([self.index[s] for s in symbols])
+        volume = np.asarray(volume, dtype=float)
+        minutes = minute_of_day(index)
+        days = session_days(index)
+        inside = minutes >= 0
+
+        folded = 0
+        for day in np.unique(days[inside]):
+            bars = inside & (days == day)
+            session = np.zeros((MINUTES, len(symbols)))
+            present = ~np.isnan(volume[bars])
+            np.add.at(session, minutes[bars], np.where(present, volume[bars], 0.0))
+            # Symbols that traded that day and haven't had it folded in yet
+            fresh = present.any(axis=0) & (self.last_session[rows] < day)
+            if not fresh.any():
+                continue
+            target = rows[fresh]
+            # Running mean that becomes a moving average once max_sessions are in
+            weight = 1.0 / np.minimum(self.sessions[target] + 1, max_sessions)
+            self.profile[target] += (weight[:, None] * (session[:, fresh].T - self.profile[target])).astype(np.float32)
+            self.sessions[target] += 1
+            self.last_session[target] = day
+            folded += int(fresh.sum())
+        return folded
+
+    def save(self, directory=None):
+        """Write profile then metadata, each via rename"""
+        directory = directory or self.path or Config.VOLUME_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        profile_path = os.path.join(directory, 'profile.npy')
+        with open(f"{profile_path}.tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.profile, dtype=np.float32))
+        os.replace(f"{profile_path}.tmp", profile_path)
+
+        meta_path = os.path.join(directory, 'meta.json')
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump({'symbols': self.symbols, 'sessions': self.sessions.tolist(),
+                       'last_session': self.last_session.tolist()}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: volume_profile.py SYMBOL", file=sys.stderr)
+        sys.exit(1)
+    symbol = sys.argv[1].upper()
+    profile = VolumeProfile.load()
+    if profile is None or symbol not in profile.index:
+        print(json.dumps({'error': f'No volume profile for {symbol}'}))
+        sys.exit(1)
+    i = profile.index[symbol]
+    times = [f"{(SESSION_START + m) // 60:02d}:{m % 60:02d}" for m in range(MINUTES)]
+    print(json.dumps({
+        'symbol': symbol,
+        'sessions': int(profile.sessions[i]),
+        'ready': profile.ready(symbol),
+        'baseline': dict(zip(times, profile.profile[i].round(1).tolist()))
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()